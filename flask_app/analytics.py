@@ -0,0 +1,304 @@
+import os
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+# ticker the betas are measured against
+ANALYTICS_BENCHMARK = os.getenv("ANALYTICS_BENCHMARK", "SPY")
+# trading days per year, volatilities and covariances are annualized with it
+TRADING_DAYS = 252
+
+
+def price_matrix(bars_by_ticker: dict, field: str = "close"):
+    """
+    price_matrix Align a column of many tickers on the union of their dates.
+
+    Args:
+        bars_by_ticker (dict): Bars of each ticker, see ohlcv_store.COLUMNS.
+        field (str, optional): Column to align. Defaults to "close".
+
+    Returns:
+        pd.DataFrame: One column per ticker indexed by date, NaN where a ticker has no bar.
+    """
+    tickers = list(bars_by_ticker)
+    if not tickers:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+    dates = np.unique(np.concatenate([bars_by_ticker[t]["date"] for t in tickers]))
+    prices = np.full((len(dates), len(tickers)), np.nan)
+    for i, ticker in enumerate(tickers):
+        bars = bars_by_ticker[ticker]
+        prices[np.searchsorted(dates, bars["date"]), i] = bars[field]
+    return pd.DataFrame(
+        prices, index=pd.DatetimeIndex(dates, name="date"), columns=tickers
+    )
+
+
+def returns_matrix(prices: pd.DataFrame, kind: str = "log"):
+    """
+    returns_matrix Returns the period returns of aligned prices.
+
+    A return is NaN when either of its prices is missing, dates without any return are dropped.
+
+    Args:
+        prices (pd.DataFrame): Prices, see price_matrix.
+        kind (str, optional): "log" or "simple" returns. Defaults to "log".
+
+    Raises:
+        ValueError: Unknown kind.
+
+    Returns:
+        pd.DataFrame: Returns, one row per date after the first.
+    """
+    values = prices.to_numpy()
+    if kind == "log":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.diff(np.log(values), axis=0)
+    elif kind == "simple":
+        returns = values[1:] / values[:-1] - 1
+    else:
+        raise ValueError(f"Unknown return kind {kind}, use log or simple.")
+    returns[~np.isfinite(returns)] = np.nan
+    returns = pd.DataFrame(returns, index=prices.index[1:], columns=prices.columns)
+    return returns[returns.notna().any(axis=1)]
+
+
+def pairwise_moments(returns: pd.DataFrame):
+    """
+    pairwise_moments Returns sums over the dates where both tickers of a pair have a return, as matrix products.
+
+    Args:
+        returns (pd.DataFrame): Returns, NaN where a ticker has none.
+
+    Returns:
+        np.ndarray: n[i, j], the number of dates i and j share.
+        np.ndarray: sums[i, j], the sum of the returns of i over those dates.
+        np.ndarray: squares[i, j], the sum of the squared returns of i over those dates.
+        np.ndarray: cross[i, j], the sum of the products of the returns of i and j.
+    """
+    x = returns.to_numpy()
+    valid = ~np.isnan(x)
+    mask = valid.astype(np.float64)
+    x = np.where(valid, x, 0.0)
+    n = mask.T @ mask  # n[i, j]: dates where i and j both have a return
+    sums = x.T @ mask  # sums[i, j]: sum of i over those dates
+    squares = (x * x).T @ mask
+    cross = x.T @ x
+    return n, sums, squares, cross
+
+
+def covariance_matrix(returns: pd.DataFrame, annualize: bool = True):
+    """
+    covariance_matrix Returns the covariances of returns over the dates both tickers share.
+
+    Same result as DataFrame.cov() (pairwise complete observations) with matrix products
+    instead of a loop over the pairs.
+
+    Args:
+        returns (pd.DataFrame): Returns, see returns_matrix.
+        annualize (bool, optional): Multiply by TRADING_DAYS. Defaults to True.
+
+    Returns:
+        pd.DataFrame: Covariance of each pair, NaN with fewer than 2 shared returns.
+    """
+    n, sums, _, cross = pairwise_moments(returns)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = (cross - sums * sums.T / n) / (n - 1)
+    cov[n < 2] = np.nan
+    if annualize:
+        cov *= TRADING_DAYS
+    return pd.DataFrame(cov, index=returns.columns, columns=returns.columns)
+
+
+def correlation_matrix(returns: pd.DataFrame):
+    """
+    correlation_matrix Returns the correlations of returns over the dates both tickers share.
+
+    Same result as DataFrame.corr(), see covariance_matrix.
+
+    Args:
+        returns (pd.DataFrame): Returns, see returns_matrix.
+
+    Returns:
+        pd.DataFrame: Correlation of each pair, NaN with fewer than 2 shared returns.
+    """
+    n, sums, squares, cross = pairwise_moments(returns)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = cross - sums * sums.T / n
+        # variance of i over the dates shared with j, and of j over the dates shared with i
+        var = squares - sums * sums / n
+        corr = cov / np.sqrt(var * var.T)
+    corr[n < 2] = np.nan
+    np.fill_diagonal(corr, np.where(np.diag(n) >= 2, 1.0, np.nan))
+    return pd.DataFrame(
+        np.clip(corr, -1, 1), index=returns.columns, columns=returns.columns
+    )
+
+
+def portfolio_weights(prices: pd.DataFrame, shares: dict):
+    """
+    portfolio_weights Returns the weight of each holding from its last price.
+
+    Args:
+        prices (pd.DataFrame): Prices, see price_matrix.
+        shares (dict): Number of shares of each ticker.
+
+    Returns:
+        pd.Series: Weight of each ticker of prices, summing to 1 (0 without any value).
+        float: Market value of the portfolio.
+    """
+    last = prices.ffill().iloc[-1] if len(prices) else pd.Series(dtype=float)
+    values = last.reindex(prices.columns).fillna(0) * pd.Series(shares).reindex(
+        prices.columns
+    ).fillna(0)
+    total = float(values.sum())
+    weights = values / total if total else values * 0
+    return weights, total
+
+
+def value_at_risk(
+    portfolio_returns: np.ndarray,
+    value: float,
+    confidence: float = 0.95,
+    horizon: int = 1,
+):
+    """
+    value_at_risk Returns the historical and parametric (normal) value at risk of a portfolio.
+
+    Log returns are turned into simple returns, a horizon of more than one day is scaled by
+    sqrt(horizon).
+
+    Args:
+        portfolio_returns (np.ndarray): Daily log returns of the portfolio.
+        value (float): Market value of the portfolio.
+        confidence (float, optional): Confidence level, between 0 and 1. Defaults to 0.95.
+        horizon (int, optional): Days. Defaults to 1.
+
+    Raises:
+        ValueError: confidence or horizon is out of range.
+
+    Returns:
+        dict: Historical and parametric loss, as a fraction and an amount (positive is a loss).
+    """
+    if not 0 < confidence < 1:
+        raise ValueError(f"confidence must be between 0 and 1, got {confidence}.")
+    if horizon < 1:
+        raise ValueError(f"horizon must be at least 1 day, got {horizon}.")
+    returns = portfolio_returns[~np.isnan(portfolio_returns)]
+    if len(returns) < 2:
+        return {"historical": None, "parametric": None}
+
+    scale = np.sqrt(horizon)
+    historical = -np.expm1(np.quantile(returns, 1 - confidence) * scale)
+    z = NormalDist().inv_cdf(1 - confidence)
+    parametric = -np.expm1(returns.mean() * horizon + z * returns.std(ddof=1) * scale)
+    return {
+        "historical": {"fraction": historical, "amount": historical * value},
+        "parametric": {"fraction": parametric, "amount": parametric * value},
+    }
+
+
+def portfolio_risk(
+    bars_by_ticker: dict,
+    shares: dict,
+    benchmark: str = ANALYTICS_BENCHMARK,
+    confidence: float = 0.95,
+    horizon: int = 1,
+):
+    """
+    portfolio_risk Returns the volatility, beta and value at risk of each holding and of the portfolio.
+
+    Everything comes from one aligned matrix of daily log returns: volatilities and the
+    portfolio variance w'Cw from the annualized covariance matrix, betas from the covariances
+    with the benchmark, and the value at risk from the daily portfolio returns over the dates
+    at least one holding has a return (a holding without a return on such a date counts as
+    flat, the dates only the benchmark has are left out).
+
+    Args:
+        bars_by_ticker (dict): Bars of each holding, plus the benchmark if it has bars.
+        shares (dict): Number of shares of each holding.
+        benchmark (str, optional): Ticker the betas are measured against. Defaults to
+            ANALYTICS_BENCHMARK.
+        confidence (float, optional): VaR confidence level. Defaults to 0.95.
+        horizon (int, optional): VaR horizon in days. Defaults to 1.
+
+    Returns:
+        dict: Per-ticker weight, volatility and beta, and the portfolio value, volatility, beta and VaR.
+    """
+    returns = returns_matrix(price_matrix(bars_by_ticker))
+    holdings = [t for t in shares if t in returns.columns]
+    cov = covariance_matrix(returns)
+    held_returns = returns[holdings].dropna(how="all")
+    report = {
+        "benchmark": benchmark if benchmark in cov.columns else None,
+        "start": held_returns.index[0].isoformat() if len(held_returns) else None,
+        "end": held_returns.index[-1].isoformat() if len(held_returns) else None,
+        "observations": len(held_returns),
+    }
+    if not holdings:
+        return {
+            **report,
+            "tickers": {},
+            "portfolio": {
+                "value": 0.0,
+                "volatility": None,
+                "beta": None,
+                "value_at_risk": {
+                    "confidence": confidence,
+                    "horizon": horizon,
+                    **value_at_risk(np.empty(0), 0.0, confidence, horizon),
+                },
+            },
+        }
+
+    prices = price_matrix({t: bars_by_ticker[t] for t in holdings})
+    weights, value = portfolio_weights(prices, shares)
+    w = weights.to_numpy()
+
+    volatility = np.sqrt(np.diag(cov))
+    if benchmark in cov.columns:
+        betas = cov[benchmark] / cov.at[benchmark, benchmark]
+    else:
+        betas = pd.Series(np.nan, index=cov.columns)
+
+    portfolio_returns = held_returns.fillna(0).to_numpy() @ w
+    # NaN (None) when a held pair has fewer than 2 shared returns, holdings without weight aside
+    held = w != 0
+    held_cov = cov.loc[holdings, holdings].to_numpy()[np.ix_(held, held)]
+    portfolio_variance = float(held_cov @ w[held] @ w[held]) if held.any() else np.nan
+    # NaN (None) without the benchmark, or when a holding has no beta
+    portfolio_beta = float((betas[holdings] * weights).sum(skipna=False))
+
+    def number(x):
+        return None if x is None or not np.isfinite(x) else float(x)
+
+    return {
+        **report,
+        "tickers": {
+            t: {
+                "weight": number(weights[t]),
+                "volatility": number(volatility[cov.columns.get_loc(t)]),
+                "beta": number(betas[t]),
+            }
+            for t in holdings
+        },
+        "portfolio": {
+            "value": value,
+            "volatility": number(np.sqrt(portfolio_variance)),
+            "beta": number(portfolio_beta),
+            "value_at_risk": {
+                "confidence": confidence,
+                "horizon": horizon,
+                **{
+                    method: (
+                        None if var is None else {k: number(v) for k, v in var.items()}
+                    )
+                    for method, var in value_at_risk(
+                        portfolio_returns, value, confidence, horizon
+                    ).items()
+                },
+            },
+        },
+    }
@@ -0,0 +1,391 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+import pandas as pd
+from dotenv import load_dotenv
+from generate_data import generate_synthetic, synthetic_market
+from migrations import split_statements
+
+load_dotenv()
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+# scratch database the benchmark drops and reseeds, never point it at team11
+BENCH_DATABASE = os.getenv("BENCH_DATABASE", "team11_bench")
+SCHEMA_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "schema", "schema.sql"
+)
+
+
+# stand-in for the parts of yfinance used by DatabaseEditor, serving a synthetic market
+class StubYFinance:
+    def __init__(self, num_tickers: int = 20, bars: int = 250, seed: int = 0):
+        """
+        __init__ Initializer for the StubYFinance class.
+
+        Args:
+            num_tickers (int, optional): Number of tickers of the market. Defaults to 20.
+            bars (int, optional): Daily bars of history per ticker, ending yesterday. Defaults to 250.
+            seed (int, optional): Random seed, see generate_data.synthetic_market. Defaults to 0.
+        """
+        end = datetime.combine(datetime.today().date(), datetime.min.time())
+        self.dates = pd.bdate_range(end=end - timedelta(days=1), periods=bars)
+        self.universe, self.prices = synthetic_market(num_tickers, self.dates, seed)
+        self.index = {t[0]: i for i, t in enumerate(self.universe)}
+        self.calls = 0  # upstream calls served
+
+    def history_frame(self, ticker_id: str):
+        """
+        history_frame Returns the full price history of a ticker, empty if it is not in the market.
+
+        Args:
+            ticker_id (str): Ticker symbol.
+
+        Returns:
+            pd.DataFrame: Open, High, Low, Close and Volume columns indexed by date.
+        """
+        i = self.index.get(ticker_id.upper())
+        columns = ["Open", "High", "Low", "Close", "Volume"]
+        if i is None:
+            return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([]))
+        return pd.DataFrame(
+            {c: self.prices[c.lower()][i] for c in columns}, index=self.dates
+        )
+
+    def Ticker(self, ticker_id: str):
+        return StubTicker(self, ticker_id)
+
+    def download(self, tickers, period=None, group_by=None, progress=False, **kwargs):
+        self.calls += 1
+        if isinstance(tickers, str):
+            return self.history_frame(tickers).tail(1)
+        return pd.concat({t: self.history_frame(t).tail(1) for t in tickers}, axis=1)
+
+
+class StubTicker:
+    def __init__(self, source: StubYFinance, ticker_id: str):
+        self.source = source
+        self.ticker_id = ticker_id.upper()
+
+    @property
+    def info(self):
+        self.source.calls += 1
+        i = self.source.index.get(self.ticker_id)
+        if i is None:
+            return {"trailingPegRatio": None}
+        history = self.source.history_frame(self.ticker_id)
+        return {
+            "shortName": self.source.universe[i][1],
+            "quoteType": self.source.universe[i][2],
+            "currentPrice": float(history["Close"].iloc[-1]),
+            "fiftyTwoWeekHigh": float(history["High"].tail(252).max()),
+            "fiftyTwoWeekLow": float(history["Low"].tail(252).min()),
+        }
+
+    def history(self, period=None, start=None, end=None, **kwargs):
+        self.source.calls += 1
+        history = self.source.history_frame(self.ticker_id)
+        if period is not None:
+            return history.tail(1)
+        if start is not None:
+            history = history[history.index >= pd.Timestamp(start)]
+        if end is not None:
+            history = history[history.index < pd.Timestamp(end)]
+        return history
+
+
+def create_database(database: str):
+    """
+    create_database Drop and recreate a database from schema/schema.sql.
+
+    Args:
+        database (str): Name of the database to (re)create.
+    """
+    with open(SCHEMA_FILE) as f:
+        statements = split_statements(f.read())
+
+    db = mysql.connector.connect(host="localhost", user="root", password=DB_PASSWORD)
+    cursor = db.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {database};")
+    cursor.execute(f"CREATE DATABASE {database};")
+    cursor.execute(f"USE {database};")
+    for statement in statements:
+        if statement.upper().startswith(("CREATE DATABASE", "USE ")):
+            continue
+        cursor.execute(statement)
+    db.commit()
+    cursor.close()
+    db.close()
+
+
+def time_case(fn, repeats: int, stub: StubYFinance):
+    """
+    time_case Call a function once to warm up, then time it.
+
+    Args:
+        fn (callable): Zero-argument function to time.
+        repeats (int): Number of timed calls.
+        stub (StubYFinance): Stub whose upstream calls are counted.
+
+    Returns:
+        dict: min/median/p95/mean wall time in milliseconds and upstream calls per call.
+    """
+    fn()
+    calls = stub.calls
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    return {
+        "repeats": repeats,
+        "min_ms": timings[0],
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "mean_ms": statistics.fmean(timings),
+        "upstream_calls": (stub.calls - calls) / repeats,
+    }
+
+
+def benchmark_size(app_module, stub, args, transactions: int):
+    """
+    benchmark_size Reseed the benchmark database with a number of transactions and time every case.
+
+    Args:
+        app_module (module): The flask_app module, its pool is pointed at the benchmark database.
+        stub (StubYFinance): Stub market data source installed in db_api.
+        args (argparse.Namespace): Command line arguments.
+        transactions (int): Number of transactions to seed.
+
+    Returns:
+        list: Result of each case.
+    """
+    from db_api import DatabaseEditor
+    from db_pool import ConnectionPool
+    from ohlcv_store import clear_stores
+    from quote_cache import quote_cache
+
+    app_module.db_pool.close()
+    create_database(args.database)
+    app_module.db_pool = ConnectionPool(password=DB_PASSWORD, database=args.database)
+    quote_cache.invalidate()
+    clear_stores()
+
+    db_editor = DatabaseEditor(password=DB_PASSWORD, database=args.database)
+    summary = generate_synthetic(
+        db_editor,
+        len(stub.universe),
+        transactions,
+        stub.dates[0].to_pydatetime(),
+        stub.dates[-1].to_pydatetime(),
+        args.seed,
+    )
+    load_ms = summary["seconds"] * 1000
+    results = [
+        {
+            "case": "generate_synthetic",
+            "transactions": transactions,
+            "repeats": 1,
+            "min_ms": load_ms,
+            "median_ms": load_ms,
+            "p95_ms": load_ms,
+            "mean_ms": load_ms,
+            "upstream_calls": 0,
+        }
+    ]
+
+    # the most traded ticker, so per-ticker cases see the largest history
+    db_editor.cursor.execute(
+        "SELECT ticker_id FROM transactions GROUP BY ticker_id ORDER BY COUNT(*) DESC LIMIT 1;"
+    )
+    row = db_editor.cursor.fetchone()
+    ticker = row[0] if row else stub.universe[0][0]
+    mid_bar = stub.dates[len(stub.dates) // 2].strftime("%Y-%m-%d %H:%M:%S")
+    first_bar = stub.dates[0].to_pydatetime()
+
+    client = app_module.app.test_client()
+    orders = [
+        {"ticker_id": ticker, "num_shares": 1, "transaction_type": side}
+        for side in ("buy", "sell") * 5
+    ]
+
+    def request(method, url, **kwargs):
+        def call():
+            response = client.open(url, method=method, **kwargs)
+            response.get_data()
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {url} returned {response.status_code}")
+
+        return call
+
+    def buy_then_sell():
+        request("POST", f"/buy/{ticker}/1")()
+        request("POST", f"/sell/{ticker}/1")()
+
+    cases = {
+        "calc_profit": lambda: db_editor.calc_profit(ticker),
+        "calc_profit historical": lambda: db_editor.calc_profit(ticker, mid_bar),
+        "backlog_ticker_data": lambda: db_editor.backlog_ticker_data(ticker, first_bar),
+        "get_transaction_history": db_editor.get_transaction_history,
+        "get_transaction_page": db_editor.get_transaction_page,
+        "asset_type_breakdown": db_editor.asset_type_breakdown,
+        "GET /portfolio_table": request("GET", "/portfolio_table"),
+        "GET /portfolio": request("GET", "/portfolio"),
+        "GET /tickers": request("GET", "/tickers"),
+        "GET /assets_breakdown": request("GET", "/assets_breakdown"),
+        "GET /transaction_history": request("GET", "/transaction_history"),
+        "GET /transaction_history/<t_id>": request(
+            "GET", f"/transaction_history/{ticker}"
+        ),
+        "GET /ticker_data/<t_id>": request("GET", f"/ticker_data/{ticker}"),
+        "GET /export/transactions": request("GET", "/export/transactions"),
+        "GET /export/ticker_data/<t_id>": request(
+            "GET", f"/export/ticker_data/{ticker}"
+        ),
+        "POST /buy + POST /sell": buy_then_sell,
+        "POST /orders (10 orders)": request("POST", "/orders", json=orders),
+    }
+
+    try:
+        for name, fn in cases.items():
+            if args.cases and not any(c in name for c in args.cases):
+                continue
+            result = {"case": name, "transactions": transactions}
+            result.update(time_case(fn, args.repeats, stub))
+            results.append(result)
+            print(
+                f"{transactions:>9} transactions  {name:<32} "
+                f"median {result['median_ms']:9.2f}ms  p95 {result['p95_ms']:9.2f}ms"
+            )
+    finally:
+        db_editor.disconnect()
+
+    return results
+
+
+def run(args):
+    # keep the app's background refresh and request logging out of the timings
+    os.environ["REFRESH_SCHEDULER_ENABLED"] = "0"
+    # the app's editors keep their database name, keep their bars away from the real store
+    os.environ["OHLCV_STORE_DIR"] = tempfile.mkdtemp(prefix="ohlcv_bench_")
+    import db_api
+    import flask_app as app_module
+
+    logging.getLogger().setLevel(logging.WARNING)
+    stub = StubYFinance(args.tickers, args.bars, args.seed)
+    db_api.yf = stub
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    results = []
+    for transactions in args.sizes:
+        results += benchmark_size(app_module, stub, args, transactions)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": commit,
+            "python": platform.python_version(),
+            "database": args.database,
+            "tickers": args.tickers,
+            "bars": args.bars,
+            "sizes": args.sizes,
+            "repeats": args.repeats,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}.")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = {(r["case"], r["transactions"]): r for r in json.load(f)["results"]}
+    with open(args.candidate) as f:
+        candidate = json.load(f)["results"]
+
+    regressions = 0
+    for r in candidate:
+        old = baseline.get((r["case"], r["transactions"]))
+        if old is None or old["median_ms"] == 0:
+            continue
+        ratio = r["median_ms"] / old["median_ms"]
+        flag = ""
+        if ratio > args.threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(
+            f"{r['transactions']:>9} transactions  {r['case']:<32} "
+            f"{old['median_ms']:9.2f}ms -> {r['median_ms']:9.2f}ms  x{ratio:5.2f}{flag}"
+        )
+
+    if regressions:
+        raise SystemExit(1)
+
+
+# !! OFFLINE BENCHMARKS, DROPS AND RESEEDS BENCH_DATABASE
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark DatabaseEditor and the REST endpoints against stub market data."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="seed the benchmark database at each size and time every case"
+    )
+    run_parser.add_argument(
+        "--sizes",
+        type=lambda s: [int(n) for n in s.split(",")],
+        default=[10, 100, 1000, 10000],
+        help="comma separated numbers of transactions (default: 10,100,1000,10000)",
+    )
+    run_parser.add_argument("--tickers", type=int, default=20, help="number of tickers")
+    run_parser.add_argument(
+        "--bars", type=int, default=250, help="daily bars of history per ticker"
+    )
+    run_parser.add_argument(
+        "--repeats", type=int, default=5, help="timed calls per case"
+    )
+    run_parser.add_argument("--seed", type=int, default=0, help="random seed")
+    run_parser.add_argument(
+        "--cases", nargs="*", help="only run the cases containing these strings"
+    )
+    run_parser.add_argument(
+        "--database", default=BENCH_DATABASE, help="scratch database to (re)create"
+    )
+    run_parser.add_argument(
+        "--output", default="benchmark.json", help="JSON results file"
+    )
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare the median times of two results files"
+    )
+    compare_parser.add_argument("baseline", help="results of the reference version")
+    compare_parser.add_argument("candidate", help="results of the new version")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="slowdown ratio reported as a regression (default: 1.25)",
+    )
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
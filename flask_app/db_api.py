@@ -1,23 +1,108 @@
 import json
 import logging  # this should allow all messages to be displayed
 import os
+import time
 from datetime import datetime, timedelta
 
 import mysql.connector
+import numpy as np
+import pandas as pd
 import requests
 import yfinance as yf
+from analytics import (
+    ANALYTICS_BENCHMARK,
+    correlation_matrix,
+    covariance_matrix,
+    portfolio_risk,
+    price_matrix,
+    returns_matrix,
+)
 from dotenv import load_dotenv
+from downsampling import aggregate_bars, downsample_bars
 from flask import jsonify
+from market_calendar import is_market_open, market_now, session_close, session_date
+from metrics import time_statement, time_upstream
+from ohlcv_store import (
+    OHLCV_STORE_ENABLED,
+    bars_between,
+    bars_from_rows,
+    column_to_list,
+    ohlcv_store,
+)
+from positions import apply_trade, empty_position, position_profit, replay
+from profit_engine import profit_series
+from quote_cache import quote_cache
+from rolling_stats import (
+    ROLLING_WINDOW,
+    add_bar,
+    add_pair_returns,
+    bar_returns,
+    pair_moments,
+    pair_summary,
+    resize_window,
+    stats_from_bars,
+    stats_summary,
+)
+from trade_stats import trade_stats
 
 load_dotenv()
 DB_PASSWORD = os.getenv("DB_PASSWORD")
+# max number of symbols priced by a single yf.download() call
+QUOTE_BATCH_SIZE = int(os.getenv("QUOTE_BATCH_SIZE", "100"))
+# seconds before the name/quote type/52-week range in the tickers table is refetched
+METADATA_MAX_AGE = int(os.getenv("METADATA_MAX_AGE", str(24 * 60 * 60)))
+# seconds between refreshes of the in-progress bar while the market is open
+REFRESH_MIN_INTERVAL = int(os.getenv("REFRESH_MIN_INTERVAL", "300"))
+# max number of orders of a batch applied in a single database transaction
+ORDER_CHUNK_SIZE = int(os.getenv("ORDER_CHUNK_SIZE", "100"))
+# default and max number of transactions per page of the transaction history
+TRANSACTION_PAGE_SIZE = int(os.getenv("TRANSACTION_PAGE_SIZE", "50"))
+TRANSACTION_PAGE_MAX = int(os.getenv("TRANSACTION_PAGE_MAX", "500"))
+# rows fetched per round trip by the streaming exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# logging level, DEBUG logs every market data lookup
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
+
+logging.basicConfig(level=LOG_LEVEL)
+
+# functions called with the names of the data sets a DatabaseEditor changes, e.g. to drop cached views
+data_change_listeners = []
+
+
+# cursor wrapper counting and timing the statements sent to the database (see metrics.py)
+class InstrumentedCursor:
+    def __init__(self, cursor):
+        """
+        __init__ Initializer for the InstrumentedCursor class.
+
+        Args:
+            cursor (mysql.connector.cursor.MySQLCursor): Cursor to wrap.
+        """
+        self._cursor = cursor
+        self.round_trips = 0
 
-logging.basicConfig(level=logging.DEBUG)
+    def execute(self, operation, params=None, **kwargs):
+        self.round_trips += 1
+        with time_statement(operation):
+            return self._cursor.execute(operation, params, **kwargs)
+
+    def executemany(self, operation, seq_params, **kwargs):
+        self.round_trips += 1
+        with time_statement(operation):
+            return self._cursor.executemany(operation, seq_params, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
 
 
 # class to access and edit the database
 class DatabaseEditor:
-    def __init__(self, password: str, database: str, host="localhost", user="root"):
+    def __init__(
+        self, password: str, database: str, host="localhost", user="root", pool=None
+    ):
         """
         __init__ Initializer for the DatabaseEditor class.
 
@@ -26,32 +111,39 @@ class DatabaseEditor:
             database (str): Database name.
             host (str, optional): Database host. Defaults to "localhost".
             user (str, optional): Database user. Defaults to "root".
+            pool (ConnectionPool, optional): Pool to borrow the connection from. Defaults to None
+                (open a dedicated connection).
         """
         self.db_name = database
         self.host = host
         self.user = user
         self.password = password
+        self.pool = pool
+        self.upstream_calls = 0  # requests made to Yahoo! Finance by this editor
         self.db, self.cursor = self.connect()
 
     def connect(self):
         """
-        connect Connects to the database.
+        connect Connects to the database, borrowing the connection from the pool if there is one.
 
         Returns:
             mysql.connector.connection.MySQLConnection: Database connection.
-            mysql.connector.cursor.MySQLCursor: Database cursor.
+            InstrumentedCursor: Database cursor.
         """
         try:
-            db = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.db_name,
-            )
+            if self.pool is not None:
+                db = self.pool.acquire()
+            else:
+                db = mysql.connector.connect(
+                    host=self.host,
+                    user=self.user,
+                    password=self.password,
+                    database=self.db_name,
+                )
             if db.is_connected():
                 logging.info(f"Successfully connected to {self.db_name} database.")
 
-            return db, db.cursor()
+            return db, InstrumentedCursor(db.cursor())
         except mysql.connector.errors.ProgrammingError:
             logging.error(
                 f"Error connecting to the {self.db_name} database. Check your credentials."
@@ -59,11 +151,14 @@ class DatabaseEditor:
 
     def disconnect(self):
         """
-        disconnect Closes the self.cursor and database connection.
+        disconnect Closes the self.cursor and database connection, or returns the connection to the pool.
         """
         try:
             self.cursor.close()
-            self.db.close()
+            if self.pool is not None:
+                self.pool.release(self.db)
+            else:
+                self.db.close()
             logging.info(f"Database {self.db_name} editor closed.")
         except mysql.connector.errors.InterfaceError:
             logging.error(f"Error closing database {self.db_name} editor.")
@@ -133,15 +228,23 @@ class DatabaseEditor:
         """
         is_valid_ticker Check if a ticker is a valid Yahoo! Finance ticker.
 
+        Tickers with metadata in the tickers table are known to be valid, so only unknown
+        tickers are checked against Yahoo! Finance.
+
         Args:
             ticker_id (str): Ticker to check.
 
         Returns:
             bool: True if the ticker is valid, False otherwise.
         """
+        if self.get_ticker_metadata([ticker_id]):
+            return True
+
         try:
+            self.upstream_calls += 1
             ticker = yf.Ticker(ticker_id)
-            ticker.get_info()
+            with time_upstream("info"):
+                ticker.get_info()
             logging.debug(f"{ticker_id.upper()} is a valid Yahoo! Finance ticker.")
             return True
         except requests.exceptions.HTTPError:
@@ -154,6 +257,8 @@ class DatabaseEditor:
         """
         get_market_value Get the market value of a ticker at a specified timestamp, default to now.
 
+        Current prices are served from the process-wide quote cache (see quote_cache.py).
+
         Args:
             ticker_id (str): Ticker to get the market value of.
             timestamp (datetime, optional): Timestamp to get the market value at. Defaults to None.
@@ -161,39 +266,122 @@ class DatabaseEditor:
         Returns:
             float: Market value of the ticker at the specified timestamp.
         """
-        if self.is_valid_ticker(ticker_id):
-            ticker = yf.Ticker(ticker_id)
+        if timestamp is None:
+            return quote_cache.get_or_fetch(
+                ticker_id, lambda: self._fetch_market_value(ticker_id)
+            )
 
-            if timestamp is None:
-                timestamp = datetime.now()
-                try:
-                    logging.debug(
-                        f"Getting current market value data for {ticker_id.upper()} using ticker.info['currentPrice']."
-                    )
-                    return ticker.info["currentPrice"]
-                except:
-                    logging.debug(
-                        f"Getting current market value data for {ticker_id.upper()} using yf.download()."
-                    )
-                    data = yf.download(ticker_id, period="1d")
-                    return data["Close"][0]
-            else:
-                # convert to datetime
-                timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                try:
-                    data = ticker.history(
-                        start=timestamp - timedelta(hours=12), end=timestamp
-                    )
-                    return data["Close"][0]
-                except IndexError:
-                    logging.warning(
-                        f"Unable to get market price data for {ticker_id.upper()} at {timestamp}."
+        ticker = yf.Ticker(ticker_id)
+        # convert to datetime
+        if isinstance(timestamp, str):
+            timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+        try:
+            self.upstream_calls += 1
+            with time_upstream("history"):
+                data = ticker.history(
+                    start=timestamp - timedelta(hours=12), end=timestamp
+                )
+            return data["Close"][0]
+        except IndexError:
+            logging.warning(
+                f"Unable to get market price data for {ticker_id.upper()} at {timestamp}."
+            )
+            return None
+
+    def _fetch_market_value(self, ticker_id: str):
+        """
+        _fetch_market_value Fetch the current market value of a ticker from Yahoo! Finance.
+
+        A single ticker.info request both validates the ticker and prices it.
+
+        Args:
+            ticker_id (str): Ticker to get the market value of.
+
+        Returns:
+            float: Current market value of the ticker, None if the ticker is not valid.
+        """
+        ticker = yf.Ticker(ticker_id)
+        try:
+            self.upstream_calls += 1
+            with time_upstream("info"):
+                info = ticker.info
+        except requests.exceptions.HTTPError:
+            logging.warning(
+                f"{ticker_id.upper()} is not a valid Yahoo! Finance ticker."
+            )
+            return None
+
+        try:
+            logging.debug(
+                f"Getting current market value data for {ticker_id.upper()} using ticker.info['currentPrice']."
+            )
+            return info["currentPrice"]
+        except KeyError:
+            logging.debug(
+                f"Getting current market value data for {ticker_id.upper()} using yf.download()."
+            )
+            self.upstream_calls += 1
+            with time_upstream("download"):
+                data = yf.download(ticker_id, period="1d")
+            try:
+                return data["Close"][0]
+            except IndexError:
+                logging.warning(
+                    f"Unable to get current market value data for {ticker_id.upper()}."
+                )
+                return None
+
+    def get_market_values(self, ticker_ids: list):
+        """
+        get_market_values Get the current market value of many tickers at once.
+
+        Cached prices are used where available; the remaining tickers are priced with one
+        yf.download() call per QUOTE_BATCH_SIZE symbols. Only tickers missing from the bulk
+        download fall back to one request each. Misses go through the quote cache's single
+        flight, so concurrent callers don't download the same symbols.
+
+        Args:
+            ticker_ids (list): Tickers to get the market value of.
+
+        Returns:
+            dict: Market value for each ticker (upper case), None if it could not be priced.
+        """
+
+        def fetch(misses):
+            prices = {}
+            for i in range(0, len(misses), QUOTE_BATCH_SIZE):
+                batch = misses[i : i + QUOTE_BATCH_SIZE]
+                logging.debug(
+                    f"Getting current market value data for {batch} using yf.download()."
+                )
+                self.upstream_calls += 1
+                with time_upstream("download"):
+                    data = yf.download(
+                        batch, period="1d", group_by="ticker", progress=False
                     )
-                    return None
+
+                for ticker_id in batch:
+                    try:
+                        if isinstance(data.columns, pd.MultiIndex):
+                            closes = data[ticker_id]["Close"]
+                        else:
+                            closes = data["Close"]
+                        prices[ticker_id] = float(closes.dropna().iloc[-1])
+                    except (KeyError, IndexError):
+                        continue
+
+            # fall back to one request per symbol for anything the bulk download missed
+            for ticker_id in misses:
+                if ticker_id not in prices:
+                    prices[ticker_id] = self._fetch_market_value(ticker_id)
+            return prices
+
+        return quote_cache.get_or_fetch_many(ticker_ids, fetch)
 
     def calc_profit(self, ticker_id: str, timestamp: datetime = None):
         if timestamp is None:
-            timestamp = datetime.now()
+            # the current position is a single-row lookup in the ledger
+            return self._calc_current_profit(ticker_id)
         else: 
             # convert from str to datetime
             try:
@@ -252,6 +440,29 @@ class DatabaseEditor:
 
         return absolute_profit, percent_profit
 
+    def _calc_current_profit(self, ticker_id: str):
+        """
+        _calc_current_profit Calculates the current profit of a ticker from its positions ledger entry.
+
+        Args:
+            ticker_id (str): Ticker to calculate the profit of.
+
+        Returns:
+            tuple: Absolute profit and percent profit, both None if the ticker could not be priced.
+        """
+        position = self.get_position(ticker_id)
+        close = self.get_market_value(ticker_id)
+        if close is None:
+            logging.warning(
+                f"Unable to price {ticker_id.upper()} while calculating its profit."
+            )
+            return None, None
+
+        absolute_profit, percent_profit = position_profit(position, close)
+        logging.debug(f"Percent profit: {percent_profit:.2f}%")
+
+        return absolute_profit, percent_profit
+
     # todo: update_total_return() -- unfinished
     def update_total_return(self, ticker_id: str):
         """
@@ -264,312 +475,1161 @@ class DatabaseEditor:
         # Total Return = (Ending Value - Beginning Value) / Beginning Value
 
         curr_price = self.get_market_value(ticker_id)
-        self.cursor.execute(
-            f"SELECT num_shares, price, transaction_type FROM transactions WHERE ticker_id = '{ticker_id}'"
-        )
-        data = self.cursor.fetchall()
-
-        total_return = 0
+        if curr_price is None:
+            # keep the last total return rather than writing a -100% loss
+            logging.warning(
+                f"Unable to price {ticker_id.upper()}, its total return is not updated."
+            )
+            return
+        curr_price = float(curr_price)
+        position = self.get_position(ticker_id)
 
-        # loop through all transactions
-        for row in data:
-            if row[2] == "buy":  # skip sell transactions
-                num_shares = int(row[0])  # number of shares per transaction
-                price = float(row[1])  # buy in price at purchase time
-                total_return += num_shares * ((curr_price - price) / price)
+        # sum of num_shares * (curr_price - price) / price over all buys
+        total_return = curr_price * position["buy_weight"] - position["shares_bought"]
 
         self.cursor.execute(
             f"UPDATE portfolio SET total_return = {total_return} WHERE ticker_id = '{ticker_id}'"
         )
         self.db.commit()
 
-    def buy_ticker(self, ticker_id: str, num_shares: int, timestamp: datetime = None):
+    def get_position(self, ticker_id: str, for_update: bool = False):
         """
-        buy_ticker Method to buy a ticker and add it to the user portfolio.
+        get_position Returns the positions ledger entry of a ticker.
 
         Args:
-            ticker_id (str): Ticker symbol to buy.
-            num_shares (int): Number of shares to buy.
-            timestamp (datetime, optional): Timestamp of the purchase.
+            ticker_id (str): Ticker to get the position of.
+            for_update (bool, optional): Lock the row until the current transaction ends. Defaults to False.
 
         Returns:
-            str: Success message if the purchase was successful, error message otherwise.
+            dict: Shares held, cost basis, realized P&L, buy totals and last trade time of the ticker.
         """
-        num_shares = int(num_shares)
-
-        buy_in_price = self.get_market_value(ticker_id, timestamp)
-        portfolio_tickers = [t.upper() for t in self.get_tickers()]
-        ticker_id = ticker_id.upper()
+        query = (
+            "SELECT shares_held, total_cost, realized_pnl, shares_bought, buy_weight, last_trade_at "
+            "FROM positions WHERE ticker_id = %s"
+        )
+        if for_update:
+            query += " FOR UPDATE"
+        self.cursor.execute(query + ";", (ticker_id.upper(),))
+        row = self.cursor.fetchone()
+        if row is None:
+            return empty_position()
 
-        if buy_in_price is None:
-            msg = f"Unable to determine the market value of {ticker_id.upper()} at {timestamp}."
-            logging.warning(msg)
-            return msg
+        return self._position_from_row(row)
 
-        # check if the ticker is valid
-        if not self.is_valid_ticker(ticker_id):
-            msg = f"{ticker_id.upper()} is not a valid Yahoo! Finance ticker."
-            logging.warning(msg)
+    def get_positions(self, ticker_ids: list):
+        """
+        get_positions Returns the positions ledger entries of many tickers with one query.
 
-            return msg  # fail
+        Args:
+            ticker_ids (list): Tickers to get the position of.
 
-        elif ticker_id in portfolio_tickers:
-            logging.info(
-                f"{ticker_id.upper()} already exists in the database, updating current portfolio info for purchase."
-            )
+        Returns:
+            dict: Position for each ticker (upper case), empty for tickers never traded.
+        """
+        ticker_ids = [t.upper() for t in ticker_ids]
+        positions = {t: empty_position() for t in ticker_ids}
+        if not ticker_ids:
+            return positions
 
-            # get the current shares for the ticker in the portfolio
-            self.cursor.execute(
-                f"SELECT total_shares FROM portfolio WHERE ticker_id='{ticker_id}';"
-            )
-            shares = self.cursor.fetchone()[0]
-            # convert from str to float
-            shares = float(shares)
-            shares += num_shares
+        placeholders = ", ".join(["%s"] * len(ticker_ids))
+        self.cursor.execute(
+            "SELECT shares_held, total_cost, realized_pnl, shares_bought, buy_weight, last_trade_at, "
+            f"ticker_id FROM positions WHERE ticker_id IN ({placeholders});",
+            ticker_ids,
+        )
+        for row in self.cursor.fetchall():
+            positions[row[6].upper()] = self._position_from_row(row)
 
-            # update the shares in the portfolio
-            self.cursor.execute(
-                f"UPDATE portfolio SET total_shares={shares + num_shares} WHERE ticker_id='{ticker_id}';"
-            )
-            self.db.commit()
-            logging.info(
-                f"Added {num_shares} shares of {ticker_id.upper()} to the database."
-            )
+        return positions
 
-        else:
-            logging.info(
-                f"{ticker_id.upper()} does not exist in the database, adding to portfolio."
-            )
+    def _position_from_row(self, row):
+        """
+        _position_from_row Convert a positions row to a ledger entry.
 
-            # add to tickers
-            self.add_ticker(ticker_id)
+        Args:
+            row (tuple): shares_held, total_cost, realized_pnl, shares_bought, buy_weight and
+                last_trade_at columns, in that order.
 
-            # insert the ticker into the portfolio
-            asset_type = self.get_asset_type(ticker_id)
-            self.cursor.execute(
-                f"INSERT INTO portfolio (ticker_id, total_shares, total_return, asset_type) VALUES ('{ticker_id}', {num_shares}, 0, '{asset_type}');"
-            )
-            self.db.commit()
-            logging.info(f"Added {ticker_id.upper()} to user portfolio.")
+        Returns:
+            dict: Position, see empty_position.
+        """
+        return {
+            "shares_held": int(row[0]),
+            "total_cost": float(row[1]),
+            "realized_pnl": float(row[2]),
+            "shares_bought": int(row[3]),
+            "buy_weight": float(row[4]),
+            "last_trade_at": row[5],
+        }
+
+    def _save_positions(self, positions: dict):
+        """
+        _save_positions Write positions ledger entries, without committing.
 
-        # add purchase to transaction history
-        if timestamp is not None:
-            query = f"INSERT INTO transactions (ticker_id, num_shares, price, transaction_type, date) VALUES ('{ticker_id}', {num_shares}, {buy_in_price}, 'buy', '{timestamp}');"
-            print("QUERY: ", query)
-            self.cursor.execute(query)
-        else:
-            self.cursor.execute(
-                f"INSERT INTO transactions (ticker_id, num_shares, price, transaction_type) VALUES ('{ticker_id}', {num_shares}, {buy_in_price}, 'buy');"
-            )
-            self.db.commit()
-            logging.info(f"Added purchase {ticker_id.upper()} to transaction history.")
+        Args:
+            positions (dict): Position for each ticker.
+        """
+        self.cursor.executemany(
+            "INSERT INTO positions (ticker_id, shares_held, total_cost, realized_pnl, shares_bought, buy_weight, last_trade_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE shares_held = VALUES(shares_held), total_cost = VALUES(total_cost), "
+            "realized_pnl = VALUES(realized_pnl), shares_bought = VALUES(shares_bought), "
+            "buy_weight = VALUES(buy_weight), last_trade_at = VALUES(last_trade_at);",
+            [
+                (
+                    ticker_id,
+                    p["shares_held"],
+                    p["total_cost"],
+                    p["realized_pnl"],
+                    p["shares_bought"],
+                    p["buy_weight"],
+                    p["last_trade_at"],
+                )
+                for ticker_id, p in positions.items()
+            ],
+        )
 
-        # backlog the history in the ticker_data table
-        self.backlog_ticker_data(ticker_id, timestamp)
+    def rebuild_positions(self, verify_only: bool = False):
+        """
+        rebuild_positions Replay the transactions table and compare it with the positions ledger and portfolio.
 
-        return f"Success! Purchased {num_shares} shares of {ticker_id.upper()} for ${buy_in_price:.2f} each."
+        Args:
+            verify_only (bool, optional): Only report the differences, don't fix them. Defaults to False.
 
-    def backlog_ticker_data(self, ticker_id: str, timestamp: datetime = None):
-        # get the history of the ticker
-        ticker = yf.Ticker(ticker_id)
-        if timestamp is None:
-            ticker_history = ticker.history(period="1d")
-        else:
-            ticker_history = ticker.history(start=timestamp, end=datetime.now())
+        Returns:
+            list: One dict per ticker whose ledger entry or portfolio.total_shares differs from the replay.
+        """
+        self.cursor.execute(
+            "SELECT ticker_id, num_shares, price, transaction_type, date FROM transactions "
+            "ORDER BY date, transaction_num;"
+        )
+        expected = replay(self.cursor.fetchall())
+
+        self.cursor.execute("SELECT ticker_id FROM positions;")
+        ledger_tickers = [t[0].upper() for t in self.cursor.fetchall()]
+        stored = {t: self.get_position(t) for t in ledger_tickers}
+
+        self.cursor.execute("SELECT ticker_id, total_shares FROM portfolio;")
+        portfolio_shares = {t.upper(): s for t, s in self.cursor.fetchall()}
+
+        mismatches = []
+        for ticker_id in sorted(set(expected) | set(stored)):
+            want = expected.get(ticker_id, empty_position())
+            have = stored.get(ticker_id, empty_position())
+            # total_cost and realized_pnl are stored with 4 decimals
+            ledger_ok = (
+                want["shares_held"] == have["shares_held"]
+                and want["shares_bought"] == have["shares_bought"]
+                and abs(want["total_cost"] - have["total_cost"]) < 1e-3
+                and abs(want["realized_pnl"] - have["realized_pnl"]) < 1e-3
+                and abs(want["buy_weight"] - have["buy_weight"]) < 1e-6
+            )
+            portfolio_ok = (
+                ticker_id not in portfolio_shares
+                or float(portfolio_shares[ticker_id]) == want["shares_held"]
+            )
+            if not (ledger_ok and portfolio_ok):
+                mismatches.append(
+                    {
+                        "ticker_id": ticker_id,
+                        "expected": want,
+                        "ledger": have,
+                        "portfolio_shares": portfolio_shares.get(ticker_id),
+                    }
+                )
 
-        for row in ticker_history.iterrows():
-            OPEN = row[1][0]
-            HIGH = row[1][1]
-            LOW = row[1][2]
-            CLOSE = row[1][3]
-            VOL = row[1][4]
-            TIMESTAMP = row[0]
+        for mismatch in mismatches:
+            logging.warning(
+                f"Position of {mismatch['ticker_id']} does not match its transactions: "
+                f"ledger {mismatch['ledger']['shares_held']} shares, portfolio "
+                f"{mismatch['portfolio_shares']} shares, expected {mismatch['expected']['shares_held']}."
+            )
 
-            self.cursor.execute(
-                f"INSERT INTO ticker_data (ticker_id, open, close, high, low, volume, date) "
-                f"VALUES ('{ticker_id}', {OPEN}, {CLOSE}, {HIGH}, {LOW}, {VOL}, '{TIMESTAMP}') "
-                f"ON DUPLICATE KEY UPDATE "
-                f"open = {OPEN}, close = {CLOSE}, high = {HIGH}, low = {LOW}, volume = {VOL}, date = '{TIMESTAMP}';"
+        if mismatches and not verify_only:
+            self._save_positions({m["ticker_id"]: m["expected"] for m in mismatches})
+            self.cursor.executemany(
+                "UPDATE portfolio SET total_shares = %s WHERE ticker_id = %s;",
+                [
+                    (m["expected"]["shares_held"], m["ticker_id"])
+                    for m in mismatches
+                    if m["portfolio_shares"] is not None
+                ],
             )
+            self._bump_data_versions(["portfolio"])
             self.db.commit()
+            logging.info(f"Rebuilt {len(mismatches)} positions from the transactions.")
 
-            # Calculate profits
-            abs_profit, percent_profit = self.calc_profit(ticker_id, TIMESTAMP)
+        return mismatches
 
-            # Update with calculated profits
-            self.cursor.execute(
-                f"UPDATE ticker_data "
-                f"SET abs_profit = {abs_profit}, percent_profit = {percent_profit} "
-                f"WHERE ticker_id = '{ticker_id}' AND date = '{TIMESTAMP}';"
-            )
-            self.db.commit()
+    def buy_ticker(self, ticker_id: str, num_shares: int, timestamp: datetime = None):
+        """
+        buy_ticker Method to buy a ticker and add it to the user portfolio.
 
-    def sell_ticker(self, ticker_id: str, num_shares: int, timestamp: datetime = None):
+        Args:
+            ticker_id (str): Ticker symbol to buy.
+            num_shares (int): Number of shares to buy.
+            timestamp (datetime, optional): Timestamp of the purchase.
+
+        Returns:
+            str: Success message if the purchase was successful, error message otherwise.
         """
-        sell_ticker Method to sell a ticker from the user portfolio.
+        return self.execute_trade(ticker_id, num_shares, "buy", timestamp)["message"]
+
+    def execute_trade(
+        self,
+        ticker_id: str,
+        num_shares: int,
+        transaction_type: str,
+        timestamp: datetime = None,
+    ):
+        """
+        execute_trade Buy or sell a ticker with one pricing call and a single database transaction.
+
+        The ticker is validated and priced once (current prices come from the quote cache), its
+        ledger row is locked with SELECT ... FOR UPDATE, and the transaction, ledger, portfolio and
+        tickers rows are written and committed together. The price history is not downloaded here:
+        the ticker's high-water mark is moved back so the next refresh fetches the missing bars.
+        The wall time, database round trips and upstream calls of every trade are recorded in
+        trade_stats.
 
         Args:
-            ticker_id (str): Ticker symbol to sell.
-            num_shares (int): Number of shares to sell.
+            ticker_id (str): Ticker symbol to trade.
+            num_shares (int): Number of shares to buy or sell.
+            transaction_type (str): "buy" or "sell".
+            timestamp (datetime, optional): Timestamp of the trade. Defaults to None (now).
 
         Returns:
-            str: Success message if the sale was successful, error message otherwise.
+            dict: "status" ("ok" or "error"), "message" and, on success, the shares traded and price.
         """
-        sale_price = self.get_market_value(ticker_id, timestamp)
-        num_shares = int(num_shares)
-        portfolio_tickers = [t.upper() for t in self.get_tickers()]
+        start = time.perf_counter()
+        round_trips = self.cursor.round_trips
+        upstream_calls = self.upstream_calls
         ticker_id = ticker_id.upper()
-
-        if sale_price is None:
-            msg = f"Unable to determine the market value of {ticker_id.upper()} at {timestamp}."
-            logging.warning(msg)
-            return msg
-        if not self.is_valid_ticker(ticker_id):
-            msg = f"{ticker_id.upper()} is not a valid Yahoo! Finance ticker."
+        num_shares = int(num_shares)
+        if num_shares <= 0:
+            msg = (
+                f"Invalid order: {transaction_type} {num_shares} shares of {ticker_id}."
+            )
             logging.warning(msg)
-            return msg
-        elif ticker_id not in self.get_tickers():
-            msg = f"{ticker_id.upper()} is not in the user portfolio, there are no shares to sell."
+            return {"status": "error", "message": msg}
+
+        # validate and price the ticker with a single upstream call
+        price = self.get_market_value(ticker_id, timestamp)
+        if price is None:
+            msg = f"Unable to determine the market value of {ticker_id} at {timestamp}."
             logging.warning(msg)
-            return msg
-        else:
-            logging.info(
-                f"{ticker_id.upper()} exists in the database, updating current portfolio info for sale."
-            )
+            return {"status": "error", "message": msg}
+        price = float(price)
 
-            # get the current shares for the ticker in the portfolio
-            self.cursor.execute(
-                f"SELECT total_shares FROM portfolio WHERE ticker_id='{ticker_id}';"
+        try:
+            result = self._apply_trade(
+                ticker_id, num_shares, transaction_type, price, timestamp
             )
-            shares = self.cursor.fetchone()[0]
-            # convert shares from str to float
-            shares = float(shares)
-
-            # check if the user is trying to sell more shares than they own
-            if num_shares > shares:
-                logging.warning(
-                    f"Cannot sell {num_shares} shares of {ticker_id.upper()}, only {shares} shares are owned. Selling all ({shares}) shares."
-                )
-
-            # number of shares to sell
-            to_sell = min(num_shares, shares)
-
-            if to_sell == shares:
-                self.cursor.execute(
-                    f"DELETE FROM portfolio WHERE ticker_id='{ticker_id}';"
-                )
+            if result["status"] == "ok":
+                self._bump_data_versions(self._trade_data_versions([ticker_id]))
                 self.db.commit()
-
-                # delete ticker_data history for that ticker
-                self.cursor.execute(
-                    f"DELETE FROM ticker_data WHERE ticker_id='{ticker_id}';"
-                )
             else:
-                # update the shares in the portfolio
-                self.cursor.execute(
-                    f"UPDATE portfolio SET total_shares=total_shares - {to_sell} WHERE ticker_id='{ticker_id}';"
-                )
-
-            self.db.commit()
-            logging.info(
-                f"Sold {to_sell} shares of {ticker_id.upper()} for {sale_price} each."
-            )
+                self.db.rollback()
+            self.cursor.round_trips += 1  # commit or rollback
+        except mysql.connector.Error as e:
+            self.db.rollback()
+            msg = f"Unable to {transaction_type} {ticker_id}: {e}"
+            logging.error(msg)
+            return {"status": "error", "message": msg}
+
+        wall_ms = (time.perf_counter() - start) * 1000
+        trade_stats.record(
+            ticker_id,
+            wall_ms,
+            self.cursor.round_trips - round_trips,
+            self.upstream_calls - upstream_calls,
+        )
+        return result
 
-            if timestamp is not None:
-                self.cursor.execute(
-                    f"INSERT INTO transactions (ticker_id, num_shares, price, transaction_type, date) VALUES ('{ticker_id}', {to_sell}, {-sale_price}, 'sell', '{timestamp}');"
-                )
-            else:
-                # add sale to transaction history
-                self.cursor.execute(
-                    f"INSERT INTO transactions (ticker_id, num_shares, price, transaction_type) VALUES ('{ticker_id}', {to_sell}, {-sale_price}, 'sell');"
-                )
+    def execute_orders(self, orders: list, chunk_size: int = ORDER_CHUNK_SIZE):
+        """
+        execute_orders Execute a batch of buy and sell orders.
 
-            self.db.commit()
+        Every symbol is priced with one batched request and the metadata of all bought tickers is
+        read with one query. Orders are then applied in the given order, committing once per
+        chunk of chunk_size orders: if the database fails part way through a chunk, the whole
+        chunk is rolled back. Orders that fail validation (bad input, unknown ticker, nothing to
+        sell) are reported individually and do not affect the others.
 
-            return f"Success! Sold {to_sell} shares of {ticker_id.upper()} for ${sale_price:.2f} each."
+        Args:
+            orders (list): Dicts with "ticker_id", "num_shares" and "transaction_type" ("buy" or "sell").
+            chunk_size (int, optional): Max number of orders per database transaction. Defaults to ORDER_CHUNK_SIZE.
 
-    def update_ticker_data(self):
-        """
-        update_ticker_data Method to refresh the database with the latest ticker data.
+        Returns:
+            dict: Per-order results (same order as the input), success/failure counts and throughput.
         """
+        start = time.perf_counter()
+        round_trips = self.cursor.round_trips
+        upstream_calls = self.upstream_calls
+        results = [None] * len(orders)
 
-        # get all tickers from the database (ones in the portfolio)
-        tickers = self.get_tickers()
-        TIMESTAMP = datetime.now()
-        for ticker in tickers:
-            data = yf.download(ticker, period="1d")
+        parsed = []  # (index, ticker_id, num_shares, transaction_type)
+        for i, order in enumerate(orders):
             try:
-                OPEN = data["Open"][0]
-                CLOSE = data["Close"][0]
-                HIGH = data["High"][0]
-                LOW = data["Low"][0]
-                VOL = data["Volume"][0]
-            except IndexError:
-                logging.warning(
-                    f"Unable to get current market value data for {ticker.upper()}."
-                )
-                return None
+                ticker_id = str(order["ticker_id"]).upper()
+                num_shares = int(order["num_shares"])
+                transaction_type = str(order["transaction_type"]).lower()
+            except (KeyError, TypeError, ValueError):
+                results[i] = {
+                    "status": "error",
+                    "message": "Orders need a ticker_id, an integer num_shares and a transaction_type.",
+                }
+                continue
+            if transaction_type not in ("buy", "sell") or num_shares <= 0:
+                results[i] = {
+                    "status": "error",
+                    "message": f"Invalid order: {transaction_type} {num_shares} shares of {ticker_id}.",
+                }
+                continue
+            parsed.append((i, ticker_id, num_shares, transaction_type))
 
-            # add to the database
-            self.cursor.execute(
-                f"INSERT INTO ticker_data (ticker_id, open, close, high, low, volume) "
-                f"VALUES ('{ticker}', {OPEN}, {CLOSE}, {HIGH}, {LOW}, {VOL}, '{TIMESTAMP}') "
-                f"ON DUPLICATE KEY UPDATE "
-                f"open = {OPEN}, close = {CLOSE}, high = {HIGH}, low = {LOW}, volume = {VOL}, date = '{TIMESTAMP}';"
+        # price every symbol with one batched request
+        prices = self.get_market_values([p[1] for p in parsed]) if parsed else {}
+
+        # read the metadata of the bought tickers at once, fetching tickers seen for the first time
+        bought = list(
+            dict.fromkeys(
+                t for _, t, _, tt in parsed if tt == "buy" and prices[t] is not None
             )
+        )
+        metadata = self.get_ticker_metadata(bought)
+        new_rows = [self._fetch_ticker_metadata(t) for t in bought if t not in metadata]
+        new_rows = [r for r in new_rows if r is not None]
+        if new_rows:
+            self._upsert_ticker_metadata(new_rows)
             self.db.commit()
+            self.cursor.round_trips += 1
+            metadata.update({r["ticker_id"]: r for r in new_rows})
+
+        pending = []
+        for i, ticker_id, num_shares, transaction_type in parsed:
+            if prices[ticker_id] is None:
+                msg = f"Unable to determine the market value of {ticker_id}."
+            elif transaction_type == "buy" and ticker_id not in metadata:
+                msg = f"{ticker_id} is not a valid Yahoo! Finance ticker."
+            else:
+                pending.append((i, ticker_id, num_shares, transaction_type))
+                continue
+            logging.warning(msg)
+            results[i] = {"status": "error", "message": msg}
 
-    def add_ticker(self, ticker_id: str):
+        for c in range(0, len(pending), chunk_size):
+            chunk = pending[c : c + chunk_size]
+            chunk_results = {}
+            try:
+                for i, ticker_id, num_shares, transaction_type in chunk:
+                    chunk_results[i] = self._apply_trade(
+                        ticker_id,
+                        num_shares,
+                        transaction_type,
+                        float(prices[ticker_id]),
+                        metadata=metadata.get(ticker_id),
+                    )
+                traded = [
+                    t for i, t, _, _ in chunk if chunk_results[i]["status"] == "ok"
+                ]
+                if traded:
+                    self._bump_data_versions(self._trade_data_versions(traded))
+                self.db.commit()
+            except mysql.connector.Error as e:
+                self.db.rollback()
+                logging.error(f"Rolled back a chunk of {len(chunk)} orders: {e}")
+                chunk_results = {
+                    i: {
+                        "status": "error",
+                        "message": f"Rolled back with {len(chunk)} other orders: {e}",
+                    }
+                    for i, _, _, _ in chunk
+                }
+            self.cursor.round_trips += 1  # commit or rollback
+            for i, result in chunk_results.items():
+                results[i] = result
+
+        seconds = time.perf_counter() - start
+        succeeded = sum(r["status"] == "ok" for r in results)
+        trade_stats.record_batch(
+            len(orders),
+            succeeded,
+            seconds * 1000,
+            self.cursor.round_trips - round_trips,
+            self.upstream_calls - upstream_calls,
+        )
+        logging.info(
+            f"Executed {succeeded}/{len(orders)} orders in {seconds:.3f}s "
+            f"({len(orders) / seconds:.1f} orders/s)."
+        )
+
+        return {
+            "orders": len(orders),
+            "succeeded": succeeded,
+            "failed": len(orders) - succeeded,
+            "seconds": seconds,
+            "orders_per_sec": len(orders) / seconds if seconds > 0 else None,
+            "results": results,
+        }
+
+    def _apply_trade(
+        self,
+        ticker_id: str,
+        num_shares: int,
+        transaction_type: str,
+        price: float,
+        timestamp: datetime = None,
+        metadata: dict = None,
+    ):
         """
-        add_ticker Adds a ticker to the tickers table if it doesn't already exist and is a valid Yahoo! Finance ticker.
+        _apply_trade Write one priced trade to the database, without committing.
 
         Args:
-            ticker_id (str): Ticker to add to the database.
+            ticker_id (str): Ticker symbol to trade (upper case).
+            num_shares (int): Number of shares to buy or sell.
+            transaction_type (str): "buy" or "sell".
+            price (float): Price per share (positive).
+            timestamp (datetime, optional): Timestamp of the trade. Defaults to None (now).
+            metadata (dict, optional): Stored metadata of the ticker, see get_ticker_metadata.
+                Defaults to None (looked up, and fetched for new tickers, on buys).
+
+        Returns:
+            dict: "status" ("ok" or "error"), "message" and, on success, the shares traded and price.
         """
+        if transaction_type not in ("buy", "sell"):
+            msg = f"Unknown transaction type {transaction_type}."
+            logging.warning(msg)
+            return {"status": "error", "message": msg}
+
+        if transaction_type == "buy" and metadata is None:
+            # tickers seen for the first time need their metadata (and a tickers row) first
+            metadata = self.get_ticker_metadata([ticker_id]).get(ticker_id)
+            if metadata is None:
+                metadata = self._fetch_ticker_metadata(ticker_id)
+                if metadata is None:
+                    msg = f"{ticker_id} is not a valid Yahoo! Finance ticker."
+                    logging.warning(msg)
+                    return {"status": "error", "message": msg}
+                self._upsert_ticker_metadata([metadata])
+
+        # lock the ledger row so concurrent trades on the ticker are applied one at a time
+        position = self.get_position(ticker_id, for_update=True)
+        held = position["shares_held"]
+
+        if transaction_type == "buy":
+            traded = num_shares
+            stored_price = price
+        else:
+            if held <= 0:
+                msg = f"{ticker_id} is not in the user portfolio, there are no shares to sell."
+                logging.warning(msg)
+                return {"status": "error", "message": msg}
+            if num_shares > held:
+                logging.warning(
+                    f"Cannot sell {num_shares} shares of {ticker_id}, only {held} shares are owned. Selling all ({held}) shares."
+                )
+            traded = min(num_shares, held)
+            # note: price is stored as a negative number for sell transactions
+            stored_price = -price
 
-        # check if the ticker is valid
-        if not self.is_valid_ticker(ticker_id):
-            return  # fail
+        if timestamp is None:
+            timestamp = datetime.now()
+        elif isinstance(timestamp, str):
+            timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
 
-        try:
+        self.cursor.execute(
+            "INSERT INTO transactions (ticker_id, num_shares, price, transaction_type, date) "
+            "VALUES (%s, %s, %s, %s, %s);",
+            (ticker_id, traded, stored_price, transaction_type, timestamp),
+        )
+        position = apply_trade(
+            position, transaction_type, traded, stored_price, timestamp
+        )
+        self._save_positions({ticker_id: position})
+
+        if position["shares_held"] > 0:
+            # the asset type of a new row comes from the metadata, or the tickers table on sells
             self.cursor.execute(
-                f"INSERT INTO tickers (ticker_id) VALUES ('{ticker_id}');"
+                "INSERT INTO portfolio (ticker_id, total_shares, total_return, asset_type) "
+                "VALUES (%s, %s, 0, COALESCE(%s, (SELECT quote_type FROM tickers WHERE ticker_id = %s), 'N/A')) "
+                "ON DUPLICATE KEY UPDATE total_shares = VALUES(total_shares);",
+                (
+                    ticker_id,
+                    position["shares_held"],
+                    None if metadata is None else metadata["quote_type"],
+                    ticker_id,
+                ),
+            )
+            # 1 for an inserted row, 2 for an updated one and 0 if unchanged
+            if self.cursor.rowcount == 1:
+                logging.info(f"Added {ticker_id} to user portfolio.")
+            # refetch the bars from the trade date on the next refresh, their profit changed
+            self.cursor.execute(
+                "UPDATE tickers SET last_bar_at = LEAST(COALESCE(last_bar_at, %s), %s), "
+                "checked_at = NULL WHERE ticker_id = %s;",
+                (timestamp, timestamp, ticker_id),
+            )
+        else:
+            self.cursor.execute(
+                "DELETE FROM portfolio WHERE ticker_id = %s;", (ticker_id,)
+            )
+            # delete ticker_data history for that ticker
+            self.cursor.execute(
+                "DELETE FROM ticker_data WHERE ticker_id = %s;", (ticker_id,)
+            )
+            # and reset its high-water mark so a new position is backfilled again
+            self.cursor.execute(
+                "UPDATE tickers SET last_bar_at = NULL, checked_at = NULL WHERE ticker_id = %s;",
+                (ticker_id,),
             )
-            print("HERE")
-            logging.info(f"Added {ticker_id.upper()} to the tickers table.")
-            self.db.commit()
-
-        except mysql.connector.errors.IntegrityError:
-            logging.warning(f"{ticker_id.upper()} already exists in the database.")
-            return  # fail
 
-        # commit changes to the database
-        logging.info(f"Added {ticker_id.upper()} to the database.")
+        if transaction_type == "buy":
+            msg = f"Success! Purchased {traded} shares of {ticker_id} for ${price:.2f} each."
+        else:
+            msg = f"Success! Sold {traded} shares of {ticker_id} for ${price:.2f} each."
+        logging.info(msg)
+
+        return {
+            "status": "ok",
+            "message": msg,
+            "ticker_id": ticker_id,
+            "transaction_type": transaction_type,
+            "num_shares": traded,
+            "price": price,
+        }
 
-    def add_tickers(self, ticker_ids: list):
+    def backlog_ticker_data(self, ticker_id: str, timestamp: datetime = None):
         """
-        add_tickers Method to add multiple tickers to the database at once.
+        backlog_ticker_data Download the price history of a ticker and store it in the ticker_data table.
 
         Args:
-            ticker_ids (list): A list of tickers to add to the database.
-        """
-        for ticker_id in ticker_ids:
-            self.add_ticker(ticker_id)
+            ticker_id (str): Ticker to backlog.
+            timestamp (datetime, optional): Start of the history. Defaults to None (latest day only).
 
-    def get_ticker_data(self, ticker_id: str):
+        Returns:
+            dict: Ingestion stats, see ingest_ticker_history.
         """
-        get_ticker_data Returns all data for a given ticker in the ticker_data table.
-
+        # get the history of the ticker
+        self.upstream_calls += 1
+        ticker = yf.Ticker(ticker_id)
+        with time_upstream("history"):
+            if timestamp is None:
+                ticker_history = ticker.history(period="1d")
+            else:
+                ticker_history = ticker.history(start=timestamp, end=datetime.now())
+
+        return self.ingest_ticker_history(ticker_id, ticker_history)
+
+    def ingest_ticker_history(self, ticker_id: str, ticker_history: pd.DataFrame):
+        """
+        ingest_ticker_history Upsert a batch of price bars and their profit columns into ticker_data.
+
+        The transactions of the ticker are read once and the profit of every bar is computed in
+        one vectorized pass, then the whole batch and the ticker's high-water mark (tickers.last_bar_at) are
+        written with one parameterized executemany and a single commit. Nothing is written if
+        any row fails. The running return statistics are then updated in a second transaction,
+        see update_return_stats.
+
         Args:
-            ticker_id (str): Ticker to get data for.
+            ticker_id (str): Ticker the bars belong to.
+            ticker_history (pd.DataFrame): Bars as returned by yf.Ticker.history().
+
+        Returns:
+            dict: Number of rows written, elapsed seconds and rows per second.
+        """
+        start = time.perf_counter()
+        ticker_id = ticker_id.upper()
+
+        ticker_history = ticker_history.dropna(subset=["Close"]).fillna({"Volume": 0})
+        if ticker_history.empty:
+            return {"rows": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+
+        # store bars in exchange-local time without the utc offset
+        dates = ticker_history.index
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        dates = [d.to_pydatetime() for d in dates]
+        closes = [float(c) for c in ticker_history["Close"]]
+
+        profits = self._calc_profits(ticker_id, dates, closes)
+
+        rows = []
+        for i, (_, bar) in enumerate(ticker_history.iterrows()):
+            abs_profit, percent_profit = profits[i]
+            rows.append(
+                (
+                    ticker_id,
+                    float(bar["Open"]),
+                    closes[i],
+                    float(bar["High"]),
+                    float(bar["Low"]),
+                    int(bar["Volume"]),
+                    dates[i],
+                    abs_profit,
+                    percent_profit,
+                )
+            )
+
+        try:
+            self.cursor.executemany(
+                "INSERT INTO ticker_data (ticker_id, open, close, high, low, volume, date, abs_profit, percent_profit) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE open = VALUES(open), close = VALUES(close), high = VALUES(high), "
+                "low = VALUES(low), volume = VALUES(volume), abs_profit = VALUES(abs_profit), "
+                "percent_profit = VALUES(percent_profit);",
+                rows,
+            )
+            # move the high-water mark in the same transaction as the bars
+            self.cursor.execute(
+                "UPDATE tickers SET last_bar_at = GREATEST(COALESCE(last_bar_at, %s), %s) "
+                "WHERE ticker_id = %s;",
+                (dates[-1], dates[-1], ticker_id),
+            )
+            self._bump_data_versions(["ticker_data", f"ticker_data:{ticker_id}"])
+            # the counter row is locked until the commit, this is the version of our bars
+            version = self.get_data_versions([f"ticker_data:{ticker_id}"])
+            self.db.commit()
+        except mysql.connector.Error:
+            self.db.rollback()
+            logging.error(
+                f"Unable to store price history for {ticker_id}, rolled back."
+            )
+            raise
+
+        if OHLCV_STORE_ENABLED:
+            ohlcv_store(self.db_name).upsert(
+                ticker_id,
+                bars_from_rows(
+                    [(r[6], r[1], r[3], r[4], r[2], r[5], r[7], r[8]) for r in rows]
+                ),
+                version[f"ticker_data:{ticker_id}"],
+            )
+
+        try:
+            self.update_return_stats(ticker_id, since=dates[0])
+        except mysql.connector.Error:
+            # the bars are stored, the next ingestion of the ticker folds them
+            pass
+
+        elapsed = time.perf_counter() - start
+        rows_per_sec = len(rows) / elapsed if elapsed > 0 else float(len(rows))
+        logging.info(
+            f"Ingested {len(rows)} bars for {ticker_id} in {elapsed:.3f}s ({rows_per_sec:.0f} rows/s)."
+        )
+
+        return {"rows": len(rows), "seconds": elapsed, "rows_per_sec": rows_per_sec}
+
+    def _is_current(self, checked_at: datetime, now: datetime):
+        """
+        _is_current Check if a ticker checked at checked_at already has the bars of the current session.
+
+        Args:
+            checked_at (datetime): Last time upstream was asked for new bars, None if never.
+            now (datetime): Exchange-local time.
+
+        Returns:
+            bool: True if there is nothing new to fetch, False otherwise.
+        """
+        if checked_at is None:
+            return False
+        if is_market_open(now):
+            # the bar of the session is still moving, refetch it every REFRESH_MIN_INTERVAL
+            return checked_at >= now - timedelta(seconds=REFRESH_MIN_INTERVAL)
+        # the latest session is over, one check after its close gets its final bar
+        return checked_at >= session_close(session_date(now))
+
+    def refresh_ticker_data(self, ticker_ids: list = None, force: bool = False):
+        """
+        refresh_ticker_data Fetch only the bars newer than each ticker's high-water mark.
+
+        Tickers that were already checked for the current trading session are skipped without
+        any upstream call, unless force is set. Tickers without a high-water mark are backfilled
+        from their first transaction.
+
+        Args:
+            ticker_ids (list, optional): Tickers to refresh. Defaults to None (the user portfolio).
+            force (bool, optional): Refresh the tickers whatever their checked_at, e.g. after a
+                trade cleared it while a refresh in progress could write it back. Defaults to False.
+
+        Returns:
+            dict: Refreshed and skipped tickers and the number of bars written.
+        """
+        if ticker_ids is None:
+            ticker_ids = self.get_tickers()
+        ticker_ids = [t.upper() for t in ticker_ids]
+        result = {"refreshed": [], "skipped": [], "rows": 0}
+        if not ticker_ids:
+            return result
+
+        placeholders = ", ".join(["%s"] * len(ticker_ids))
+        self.cursor.execute(
+            f"SELECT t.ticker_id, t.last_bar_at, t.checked_at, MIN(tr.date) FROM tickers t "
+            f"LEFT JOIN transactions tr ON tr.ticker_id = t.ticker_id "
+            f"WHERE t.ticker_id IN ({placeholders}) "
+            f"GROUP BY t.ticker_id, t.last_bar_at, t.checked_at;",
+            ticker_ids,
+        )
+        watermarks = self.cursor.fetchall()
+
+        now = market_now()
+        for ticker_id, last_bar_at, checked_at, first_trade_at in watermarks:
+            if not force and self._is_current(checked_at, now):
+                result["skipped"].append(ticker_id)
+                continue
+
+            self.upstream_calls += 1
+            ticker = yf.Ticker(ticker_id)
+            with time_upstream("history"):
+                if last_bar_at is not None:
+                    # refetch the last stored day too, its bar may have been taken mid-session
+                    ticker_history = ticker.history(start=last_bar_at.date())
+                elif first_trade_at is not None:
+                    ticker_history = ticker.history(start=first_trade_at.date())
+                else:
+                    ticker_history = ticker.history(period="1d")
+
+            stats = self.ingest_ticker_history(ticker_id, ticker_history)
+            result["refreshed"].append(ticker_id)
+            result["rows"] += stats["rows"]
+
+        if result["refreshed"]:
+            self.cursor.executemany(
+                "UPDATE tickers SET checked_at = %s WHERE ticker_id = %s;",
+                [(now, t) for t in result["refreshed"]],
+            )
+            self.db.commit()
+
+        logging.info(
+            f"Refreshed {len(result['refreshed'])} tickers ({result['rows']} bars), "
+            f"{len(result['skipped'])} already current."
+        )
+        return result
+
+    def _load_transactions(self, ticker_id: str, until: datetime = None):
+        """
+        _load_transactions Load the transactions of a ticker into a DataFrame with one query.
+
+        Args:
+            ticker_id (str): Ticker to load the transactions of.
+            until (datetime, optional): Only load transactions up to this date. Defaults to None.
+
+        Returns:
+            pd.DataFrame: date, num_shares, price and transaction_type columns, ordered by date.
+        """
+        query = "SELECT date, num_shares, price, transaction_type FROM transactions WHERE ticker_id = %s"
+        params = [ticker_id]
+        if until is not None:
+            query += " AND date <= %s"
+            params.append(until)
+        self.cursor.execute(query + " ORDER BY date;", params)
+
+        return pd.DataFrame(
+            self.cursor.fetchall(),
+            columns=["date", "num_shares", "price", "transaction_type"],
+        )
+
+    def _calc_profits(self, ticker_id: str, dates: list, closes: list):
+        """
+        _calc_profits Calculate the profit of a ticker at many dates with one transactions query.
+
+        Gives the same result as calling calc_profit for each date, see profit_engine.profit_series.
+
+        Args:
+            ticker_id (str): Ticker to calculate the profit of.
+            dates (list): Ascending datetimes of the bars.
+            closes (list): Closing price of each bar.
+
+        Returns:
+            list: (absolute profit, percent profit) for each date.
+        """
+        last_day = dates[-1].replace(hour=0, minute=0, second=0, microsecond=0)
+        transactions = self._load_transactions(ticker_id, until=last_day)
+        profits = profit_series(transactions, dates, closes)
+
+        return list(
+            zip(
+                profits["abs_profit"].tolist(),
+                profits["percent_profit"].tolist(),
+            )
+        )
+
+    def recompute_profits(self, ticker_ids: list = None):
+        """
+        recompute_profits Recalculate the abs_profit and percent_profit columns of every stored bar.
+
+        Each ticker costs two reads (bars and transactions) and one batched update, whatever the
+        number of bars and transactions.
+
+        Args:
+            ticker_ids (list, optional): Tickers to recompute. Defaults to None (every ticker in ticker_data).
+
+        Returns:
+            int: Number of bars updated.
+        """
+        if ticker_ids is None:
+            self.cursor.execute("SELECT DISTINCT ticker_id FROM ticker_data;")
+            ticker_ids = [t[0] for t in self.cursor.fetchall()]
+
+        updated = 0
+        for ticker_id in ticker_ids:
+            ticker_id = ticker_id.upper()
+            self.cursor.execute(
+                "SELECT date, close FROM ticker_data WHERE ticker_id = %s ORDER BY date;",
+                (ticker_id,),
+            )
+            bars = self.cursor.fetchall()
+            if not bars:
+                continue
+
+            dates = [b[0] for b in bars]
+            profits = profit_series(
+                self._load_transactions(ticker_id), dates, [b[1] for b in bars]
+            )
+
+            self.cursor.executemany(
+                "UPDATE ticker_data SET abs_profit = %s, percent_profit = %s "
+                "WHERE ticker_id = %s AND date = %s;",
+                [
+                    (abs_profit, percent_profit, ticker_id, date)
+                    for date, abs_profit, percent_profit in zip(
+                        dates,
+                        profits["abs_profit"].tolist(),
+                        profits["percent_profit"].tolist(),
+                    )
+                ],
+            )
+            self._bump_data_versions(["ticker_data", f"ticker_data:{ticker_id}"])
+            self.db.commit()
+            updated += len(bars)
+            logging.info(f"Recomputed profits for {len(bars)} bars of {ticker_id}.")
+
+        return updated
+
+    def sell_ticker(self, ticker_id: str, num_shares: int, timestamp: datetime = None):
+        """
+        sell_ticker Method to sell a ticker from the user portfolio.
+
+        Args:
+            ticker_id (str): Ticker symbol to sell.
+            num_shares (int): Number of shares to sell.
+
+        Returns:
+            str: Success message if the sale was successful, error message otherwise.
+        """
+        return self.execute_trade(ticker_id, num_shares, "sell", timestamp)["message"]
+
+    def update_ticker_data(self, ticker_ids: list = None, force: bool = False):
+        """
+        update_ticker_data Method to refresh the database with the latest ticker data and metadata.
+
+        Args:
+            ticker_ids (list, optional): Tickers to refresh. Defaults to None (the user portfolio).
+            force (bool, optional): Also refresh tickers already checked for the current session,
+                see refresh_ticker_data. Defaults to False.
+
+        Returns:
+            dict: Refreshed and skipped tickers and the number of bars written, see refresh_ticker_data.
+        """
+        result = self.refresh_ticker_data(ticker_ids, force)
+        self.refresh_ticker_metadata(ticker_ids)
+
+        return result
+
+    def add_ticker(self, ticker_id: str):
+        """
+        add_ticker Adds a ticker and its metadata to the tickers table if it doesn't already exist and is a valid Yahoo! Finance ticker.
+
+        Args:
+            ticker_id (str): Ticker to add to the database.
+        """
+        ticker_id = ticker_id.upper()
+
+        # known tickers are already valid and have metadata
+        if self.get_ticker_metadata([ticker_id]):
+            logging.warning(f"{ticker_id} already exists in the database.")
+            return  # fail
+
+        # fetching the metadata also checks that the ticker is valid
+        metadata = self._fetch_ticker_metadata(ticker_id)
+        if metadata is None:
+            return  # fail
+
+        self._upsert_ticker_metadata([metadata])
+        self.db.commit()
+
+        logging.info(f"Added {ticker_id} to the tickers table.")
+
+    def add_tickers(self, ticker_ids: list):
+        """
+        add_tickers Method to add multiple tickers to the database at once.
+
+        Args:
+            ticker_ids (list): A list of tickers to add to the database.
+        """
+        for ticker_id in ticker_ids:
+            self.add_ticker(ticker_id)
+
+    def _fetch_ticker_metadata(self, ticker_id: str):
+        """
+        _fetch_ticker_metadata Fetch the metadata of a ticker from Yahoo! Finance.
+
+        Args:
+            ticker_id (str): Ticker to get the metadata of.
+
+        Returns:
+            dict: Metadata of the ticker, None if the ticker is not valid.
+        """
+        try:
+            self.upstream_calls += 1
+            with time_upstream("info"):
+                info = yf.Ticker(ticker_id).info
+        except requests.exceptions.HTTPError:
+            logging.warning(
+                f"{ticker_id.upper()} is not a valid Yahoo! Finance ticker."
+            )
+            return None
+
+        return {
+            "ticker_id": ticker_id.upper(),
+            "name": info.get("shortName"),
+            "quote_type": info.get("quoteType", "N/A"),
+            "high_52": info.get("fiftyTwoWeekHigh"),
+            "low_52": info.get("fiftyTwoWeekLow"),
+        }
+
+    def get_data_versions(self, names: list):
+        """
+        get_data_versions Returns the current version of each data set, see _bump_data_versions.
+
+        Args:
+            names (list): Data set names, e.g. "portfolio" or "ticker_data:SPY".
+
+        Returns:
+            dict: Version of each name, 0 if it never changed.
+        """
+        versions = dict.fromkeys(names, 0)
+        if not names:
+            return versions
+        self.cursor.execute(
+            f"SELECT name, version FROM data_versions WHERE name IN ({', '.join(['%s'] * len(names))});",
+            list(names),
+        )
+        versions.update(dict(self.cursor.fetchall()))
+        return versions
+
+    def _bump_data_versions(self, names: list):
+        """
+        _bump_data_versions Increment the version counters of changed data sets, without committing.
+
+        Read endpoints build their ETags from these counters. Call it last in a transaction: the
+        counter rows are hot, locking them late keeps them held briefly and in the same order.
+
+        Data sets: "portfolio" (portfolio and positions tables), "transactions", "tickers"
+        (metadata), "ticker_data" (any bar) and "ticker_data:<ticker>".
+
+        The functions in data_change_listeners are then called with the names. They run before
+        the commit, a view recomputed in between is still older than the new versions.
+
+        Args:
+            names (list): Data set names.
+        """
+        names = sorted(set(names))
+        self.cursor.executemany(
+            "INSERT INTO data_versions (name, version) VALUES (%s, 1) "
+            "ON DUPLICATE KEY UPDATE version = version + 1;",
+            [(name,) for name in names],
+        )
+        for listener in data_change_listeners:
+            listener(names)
+
+    def _trade_data_versions(self, ticker_ids: list):
+        # a trade changes the holdings, the history and the profit columns of the bars
+        return ["portfolio", "transactions", "ticker_data"] + [
+            f"ticker_data:{t}" for t in ticker_ids
+        ]
+
+    def _upsert_ticker_metadata(self, rows: list):
+        """
+        _upsert_ticker_metadata Insert or update ticker metadata in the tickers table, without committing.
+
+        Args:
+            rows (list): Metadata dicts as returned by _fetch_ticker_metadata.
         """
+        self.cursor.executemany(
+            "INSERT INTO tickers (ticker_id, name, quote_type, high_52, low_52, refreshed_at) "
+            "VALUES (%s, %s, %s, %s, %s, NOW()) "
+            "ON DUPLICATE KEY UPDATE name = VALUES(name), quote_type = VALUES(quote_type), "
+            "high_52 = VALUES(high_52), low_52 = VALUES(low_52), refreshed_at = VALUES(refreshed_at);",
+            [
+                (r["ticker_id"], r["name"], r["quote_type"], r["high_52"], r["low_52"])
+                for r in rows
+            ],
+        )
+        self._bump_data_versions(["tickers"])
+
+    def get_ticker_metadata(self, ticker_ids: list):
+        """
+        get_ticker_metadata Returns the stored metadata of tickers from the tickers table.
+
+        Args:
+            ticker_ids (list): Tickers to get the metadata of.
+
+        Returns:
+            dict: Metadata for each ticker (upper case) that has been fetched at least once.
+        """
+        ticker_ids = [t.upper() for t in ticker_ids]
+        if not ticker_ids:
+            return {}
 
-        self.cursor.execute(f"SELECT * FROM ticker_data WHERE ticker_id='{ticker_id}';")
+        placeholders = ", ".join(["%s"] * len(ticker_ids))
+        self.cursor.execute(
+            f"SELECT ticker_id, name, quote_type, high_52, low_52, refreshed_at FROM tickers "
+            f"WHERE ticker_id IN ({placeholders}) AND refreshed_at IS NOT NULL;",
+            ticker_ids,
+        )
         data = self.cursor.fetchall()
 
-        # convert to json
-        # data = json.dumps(data, indent=4, sort_keys=True, default=str)
+        metadata = {}
+        for ticker_id, name, quote_type, high_52, low_52, refreshed_at in data:
+            metadata[ticker_id.upper()] = {
+                "name": name,
+                "quote_type": quote_type,
+                "high_52": high_52,
+                "low_52": low_52,
+                "refreshed_at": refreshed_at,
+            }
+
+        return metadata
+
+    def refresh_ticker_metadata(
+        self, ticker_ids: list = None, max_age: int = METADATA_MAX_AGE
+    ):
+        """
+        refresh_ticker_metadata Refetch the metadata of tickers that are missing or older than max_age.
+
+        All refreshed rows are written with a single batched upsert and commit.
+
+        Args:
+            ticker_ids (list, optional): Tickers to refresh. Defaults to None (the user portfolio).
+            max_age (int, optional): Max age of the metadata in seconds, None to only fetch missing
+                metadata. Defaults to METADATA_MAX_AGE.
+
+        Returns:
+            int: Number of tickers refreshed.
+        """
+        if ticker_ids is None:
+            ticker_ids = self.get_tickers()
+        ticker_ids = [t.upper() for t in ticker_ids]
+
+        metadata = self.get_ticker_metadata(ticker_ids)
+        stale = [t for t in ticker_ids if t not in metadata]
+        if max_age is not None:
+            cutoff = datetime.now() - timedelta(seconds=max_age)
+            stale += [t for t in metadata if metadata[t]["refreshed_at"] < cutoff]
+        if not stale:
+            return 0
+
+        rows = [self._fetch_ticker_metadata(t) for t in stale]
+        rows = [r for r in rows if r is not None]
+        if rows:
+            self._upsert_ticker_metadata(rows)
+            self.db.commit()
+
+        logging.info(f"Refreshed metadata for {len(rows)} tickers.")
+        return len(rows)
+
+    def _load_bars(self, ticker_id: str):
+        """
+        _load_bars Read every bar of a ticker from the ticker_data table.
+
+        Args:
+            ticker_id (str): Ticker to read.
+
+        Returns:
+            dict: An array per column, see ohlcv_store.COLUMNS.
+        """
+        self.cursor.execute(
+            "SELECT date, open, high, low, close, volume, abs_profit, percent_profit "
+            "FROM ticker_data WHERE ticker_id = %s ORDER BY date;",
+            (ticker_id,),
+        )
+        return bars_from_rows(self.cursor.fetchall())
+
+    def get_bars(self, ticker_id: str, version: int = None):
+        """
+        get_bars Returns the bars of a ticker as columns, from the OHLCV store when it is current.
+
+        The store is resynced from ticker_data when its version is behind (e.g. after a trade
+        changed the profit columns), ingestion writes new bars through to it.
+
+        Args:
+            ticker_id (str): Ticker to read.
+            version (int, optional): Current version of "ticker_data:<ticker>" if the caller
+                already has it. Defaults to None (read it).
+
+        Returns:
+            dict: A read-only array per column, see ohlcv_store.COLUMNS, ascending by date.
+        """
+        ticker_id = ticker_id.upper()
+        if not OHLCV_STORE_ENABLED:
+            return self._load_bars(ticker_id)
+        if version is None:
+            key = f"ticker_data:{ticker_id}"
+            version = self.get_data_versions([key])[key]
+        return ohlcv_store(self.db_name).read(
+            ticker_id, version, lambda: self._load_bars(ticker_id)
+        )
+
+    def get_ticker_data(
+        self,
+        ticker_id: str,
+        version: int = None,
+        start=None,
+        end=None,
+        resolution: str = "raw",
+        max_points: int = None,
+    ):
+        """
+        get_ticker_data Returns the data of a ticker in the ticker_data table, optionally limited and downsampled.
+
+        Rows keep the column order of the table: ticker_id, abs_profit, percent_profit, open,
+        low, close, high, volume and date (ISO 8601). Bars are limited to [start, end), then
+        aggregated per calendar period, then reduced to max_points by LTTB, see downsampling.py.
+
+        Args:
+            ticker_id (str): Ticker to get data for.
+            version (int, optional): Current version of "ticker_data:<ticker>", see get_bars.
+                Defaults to None.
+            start (datetime or str, optional): First date, ISO format. Defaults to None.
+            end (datetime or str, optional): Last date (a date without a time is included),
+                ISO format. Defaults to None.
+            resolution (str, optional): "raw", "daily", "weekly" or "monthly". Defaults to "raw".
+            max_points (int, optional): Max number of rows, at least 3. Defaults to None (all).
+
+        Raises:
+            ValueError: A date, the resolution or max_points is malformed.
+        """
+        start = self._parse_history_date(start) if start else None
+        end = self._parse_history_date(end, end=True) if end else None
+        bars = aggregate_bars(
+            bars_between(self.get_bars(ticker_id, version), start, end), resolution
+        )
+        if max_points is not None:
+            bars = downsample_bars(bars, max_points)
+        data = list(
+            zip(
+                [ticker_id.upper()] * len(bars["date"]),
+                column_to_list(bars["abs_profit"]),
+                column_to_list(bars["percent_profit"]),
+                column_to_list(bars["open"]),
+                column_to_list(bars["low"]),
+                column_to_list(bars["close"]),
+                column_to_list(bars["high"]),
+                bars["volume"].tolist(),
+                np.datetime_as_string(bars["date"], unit="s", timezone="UTC").tolist(),
+            )
+        )
         return jsonify(data)
 
     def get_transactions(self, ticker_id: str):
@@ -621,39 +1681,250 @@ class DatabaseEditor:
         """
         get_transaction_history Returns all transactions in the transactions table.
 
+        Prefer get_transaction_page for anything user facing, this loads the whole table.
+
         Returns:
-            dict: A dict of all transactions in the transactions table.
+            list: All transactions, most recent first.
         """
-        self.cursor.execute("SELECT * FROM transactions;")
-        data = self.cursor.fetchall()
+        self.cursor.execute(
+            "SELECT transaction_num, ticker_id, num_shares, price, transaction_type, date "
+            "FROM transactions ORDER BY date DESC, transaction_num DESC;"
+        )
+        return [self._format_transaction(row) for row in self.cursor.fetchall()]
+
+    def get_transaction_page(
+        self,
+        limit: int = TRANSACTION_PAGE_SIZE,
+        after: str = None,
+        ticker_id: str = None,
+        transaction_type: str = None,
+        start=None,
+        end=None,
+    ):
+        """
+        get_transaction_page Returns one page of the transaction history, most recent first.
 
-        # format the data to be returned
-        transaction_num = [d[0] for d in data]
-        ticker_id = [d[1] for d in data]
-        num_shares = [d[2] for d in data]
-        price = [d[3] for d in data]
-        transaction_type = [d[4] for d in data]
-        timestamp = [d[5] for d in data]
+        Pages are keyset-paginated on (date, transaction_num) and all filters are applied in SQL,
+        so every page is a range scan on idx_transactions_date or idx_transactions_ticker_date
+        whatever its depth.
 
-        # put into a dict
-        data = []
-        for i in range(len(transaction_num)):
-            data.append(
-                {
-                    "transaction_num": f"{transaction_num[i]:5d}",
-                    "ticker_id": ticker_id[i].upper(),
-                    "num_shares": num_shares[i],
-                    "price": f"${price[i]:.2f}",
-                    "total": f"${num_shares[i] * price[i]:.2f}",
-                    "transaction_type": transaction_type[i].capitalize(),
-                    "timestamp": str(timestamp[i]),
-                }
-            )
+        Args:
+            limit (int, optional): Max number of transactions in the page, capped at
+                TRANSACTION_PAGE_MAX. Defaults to TRANSACTION_PAGE_SIZE.
+            after (str, optional): "next" cursor of the previous page. Defaults to None (first page).
+            ticker_id (str, optional): Only transactions of this ticker. Defaults to None.
+            transaction_type (str, optional): Only "buy" or "sell" transactions. Defaults to None.
+            start (datetime or str, optional): Only transactions on or after this time. Defaults to None.
+            end (datetime or str, optional): Only transactions before this time, a date on its own
+                includes the whole day. Defaults to None.
+
+        Raises:
+            ValueError: The cursor or one of the dates is malformed.
 
-        # reverse the list so the most recent transactions are first
-        data.reverse()
+        Returns:
+            dict: "transactions" of the page and the "next" cursor, None on the last page.
+        """
+        limit = max(1, min(int(limit), TRANSACTION_PAGE_MAX))
+
+        conditions, params = self._range_conditions(start, end, ticker_id)
+        if transaction_type:
+            conditions.append("transaction_type = %s")
+            params.append(transaction_type.lower())
+        if after:
+            # cursor: "<date in ISO format>,<transaction_num>" of the last row of the previous page
+            try:
+                after_date, after_num = after.rsplit(",", 1)
+                params += [datetime.fromisoformat(after_date), int(after_num)]
+            except ValueError:
+                raise ValueError(f"Malformed cursor {after}.")
+            conditions.append("(date, transaction_num) < (%s, %s)")
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        # one extra row tells whether there is a next page
+        self.cursor.execute(
+            "SELECT transaction_num, ticker_id, num_shares, price, transaction_type, date "
+            f"FROM transactions{where} ORDER BY date DESC, transaction_num DESC LIMIT %s;",
+            params + [limit + 1],
+        )
+        rows = self.cursor.fetchall()
 
-        return data
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = f"{last[5].isoformat()},{last[0]}"
+
+        return {
+            "transactions": [self._format_transaction(row) for row in rows],
+            "next": next_cursor,
+        }
+
+    def _parse_history_date(self, value, end: bool = False):
+        """
+        _parse_history_date Parse a date filter of the transaction or ticker_data history.
+
+        Args:
+            value (datetime or str): Date or datetime, strings in ISO format.
+            end (bool, optional): Move a date without a time to the next midnight. Defaults to False.
+
+        Returns:
+            datetime: Parsed date.
+        """
+        if isinstance(value, datetime):
+            return value
+        parsed = datetime.fromisoformat(value)
+        if end and len(value) == 10:
+            parsed += timedelta(days=1)
+        return parsed
+
+    def _format_transaction(self, row):
+        """
+        _format_transaction Format a transactions row for display.
+
+        Args:
+            row (tuple): (transaction_num, ticker_id, num_shares, price, transaction_type, date).
+
+        Returns:
+            dict: Transaction with its price and total formatted as dollars.
+        """
+        transaction_num, ticker_id, num_shares, price, transaction_type, date = row
+        return {
+            "transaction_num": transaction_num,
+            "ticker_id": ticker_id.upper(),
+            "num_shares": num_shares,
+            "price": f"${price:.2f}",
+            "total": f"${num_shares * price:.2f}",
+            "transaction_type": transaction_type.capitalize(),
+            "timestamp": str(date),
+        }
+
+    def stream_transactions(
+        self,
+        start=None,
+        end=None,
+        ticker_id: str = None,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ):
+        """
+        stream_transactions Stream the transactions table in date order, see _stream_query.
+
+        Args:
+            start (datetime or str, optional): Only transactions on or after this time. Defaults to None.
+            end (datetime or str, optional): Only transactions before this time, a date on its own
+                includes the whole day. Defaults to None.
+            ticker_id (str, optional): Only transactions of this ticker. Defaults to None.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to EXPORT_BATCH_SIZE.
+
+        Raises:
+            ValueError: One of the dates is malformed (raised by this call, before streaming).
+
+        Returns:
+            generator: Column names followed by batches of rows.
+        """
+        conditions, params = self._range_conditions(start, end, ticker_id)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._stream_query(
+            "SELECT transaction_num, ticker_id, num_shares, price, transaction_type, date "
+            f"FROM transactions{where} ORDER BY date, transaction_num;",
+            params,
+            batch_size,
+        )
+
+    def stream_ticker_data(
+        self,
+        ticker_id: str = None,
+        start=None,
+        end=None,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ):
+        """
+        stream_ticker_data Stream the ticker_data table by ticker and date, see _stream_query.
+
+        Args:
+            ticker_id (str, optional): Only bars of this ticker. Defaults to None (all tickers).
+            start (datetime or str, optional): Only bars on or after this time. Defaults to None.
+            end (datetime or str, optional): Only bars before this time, a date on its own includes
+                the whole day. Defaults to None.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to EXPORT_BATCH_SIZE.
+
+        Raises:
+            ValueError: One of the dates is malformed (raised by this call, before streaming).
+
+        Returns:
+            generator: Column names followed by batches of rows.
+        """
+        conditions, params = self._range_conditions(start, end, ticker_id)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._stream_query(
+            "SELECT ticker_id, date, open, high, low, close, volume, abs_profit, percent_profit "
+            f"FROM ticker_data{where} ORDER BY ticker_id, date;",
+            params,
+            batch_size,
+        )
+
+    def _range_conditions(self, start=None, end=None, ticker_id: str = None):
+        """
+        _range_conditions Build the WHERE conditions of a ticker and date range filter.
+
+        Args:
+            start (datetime or str, optional): Start of the range (inclusive). Defaults to None.
+            end (datetime or str, optional): End of the range (exclusive). Defaults to None.
+            ticker_id (str, optional): Ticker to filter on. Defaults to None.
+
+        Returns:
+            list: SQL conditions.
+            list: Their parameters.
+        """
+        conditions = []
+        params = []
+        if ticker_id:
+            conditions.append("ticker_id = %s")
+            params.append(ticker_id.upper())
+        if start:
+            conditions.append("date >= %s")
+            params.append(self._parse_history_date(start))
+        if end:
+            conditions.append("date < %s")
+            params.append(self._parse_history_date(end, end=True))
+        return conditions, params
+
+    def _stream_query(
+        self, query: str, params: list, batch_size: int = EXPORT_BATCH_SIZE
+    ):
+        """
+        _stream_query Run a query on an unbuffered cursor and yield its rows in batches.
+
+        Rows are read from the server as they are consumed, so memory use is bounded by
+        batch_size and the first batch is available before the server has sent the last row.
+        The connection cannot run other statements until the generator is exhausted or closed,
+        use an editor dedicated to the export.
+
+        Args:
+            query (str): SELECT statement.
+            params (list): Query parameters.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to EXPORT_BATCH_SIZE.
+
+        Yields:
+            tuple: Column names, first.
+            list: Batches of at most batch_size rows.
+        """
+        cursor = InstrumentedCursor(self.db.cursor(buffered=False))
+        try:
+            cursor.execute(query, params)
+            yield tuple(column[0] for column in cursor.description)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            # drop the rows left unread if the client went away mid-stream
+            try:
+                self.db.consume_results()
+                cursor.close()
+            except mysql.connector.Error as e:
+                logging.warning(f"Unable to close the export cursor: {e}")
+            self.cursor.round_trips += cursor.round_trips
 
     def display_portfolio(self):
         """
@@ -670,13 +1941,16 @@ class DatabaseEditor:
         returns = [p[2] for p in portfolio]
         asset_types = [p[3] for p in portfolio]
 
+        prices = self.get_market_values(tickers)
+
         portfolio_data = []
         for i in range(len(tickers)):
+            price = prices[tickers[i].upper()]
             portfolio_data.append(
                 {
                     "ticker_id": tickers[i].upper(),
                     "num_shares": shares[i],
-                    "curr_price": f"${self.get_market_value(tickers[i]):.2f}",
+                    "curr_price": "N/A" if price is None else f"${price:.2f}",
                     "total_return": f"{returns[i]:.2f}%",
                     "asset_type": asset_types[i].upper(),
                 }
@@ -688,6 +1962,33 @@ class DatabaseEditor:
 
         return sorted_portfolio_data
 
+    def get_last_closes(self, ticker_ids: list):
+        """
+        get_last_closes Returns the close of the latest stored bar of tickers, without calling upstream.
+
+        Args:
+            ticker_ids (list): Tickers to get the last close of.
+
+        Returns:
+            dict: (close, date of the bar) for each ticker (upper case) with stored bars.
+        """
+        ticker_ids = [t.upper() for t in ticker_ids]
+        if not ticker_ids:
+            return {}
+
+        # the tickers watermark points at the latest bar, a lookup on the (ticker_id, date) key
+        placeholders = ", ".join(["%s"] * len(ticker_ids))
+        self.cursor.execute(
+            "SELECT td.ticker_id, td.close, td.date FROM tickers t "
+            "JOIN ticker_data td ON td.ticker_id = t.ticker_id AND td.date = t.last_bar_at "
+            f"WHERE t.ticker_id IN ({placeholders});",
+            ticker_ids,
+        )
+        return {
+            ticker_id.upper(): (float(close), date)
+            for ticker_id, close, date in self.cursor.fetchall()
+        }
+
     def get_num_shares(self, ticker_id: str):
         """
         get_num_shares Returns the number of shares of a ticker in the user portfolio.
@@ -720,8 +2021,11 @@ class DatabaseEditor:
         returns = [p[2] for p in portfolio]
         asset_types = [p[3] for p in portfolio]
 
+        prices = self.get_market_values(tickers)
+
         portfolio_data = []
         for i in range(len(tickers)):
+            price = prices[tickers[i].upper()]
             # ticker = yf.Ticker(tickers[i])
             # high_52 = ticker.info["fiftyTwoWeekHigh"]
             # low_52 = ticker.info["fiftyTwoWeekLow"]
@@ -738,7 +2042,11 @@ class DatabaseEditor:
                     # "high_52": f"${high_52:.2f}",
                     # "low_52": f"${low_52:.2f}",
                     "asset_type": asset_types[i].upper(),
-                    "net_gainloss": f"{self.calc_gainloss(tickers[i]):.2f}%",
+                    "net_gainloss": (
+                        "N/A"
+                        if price is None
+                        else f"{self.calc_gainloss(tickers[i], price):.2f}%"
+                    ),
                 }
             )
 
@@ -760,7 +2068,8 @@ class DatabaseEditor:
         ticker = self.cursor.fetchone()
 
         # get yfinance data about the ticker
-        ticker_data = yf.Ticker(ticker_id).info
+        with time_upstream("info"):
+            ticker_data = yf.Ticker(ticker_id).info
 
         # format the data to be returned
         # todo complete this function for stock details button
@@ -769,18 +2078,21 @@ class DatabaseEditor:
         """
         get_asset_type Return the asset type of a ticker.
 
+        The asset type is read from the tickers table, the metadata is only fetched from
+        Yahoo! Finance the first time a ticker is seen.
+
         Args:
             ticker_id (str): Ticker to get the asset type of.
 
         Returns:
             str: Asset type of the ticker.
         """
+        metadata = self.get_ticker_metadata([ticker_id])
+        if not metadata:
+            self.refresh_ticker_metadata([ticker_id])
+            metadata = self.get_ticker_metadata([ticker_id])
 
-        ticker = yf.Ticker(ticker_id)
-        ticker_info = ticker.info
-        asset_type = ticker_info.get("quoteType", "N/A")
-
-        return asset_type
+        return metadata.get(ticker_id.upper(), {}).get("quote_type") or "N/A"
 
     def asset_type_breakdown(self):
         """
@@ -813,31 +2125,537 @@ class DatabaseEditor:
 
         return asset_type_breakdown
 
-    def calc_gainloss(self, ticker_id):
+    def get_holdings(self):
+        """
+        get_holdings Returns the number of shares of each holding of the user portfolio.
+
+        Returns:
+            dict: Shares of each ticker with a non-zero position.
+        """
+        self.cursor.execute(
+            "SELECT ticker_id, total_shares FROM portfolio WHERE total_shares <> 0;"
+        )
+        return {ticker_id: int(shares) for ticker_id, shares in self.cursor.fetchall()}
+
+    def get_bars_many(self, ticker_ids: list, start=None, end=None):
+        """
+        get_bars_many Returns the bars of many tickers, with a single data versions query.
+
+        Args:
+            ticker_ids (list): Tickers to read.
+            start (datetime or str, optional): First date, ISO format. Defaults to None.
+            end (datetime or str, optional): Last date (a date without a time is included),
+                ISO format. Defaults to None.
+
+        Raises:
+            ValueError: A date is malformed.
+
+        Returns:
+            dict: Bars of each ticker that has at least one in the range, see get_bars.
+        """
+        start = self._parse_history_date(start) if start else None
+        end = self._parse_history_date(end, end=True) if end else None
+        ticker_ids = list(dict.fromkeys(t.upper() for t in ticker_ids))
+        versions = self.get_data_versions([f"ticker_data:{t}" for t in ticker_ids])
+
+        bars_by_ticker = {}
+        for ticker_id in ticker_ids:
+            bars = bars_between(
+                self.get_bars(ticker_id, versions[f"ticker_data:{ticker_id}"]),
+                start,
+                end,
+            )
+            if len(bars["date"]):
+                bars_by_ticker[ticker_id] = bars
+        return bars_by_ticker
+
+    def get_returns(self, ticker_ids: list = None, start=None, end=None):
+        """
+        get_returns Returns the daily log returns of tickers, aligned on their dates.
+
+        Args:
+            ticker_ids (list, optional): Tickers. Defaults to None (the holdings).
+            start (datetime or str, optional): First date, ISO format. Defaults to None.
+            end (datetime or str, optional): Last date, ISO format. Defaults to None.
+
+        Returns:
+            pd.DataFrame: One column per ticker with bars, see analytics.returns_matrix.
+        """
+        if ticker_ids is None:
+            ticker_ids = list(self.get_holdings())
+        return returns_matrix(price_matrix(self.get_bars_many(ticker_ids, start, end)))
+
+    def get_correlations(
+        self, ticker_ids: list = None, start=None, end=None, kind: str = "corr"
+    ):
+        """
+        get_correlations Returns the correlation or annualized covariance matrix of daily log returns.
+
+        Args:
+            ticker_ids (list, optional): Tickers. Defaults to None (the holdings).
+            start (datetime or str, optional): First date, ISO format. Defaults to None.
+            end (datetime or str, optional): Last date, ISO format. Defaults to None.
+            kind (str, optional): "corr" or "cov". Defaults to "corr".
+
+        Raises:
+            ValueError: Unknown kind or malformed date.
+
+        Returns:
+            dict: The tickers, the matrix as a list of rows (None for too few shared dates) and
+                the number of dates.
+        """
+        if kind not in ("corr", "cov"):
+            raise ValueError(f"Unknown matrix kind {kind}, use corr or cov.")
+        returns = self.get_returns(ticker_ids, start, end)
+        if kind == "corr":
+            matrix = correlation_matrix(returns)
+        else:
+            matrix = covariance_matrix(returns)
+        return {
+            "kind": kind,
+            "tickers": list(matrix.columns),
+            "observations": len(returns),
+            "matrix": [
+                column_to_list(row) for row in matrix.to_numpy(dtype=np.float64)
+            ],
+        }
+
+    def get_portfolio_risk(
+        self,
+        benchmark: str = ANALYTICS_BENCHMARK,
+        start=None,
+        end=None,
+        confidence: float = 0.95,
+        horizon: int = 1,
+    ):
+        """
+        get_portfolio_risk Returns the volatility, beta and value at risk of the holdings and the portfolio.
+
+        Args:
+            benchmark (str, optional): Ticker the betas are measured against, it needs bars in
+                ticker_data. Defaults to ANALYTICS_BENCHMARK.
+            start (datetime or str, optional): First date, ISO format. Defaults to None.
+            end (datetime or str, optional): Last date, ISO format. Defaults to None.
+            confidence (float, optional): VaR confidence level. Defaults to 0.95.
+            horizon (int, optional): VaR horizon in days. Defaults to 1.
+
+        Raises:
+            ValueError: Malformed date, confidence or horizon.
+
+        Returns:
+            dict: See analytics.portfolio_risk.
+        """
+        benchmark = benchmark.upper()
+        shares = self.get_holdings()
+        bars_by_ticker = self.get_bars_many(list(shares) + [benchmark], start, end)
+        return portfolio_risk(bars_by_ticker, shares, benchmark, confidence, horizon)
+
+    def _final_bars_end(self):
+        # bars of the sessions that closed are final, the bar of a session in progress still moves
+        now = market_now()
+        day = now.date()
+        if now < session_close(day):
+            day -= timedelta(days=1)
+        return datetime.combine(day + timedelta(days=1), datetime.min.time())
+
+    def _return_stats_from_row(self, row):
+        (
+            ticker_id,
+            last_date,
+            last_close,
+            n,
+            mean,
+            m2,
+            window_dates,
+            window_returns,
+            window_head,
+            window_count,
+            window_mean,
+            window_m2,
+        ) = row
+        if window_returns:
+            dates = np.frombuffer(window_dates, np.int64).astype("datetime64[s]")
+            returns = np.frombuffer(window_returns, np.float64).copy()
+        else:
+            dates = np.zeros(ROLLING_WINDOW, "datetime64[s]")
+            returns = np.zeros(ROLLING_WINDOW)
+            window_head = window_count = 0
+        stats = {
+            "last_date": last_date,
+            "last_close": None if last_close is None else float(last_close),
+            "n": int(n),
+            "mean": float(mean),
+            "m2": float(m2),
+            "window_dates": dates,
+            "window_returns": returns,
+            "window_head": int(window_head),
+            "window_count": int(window_count),
+            "window_mean": float(window_mean),
+            "window_m2": float(window_m2),
+        }
+        # ROLLING_WINDOW changed since the row was written
+        return ticker_id.upper(), resize_window(stats, ROLLING_WINDOW)
+
+    def _load_return_stats(self, ticker_ids: list = None):
+        """
+        _load_return_stats Read the running return statistics of tickers, see rolling_stats.empty_stats.
+
+        Args:
+            ticker_ids (list, optional): Tickers to read. Defaults to None (every ticker).
+
+        Returns:
+            dict: Statistics of each ticker that has a return_stats row.
+        """
+        query = (
+            "SELECT ticker_id, last_date, last_close, n, mean, m2, window_dates, window_returns, "
+            "window_head, window_count, window_mean, window_m2 FROM return_stats"
+        )
+        if ticker_ids is None:
+            self.cursor.execute(query + ";")
+        elif not ticker_ids:
+            return {}
+        else:
+            self.cursor.execute(
+                f"{query} WHERE ticker_id IN ({', '.join(['%s'] * len(ticker_ids))});",
+                list(ticker_ids),
+            )
+        return dict(self._return_stats_from_row(r) for r in self.cursor.fetchall())
+
+    def _save_return_stats(self, stats_by_ticker: dict):
+        """
+        _save_return_stats Upsert the running return statistics of tickers, without committing.
+
+        Args:
+            stats_by_ticker (dict): Statistics of each ticker, see rolling_stats.empty_stats.
+        """
+        self.cursor.executemany(
+            "INSERT INTO return_stats (ticker_id, last_date, last_close, n, mean, m2, window_dates, "
+            "window_returns, window_head, window_count, window_mean, window_m2) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE last_date = VALUES(last_date), last_close = VALUES(last_close), "
+            "n = VALUES(n), mean = VALUES(mean), m2 = VALUES(m2), window_dates = VALUES(window_dates), "
+            "window_returns = VALUES(window_returns), window_head = VALUES(window_head), "
+            "window_count = VALUES(window_count), window_mean = VALUES(window_mean), "
+            "window_m2 = VALUES(window_m2);",
+            [
+                (
+                    ticker_id,
+                    s["last_date"],
+                    s["last_close"],
+                    s["n"],
+                    s["mean"],
+                    s["m2"],
+                    s["window_dates"].astype(np.int64).tobytes(),
+                    s["window_returns"].tobytes(),
+                    s["window_head"],
+                    s["window_count"],
+                    s["window_mean"],
+                    s["window_m2"],
+                )
+                for ticker_id, s in stats_by_ticker.items()
+            ],
+        )
+
+    def _load_pair_stats(self, ticker_id: str):
+        """
+        _load_pair_stats Read the running statistics of every pair of a ticker.
+
+        Args:
+            ticker_id (str): Ticker of the pairs.
+
+        Returns:
+            dict: (n, mean_a, mean_b, m2_a, m2_b, c) of each (ticker_a, ticker_b) pair.
+        """
+        self.cursor.execute(
+            "SELECT ticker_a, ticker_b, n, mean_a, mean_b, m2_a, m2_b, c FROM return_pair_stats "
+            "WHERE ticker_a = %s UNION ALL "
+            "SELECT ticker_a, ticker_b, n, mean_a, mean_b, m2_a, m2_b, c FROM return_pair_stats "
+            "WHERE ticker_b = %s;",
+            (ticker_id, ticker_id),
+        )
+        return {(r[0].upper(), r[1].upper()): r[2:] for r in self.cursor.fetchall()}
+
+    def _save_pair_stats(self, pairs: dict):
+        """
+        _save_pair_stats Upsert the running statistics of pairs of tickers, without committing.
+
+        Args:
+            pairs (dict): (n, mean_a, mean_b, m2_a, m2_b, c) of each (ticker_a, ticker_b) pair.
+        """
+        self.cursor.executemany(
+            "INSERT INTO return_pair_stats (ticker_a, ticker_b, n, mean_a, mean_b, m2_a, m2_b, c) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE n = VALUES(n), mean_a = VALUES(mean_a), mean_b = VALUES(mean_b), "
+            "m2_a = VALUES(m2_a), m2_b = VALUES(m2_b), c = VALUES(c);",
+            [(a, b, *pair) for (a, b), pair in pairs.items()],
+        )
+
+    def update_return_stats(self, ticker_id: str, since: datetime = None):
+        """
+        update_return_stats Fold the final bars of a ticker that its running return statistics don't have yet.
+
+        Runs in its own transaction, after the bars are committed. Its first statement locks the
+        "return_stats" data version row until the commit: the updates run one at a time, and
+        the snapshot of every later read in the transaction has the updates committed before.
+
+        Each new final bar (its session has closed) updates the statistics of the ticker in
+        O(1), is recorded in daily_returns, and updates the pair of the ticker with every ticker
+        that already has a return on that date, O(1) per pair. A pair's shared date is thus
+        folded by whichever of its two tickers gets it second. A ticker without statistics, or
+        getting bars older than its last folded one, is rebuilt from its history instead.
+
+        Args:
+            ticker_id (str): Ticker to update.
+            since (datetime, optional): Date of the first ingested bar. Defaults to None.
+
+        Returns:
+            dict: Number of bars and pairs folded, or of tickers and pairs rebuilt.
+        """
+        ticker_id = ticker_id.upper()
+        try:
+            self._bump_data_versions(["return_stats"])
+            stats = self._load_return_stats([ticker_id]).get(ticker_id)
+            if stats is None or (
+                since is not None
+                and stats["last_date"] is not None
+                and since < stats["last_date"]
+            ):
+                result = self._rebuild_return_stats([ticker_id])
+            else:
+                result = self._fold_return_stats(ticker_id, stats)
+            self.db.commit()
+        except mysql.connector.Error:
+            self.db.rollback()
+            logging.error(
+                f"Unable to update the return statistics of {ticker_id}, rolled back."
+            )
+            raise
+        return result
+
+    def _fold_return_stats(self, ticker_id: str, stats: dict):
+        """
+        _fold_return_stats Fold the final bars after stats["last_date"] into the statistics of a ticker and its pairs, without committing.
+
+        Args:
+            ticker_id (str): Ticker to update.
+            stats (dict): Its statistics, see _load_return_stats.
+
+        Returns:
+            dict: Number of bars and pairs folded.
+        """
+        query = "SELECT date, close FROM ticker_data WHERE ticker_id = %s AND date < %s"
+        params = [ticker_id, self._final_bars_end()]
+        if stats["last_date"] is not None:
+            query += " AND date > %s"
+            params.append(stats["last_date"])
+        self.cursor.execute(query + " AND close IS NOT NULL ORDER BY date;", params)
+        bars = self.cursor.fetchall()
+        if not bars:
+            return {"bars": 0, "pairs": 0}
+
+        returns = []
+        for date, close in bars:
+            r = add_bar(stats, date, float(close))
+            if r is not None:
+                returns.append((date, r))
+        self._save_return_stats({ticker_id: stats})
+
+        pairs = {}
+        if returns:
+            self.cursor.executemany(
+                "INSERT INTO daily_returns (ticker_id, date, log_return) VALUES (%s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE log_return = VALUES(log_return);",
+                [(ticker_id, date, r) for date, r in returns],
+            )
+            # the returns the other tickers already folded on the same dates
+            self.cursor.execute(
+                "SELECT ticker_id, date, log_return FROM daily_returns "
+                "WHERE date BETWEEN %s AND %s AND ticker_id <> %s;",
+                (returns[0][0], returns[-1][0], ticker_id),
+            )
+            others = {}
+            for other, date, r in self.cursor.fetchall():
+                others.setdefault(date, []).append((other.upper(), r))
+
+            stored = self._load_pair_stats(ticker_id)
+            empty = (0, 0.0, 0.0, 0.0, 0.0, 0.0)
+            for date, r in returns:
+                for other, r_other in others.get(date, []):
+                    if ticker_id < other:
+                        key, r_a, r_b = (ticker_id, other), r, r_other
+                    else:
+                        key, r_a, r_b = (other, ticker_id), r_other, r
+                    pair = pairs.get(key) or stored.get(key, empty)
+                    pairs[key] = add_pair_returns(pair, r_a, r_b)
+            self._save_pair_stats(pairs)
+
+        logging.debug(
+            f"Folded {len(bars)} bars of {ticker_id} into its return statistics and "
+            f"{len(pairs)} pairs."
+        )
+        return {"bars": len(bars), "pairs": len(pairs)}
+
+    def _rebuild_return_stats(self, ticker_ids: list):
+        """
+        _rebuild_return_stats Recompute the return statistics of tickers and of their pairs from the bars, without committing.
+
+        The pairs with the other tickers use the returns those folded, in daily_returns, so
+        that later updates fold each shared date of a pair exactly once.
+
+        Args:
+            ticker_ids (list): Tickers to rebuild.
+
+        Returns:
+            dict: Number of tickers and pairs written.
+        """
+        rebuilt = sorted(set(ticker_ids))
+        final_end = self._final_bars_end()
+        new_stats = {}
+        returns = {}
+        for ticker_id in rebuilt:
+            bars = bars_between(self._load_bars(ticker_id), end=final_end)
+            valid = ~np.isnan(bars["close"])
+            dates, closes = bars["date"][valid], bars["close"][valid]
+            new_stats[ticker_id] = stats_from_bars(dates, closes, ROLLING_WINDOW)
+            r, return_dates = bar_returns(dates, closes)
+            returns[ticker_id] = {"date": return_dates, "return": r}
+
+        self.cursor.execute(
+            "SELECT ticker_id, date, log_return FROM daily_returns ORDER BY ticker_id, date;"
+        )
+        folded = {}
+        for other, date, r in self.cursor.fetchall():
+            other = other.upper()
+            if other not in new_stats:
+                folded.setdefault(other, []).append((date, r))
+        for other, rows in folded.items():
+            dates, r = zip(*rows)
+            returns[other] = {
+                "date": np.array(dates, "datetime64[s]"),
+                "return": np.array(r, np.float64),
+            }
+
+        pairs = [
+            p
+            for p in pair_moments(price_matrix(returns, "return"))
+            if p[0] in new_stats or p[1] in new_stats
+        ]
+        for ticker_id in rebuilt:
+            self.cursor.execute(
+                "DELETE FROM daily_returns WHERE ticker_id = %s;", (ticker_id,)
+            )
+            self.cursor.execute(
+                "DELETE FROM return_pair_stats WHERE ticker_a = %s OR ticker_b = %s;",
+                (ticker_id, ticker_id),
+            )
+            self.cursor.executemany(
+                "INSERT INTO daily_returns (ticker_id, date, log_return) VALUES (%s, %s, %s);",
+                list(
+                    zip(
+                        [ticker_id] * len(returns[ticker_id]["date"]),
+                        returns[ticker_id]["date"].tolist(),
+                        returns[ticker_id]["return"].tolist(),
+                    )
+                ),
+            )
+        self._save_return_stats(new_stats)
+        self._save_pair_stats({(p[0], p[1]): p[2:] for p in pairs})
+        logging.info(
+            f"Rebuilt the return statistics of {len(new_stats)} tickers and {len(pairs)} pairs."
+        )
+        return {"tickers": len(new_stats), "pairs": len(pairs)}
+
+    def rebuild_return_stats(self, ticker_ids: list = None):
+        """
+        rebuild_return_stats Recompute the running return statistics from ticker_data.
+
+        Ingestion keeps them current on its own, this is for bars changed behind its back:
+        history deleted or loaded in bulk (generate_data) and the first run after the
+        return_stats migration.
+
+        Args:
+            ticker_ids (list, optional): Tickers to rebuild. Defaults to None (every ticker).
+
+        Returns:
+            dict: Number of tickers and pairs written.
+        """
+        try:
+            # first statement of the transaction, see update_return_stats
+            self._bump_data_versions(["return_stats"])
+            if ticker_ids is None:
+                self.cursor.execute("SELECT ticker_id FROM tickers;")
+                ticker_ids = [t[0] for t in self.cursor.fetchall()]
+            result = self._rebuild_return_stats([t.upper() for t in ticker_ids])
+            self.db.commit()
+        except mysql.connector.Error:
+            self.db.rollback()
+            logging.error("Unable to rebuild the return statistics, rolled back.")
+            raise
+        return result
+
+    def get_return_stats(self, ticker_ids: list = None):
+        """
+        get_return_stats Returns the running mean, volatility and correlations of daily log returns.
+
+        Read from the statistics ingestion keeps current, without going through the bars.
+
+        Args:
+            ticker_ids (list, optional): Tickers. Defaults to None (the holdings).
+
+        Returns:
+            dict: The rolling window size, the statistics of each ticker (see
+                rolling_stats.stats_summary) and of each pair (see rolling_stats.pair_summary).
+        """
+        if ticker_ids is None:
+            ticker_ids = list(self.get_holdings())
+        ticker_ids = sorted(set(t.upper() for t in ticker_ids))
+        stats_by_ticker = self._load_return_stats(ticker_ids)
+
+        pairs = []
+        tickers = sorted(stats_by_ticker)
+        if len(tickers) > 1:
+            placeholders = ", ".join(["%s"] * len(tickers))
+            self.cursor.execute(
+                f"SELECT ticker_a, ticker_b, n, m2_a, m2_b, c FROM return_pair_stats "
+                f"WHERE ticker_a IN ({placeholders}) AND ticker_b IN ({placeholders}) "
+                f"ORDER BY ticker_a, ticker_b;",
+                tickers + tickers,
+            )
+            for a, b, *pair in self.cursor.fetchall():
+                a, b = a.upper(), b.upper()
+                pairs.append(
+                    {
+                        "tickers": [a, b],
+                        **pair_summary(pair, stats_by_ticker[a], stats_by_ticker[b]),
+                    }
+                )
+        return {
+            "window": ROLLING_WINDOW,
+            "tickers": {t: stats_summary(stats_by_ticker[t]) for t in tickers},
+            "pairs": pairs,
+        }
+
+    def calc_gainloss(self, ticker_id, curr_price: float = None):
         """
         calc_gain Calculates the gain from a ticker.
 
         Args:
             ticker_id (str): Ticker to calculate the gain from.
+            curr_price (float, optional): Current price of the ticker, e.g. from get_market_values.
+                Defaults to None (fetch it).
 
         Returns:
-            float: The gain from the ticker.
+            float: The gain from the ticker, None if it could not be priced.
         """
         # get the current price of the ticker
-        curr_price = self.get_market_value(ticker_id)
+        if curr_price is None:
+            curr_price = self.get_market_value(ticker_id)
+            if curr_price is None:
+                return None
         curr_price = float(curr_price)
 
-        # get the price of the ticker at the time of purchase
-        self.cursor.execute(
-            f"SELECT num_shares, price FROM transactions WHERE ticker_id='{ticker_id}' AND transaction_type='buy';"
-        )
-        data = self.cursor.fetchall()
-
-        # loop through all transactions
-        gainloss = 0
-        for row in data:
-            num_shares = int(row[0])
-            price = float(row[1])
-            gainloss += num_shares * ((curr_price - price) / price)
+        # sum of num_shares * (curr_price - price) / price over all buys, from the ledger
+        position = self.get_position(ticker_id)
+        gainloss = curr_price * position["buy_weight"] - position["shares_bought"]
 
         return gainloss * 100  # return as a percentage
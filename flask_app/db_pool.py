@@ -0,0 +1,204 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+import mysql.connector
+from dotenv import load_dotenv
+
+load_dotenv()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+# seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# seconds to wait for the MySQL server when opening a new connection
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+# connections idle for longer than this many seconds are pinged before being reused
+DB_POOL_IDLE_CHECK = float(os.getenv("DB_POOL_IDLE_CHECK", "30"))
+
+
+# thread-safe pool of MySQL connections shared by the DatabaseEditor instances of an app
+class ConnectionPool:
+    def __init__(
+        self,
+        password: str,
+        database: str,
+        host="localhost",
+        user="root",
+        size: int = DB_POOL_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+        connect_timeout: int = DB_CONNECT_TIMEOUT,
+        idle_check: float = DB_POOL_IDLE_CHECK,
+    ):
+        """
+        __init__ Initializer for the ConnectionPool class. Connections are opened lazily.
+
+        Args:
+            password (str): Database password.
+            database (str): Database name.
+            host (str, optional): Database host. Defaults to "localhost".
+            user (str, optional): Database user. Defaults to "root".
+            size (int, optional): Max number of open connections. Defaults to DB_POOL_SIZE.
+            timeout (float, optional): Seconds to wait for a free connection. Defaults to DB_POOL_TIMEOUT.
+            connect_timeout (int, optional): Seconds to wait when opening a connection. Defaults to DB_CONNECT_TIMEOUT.
+            idle_check (float, optional): Idle seconds after which a connection is health-checked. Defaults to DB_POOL_IDLE_CHECK.
+        """
+        self.db_name = database
+        self.host = host
+        self.user = user
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.idle_check = idle_check
+
+        self._idle = queue.LifoQueue()  # (connection, released_at)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._reused = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _connect(self):
+        db = mysql.connector.connect(
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            database=self.db_name,
+            connection_timeout=self.connect_timeout,
+        )
+        logging.info(f"Opened a new connection to the {self.db_name} database.")
+        return db
+
+    def acquire(self):
+        """
+        acquire Borrow a connection from the pool, opening one if the pool is not full.
+
+        Raises:
+            mysql.connector.errors.PoolError: No connection became free within the timeout.
+
+        Returns:
+            mysql.connector.connection.MySQLConnection: Database connection.
+        """
+        start = time.perf_counter()
+
+        with self._lock:
+            can_create = self._idle.empty() and self._created < self.size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                db = self._connect()
+            except mysql.connector.Error:
+                with self._lock:
+                    self._created -= 1
+                raise
+            released_at = time.monotonic()
+        else:
+            try:
+                db, released_at = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._timeouts += 1
+                raise mysql.connector.errors.PoolError(
+                    f"No connection to the {self.db_name} database became free within {self.timeout}s."
+                )
+
+        # health check connections that sat idle long enough to be dropped by the server
+        if time.monotonic() - released_at > self.idle_check:
+            try:
+                db.ping(reconnect=True, attempts=1)
+            except mysql.connector.Error:
+                logging.warning(f"Replacing a dead connection to {self.db_name}.")
+                try:
+                    db = self._connect()
+                except mysql.connector.Error:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                with self._lock:
+                    self._reconnects += 1
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            if not can_create:
+                self._reused += 1
+
+        return db
+
+    def release(self, db):
+        """
+        release Return a borrowed connection to the pool, rolling back any uncommitted work.
+
+        Args:
+            db (mysql.connector.connection.MySQLConnection): Connection from acquire().
+        """
+        try:
+            if db.in_transaction:
+                db.rollback()
+            healthy = True
+        except mysql.connector.Error:
+            healthy = False
+
+        with self._lock:
+            self._in_use -= 1
+            if not healthy:
+                self._created -= 1
+
+        if healthy:
+            self._idle.put((db, time.monotonic()))
+        else:
+            logging.warning(f"Discarded a broken connection to {self.db_name}.")
+            try:
+                db.close()
+            except mysql.connector.Error:
+                pass
+
+    def close(self):
+        """
+        close Closes all idle connections in the pool.
+        """
+        while True:
+            try:
+                db, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                db.close()
+            except mysql.connector.Error:
+                pass
+            with self._lock:
+                self._created -= 1
+        logging.info(f"Connection pool for {self.db_name} closed.")
+
+    def stats(self):
+        """
+        stats Returns usage counters for the pool.
+
+        Returns:
+            dict: Pool size, open/in-use/idle connections and wait time statistics.
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "acquired": self._acquired,
+                "reused": self._reused,
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+                "avg_wait_ms": (
+                    1000 * self._total_wait / self._acquired if self._acquired else 0.0
+                ),
+                "max_wait_ms": 1000 * self._max_wait,
+            }
@@ -0,0 +1,140 @@
+import numpy as np
+
+# calendar periods of the resolution argument of /ticker_data ("raw" returns the stored bars)
+RESOLUTIONS = ("raw", "daily", "weekly", "monthly")
+# numpy datetime64 days are counted from a Thursday, weeks start this many days later (Monday)
+_WEEK_OFFSET = 4
+
+
+def period_keys(dates: np.ndarray, resolution: str):
+    """
+    period_keys Returns the calendar period of each date as an integer, equal within a period.
+
+    Args:
+        dates (np.ndarray): datetime64 dates, ascending.
+        resolution (str): "daily", "weekly" (weeks starting on Monday) or "monthly".
+
+    Returns:
+        np.ndarray: int64 period of each date.
+    """
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    if resolution == "daily":
+        return days
+    if resolution == "weekly":
+        return (days - _WEEK_OFFSET) // 7
+    return dates.astype("datetime64[M]").astype(np.int64)
+
+
+def aggregate_bars(bars: dict, resolution: str):
+    """
+    aggregate_bars Aggregate bars into one bar per calendar period.
+
+    A period's bar is dated at its first bar, opens at its first open, closes at its last close,
+    has the highest high, the lowest low (NaN ignored) and the summed volume. The profit columns
+    are those of its last bar, the profit at the period's close.
+
+    Args:
+        bars (dict): An array per column, see ohlcv_store.COLUMNS, ascending by date.
+        resolution (str): One of RESOLUTIONS.
+
+    Raises:
+        ValueError: Unknown resolution.
+
+    Returns:
+        dict: An array per column, one row per period.
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(
+            f"Unknown resolution {resolution}, use one of {', '.join(RESOLUTIONS)}."
+        )
+    if resolution == "raw" or len(bars["date"]) == 0:
+        return bars
+
+    keys = period_keys(bars["date"], resolution)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+    ends = np.concatenate([starts[1:], [len(keys)]]) - 1
+    return {
+        "date": bars["date"][starts],
+        "open": bars["open"][starts],
+        "high": np.fmax.reduceat(bars["high"], starts),
+        "low": np.fmin.reduceat(bars["low"], starts),
+        "close": bars["close"][ends],
+        "volume": np.add.reduceat(bars["volume"], starts),
+        "abs_profit": bars["abs_profit"][ends],
+        "percent_profit": bars["percent_profit"][ends],
+    }
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int):
+    """
+    lttb_indices Select the points of a series that preserve its shape (Largest-Triangle-Three-Buckets).
+
+    The first and last points are kept. The points in between are split into max_points - 2
+    buckets, and each bucket keeps the point forming the largest triangle with the point kept
+    in the previous bucket and the mean of the next bucket. Peaks and troughs survive, unlike
+    with a fixed stride.
+
+    Args:
+        x (np.ndarray): Ascending x values, e.g. dates as seconds.
+        y (np.ndarray): y values.
+        max_points (int): Number of points kept, at least 3.
+
+    Returns:
+        np.ndarray: Ascending indices of the kept points.
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+
+    x = np.asarray(x, np.float64)
+    y = np.asarray(y, np.float64)
+    # bucket i covers [edges[i], edges[i + 1]), between the first and the last point
+    edges = (np.arange(max_points - 1) * (n - 2) / (max_points - 2)).astype(
+        np.int64
+    ) + 1
+    # mean of each bucket, plus the last point as the "next bucket" of the last one
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[1:-1], edges[:-1] - 1) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[1:-1], edges[:-1] - 1) / counts, y[-1])
+
+    kept = np.empty(max_points, np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # twice the triangle areas, the constant factor doesn't change the argmax
+        areas = np.abs(
+            (x[a] - mean_x[i + 1]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (mean_y[i + 1] - y[a])
+        )
+        a = lo + int(np.argmax(areas))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample_bars(bars: dict, max_points: int):
+    """
+    downsample_bars Keep at most max_points bars, chosen by LTTB on the closing price.
+
+    Args:
+        bars (dict): An array per column, see ohlcv_store.COLUMNS, ascending by date.
+        max_points (int): Max number of bars, at least 3.
+
+    Raises:
+        ValueError: max_points is less than 3.
+
+    Returns:
+        dict: The kept bars, unchanged.
+    """
+    if max_points < 3:
+        raise ValueError(f"max_points must be at least 3, got {max_points}.")
+    if len(bars["date"]) <= max_points:
+        return bars
+
+    # NaN closes would win every triangle, give them the previous close
+    close = bars["close"]
+    if np.isnan(close).any():
+        valid = np.where(np.isnan(close), 0, np.arange(len(close)))
+        close = np.nan_to_num(close[np.maximum.accumulate(valid)])
+    indices = lttb_indices(bars["date"].astype(np.int64), close, max_points)
+    return {name: column[indices] for name, column in bars.items()}
@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def csv_chunks(stream):
+    """
+    csv_chunks Encode a row stream as CSV, one chunk of text per batch of rows.
+
+    Args:
+        stream (iterator): Column names followed by batches of rows, see DatabaseEditor._stream_query.
+
+    Yields:
+        str: The header line, then the lines of each batch.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(next(stream))
+    yield buffer.getvalue()
+
+    for rows in stream:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(stream):
+    """
+    ndjson_chunks Encode a row stream as newline-delimited JSON objects, one chunk of text per batch.
+
+    Args:
+        stream (iterator): Column names followed by batches of rows, see DatabaseEditor._stream_query.
+
+    Yields:
+        str: The JSON lines of each batch.
+    """
+    columns = next(stream)
+    for rows in stream:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_default) + "\n"
+            for row in rows
+        )
+
+
+# export format -> (encoder, mimetype)
+EXPORT_FORMATS = {
+    "csv": (csv_chunks, "text/csv"),
+    "ndjson": (ndjson_chunks, "application/x-ndjson"),
+}
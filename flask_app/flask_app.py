@@ -1,79 +1,412 @@
 from datetime import datetime, timedelta
+import functools
+import hashlib
 import logging
 import os
+import time
 
 import mysql.connector
 import yfinance as yf
-from db_api import DatabaseEditor
+from analytics import ANALYTICS_BENCHMARK
+from db_api import TRANSACTION_PAGE_SIZE, DatabaseEditor, data_change_listeners
+from db_pool import ConnectionPool
 from dotenv import load_dotenv
-from flask import Flask, jsonify, render_template, request
-from flask_restful import Api, Resource, reqparse
+from exporter import EXPORT_FORMATS
+from flask import Flask, Response, g, jsonify, render_template, request
+from flask_restful import Api, Resource, reqparse, unpack
+from metrics import http_request_seconds, metrics
+from ohlcv_store import ohlcv_store
+from portfolio_table import build_portfolio_table
+from profiling import PROFILING_ENABLED, RequestProfiler, is_admin, list_profiles
+from quote_cache import quote_cache
+from refresh_scheduler import RefreshScheduler
+from trade_stats import trade_stats
+from view_cache import view_cache
 
 # load the database password from the .env file
 load_dotenv()
 DB_PASSWORD = os.getenv("DB_PASSWORD")
+# set to 0 to disable the background market data refresh
+REFRESH_SCHEDULER_ENABLED = os.getenv("REFRESH_SCHEDULER_ENABLED", "1") == "1"
+# seconds /portfolio_table and /assets_breakdown are served from the view cache before a recompute
+PORTFOLIO_TABLE_CACHE_TTL = float(os.getenv("PORTFOLIO_TABLE_CACHE_TTL", "60"))
+ASSETS_BREAKDOWN_CACHE_TTL = float(os.getenv("ASSETS_BREAKDOWN_CACHE_TTL", "600"))
+
+# data sets each cached view is computed from, a change to one of them invalidates the view
+VIEW_DEPENDENCIES = {
+    "portfolio_table": ("portfolio", "transactions", "tickers", "ticker_data"),
+    "assets_breakdown": ("portfolio",),
+}
 
 app = Flask(__name__)
 api = Api(app)
 
+# connections are shared by all requests instead of opened per resource instance
+db_pool = ConnectionPool(
+    host="localhost", user="root", password=DB_PASSWORD, database="team11"
+)
+
+
+# state of the pool, quote cache and trades, read when /metrics is scraped
+metrics.callback(
+    "db_pool_connections",
+    "Connections of the database pool, by state.",
+    "gauge",
+    lambda: {
+        (k,): v for k, v in db_pool.stats().items() if k in ("open", "in_use", "idle")
+    },
+    ("state",),
+)
+metrics.callback(
+    "db_pool_timeouts_total",
+    "Requests that timed out waiting for a pooled connection.",
+    "counter",
+    lambda: db_pool.stats()["timeouts"],
+)
+metrics.callback(
+    "quote_cache_lookups_total",
+    "Quote cache lookups, by result.",
+    "counter",
+    lambda: {("hit",): quote_cache.hits, ("miss",): quote_cache.misses},
+    ("result",),
+)
+metrics.callback(
+    "view_cache_lookups_total",
+    "Computed view cache lookups, by result (hit, stale, miss).",
+    "counter",
+    lambda: {
+        ("hit",): view_cache.hits,
+        ("stale",): view_cache.stale_hits,
+        ("miss",): view_cache.misses,
+    },
+    ("result",),
+)
+metrics.callback(
+    "ohlcv_store_reads_total",
+    "Bar reads of the OHLCV store, by result (hit, or sync from ticker_data).",
+    "counter",
+    lambda: {
+        ("hit",): ohlcv_store("team11").hits,
+        ("sync",): ohlcv_store("team11").syncs,
+    },
+    ("result",),
+)
+metrics.callback(
+    "trades_total", "Trades executed.", "counter", lambda: trade_stats.count
+)
+metrics.callback(
+    "trades_over_budget_total",
+    "Trades slower than TRADE_LATENCY_BUDGET_MS.",
+    "counter",
+    lambda: trade_stats.over_budget,
+)
+
+
+def new_db_editor():
+    """
+    new_db_editor Returns a DatabaseEditor bound to a pooled connection, for use outside a request.
+
+    Returns:
+        DatabaseEditor: Database editor, the caller must disconnect it.
+    """
+    return DatabaseEditor(
+        host="localhost",
+        user="root",
+        password=DB_PASSWORD,
+        database="team11",
+        pool=db_pool,
+    )
 
-class CreatePortfolioTableItem(Resource):
-    def __init__(self):
-        self.db_editor = DatabaseEditor(
-            host="localhost", user="root", password=DB_PASSWORD, database="team11"
+
+def get_db_editor():
+    """
+    get_db_editor Returns the DatabaseEditor of the current request, borrowing a pooled connection on first use.
+
+    Returns:
+        DatabaseEditor: Database editor bound to a pooled connection.
+    """
+    if "db_editor" not in g:
+        g.db_editor = new_db_editor()
+    return g.db_editor
+
+
+def compute_view(build):
+    """
+    compute_view Returns a function computing a view with its own pooled connection.
+
+    For the background recompute of the view cache, which runs after the request that
+    triggered it released its connection. A request computing a view itself uses its own
+    connection instead: taking a second one while concurrent readers wait on it, each holding
+    theirs, could exhaust the pool.
+
+    Args:
+        build (callable): Function computing the view from a DatabaseEditor.
+
+    Returns:
+        callable: Zero-argument function returning the view.
+    """
+
+    def compute():
+        db_editor = new_db_editor()
+        try:
+            return build(db_editor)
+        finally:
+            db_editor.disconnect()
+
+    return compute
+
+
+def invalidate_views(names: list):
+    """
+    invalidate_views Invalidate the cached views computed from changed data sets.
+
+    Args:
+        names (list): Data sets changed by a DatabaseEditor, see VIEW_DEPENDENCIES.
+    """
+    changed = set(names)
+    view_cache.invalidate(
+        [view for view, sets in VIEW_DEPENDENCIES.items() if changed.intersection(sets)]
+    )
+
+
+# trades and ingestion in this process drop the views at once, other processes are caught by
+# the data version the views are stored with
+data_change_listeners.append(invalidate_views)
+
+# market data is refreshed in the background, request handlers only read from the db
+refresh_scheduler = RefreshScheduler(new_db_editor)
+
+
+@app.before_request
+def start_refresh_scheduler():
+    # started lazily so the reloader parent process and imports don't run it
+    if REFRESH_SCHEDULER_ENABLED:
+        refresh_scheduler.start()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    # labelled with the route pattern, not the path, to keep the number of series bounded
+    started = g.pop("request_started", None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        http_request_seconds.observe(
+            (request.method, endpoint, str(response.status_code)),
+            time.perf_counter() - started,
+        )
+    return response
+
+
+def profiling_token():
+    # admin token of the request, see profiling.py
+    return request.headers.get("X-Profile-Token") or request.args.get("profile")
+
+
+@app.before_request
+def start_request_profiler():
+    # opt-in: PROFILING_ENABLED in .env and the admin token on the request
+    if PROFILING_ENABLED and is_admin(profiling_token()):
+        profiler = RequestProfiler()
+        if profiler.start():
+            g.profiler = profiler
+
+
+@app.after_request
+def save_request_profile(response):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profile = profiler.stop(
+            request.url_rule.rule if request.url_rule else request.path,
+            {
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+            },
         )
+        response.headers["X-Profile-Id"] = profile["id"]
+    return response
+
+
+@app.teardown_request
+def discard_request_profiler(exception):
+    # after_request didn't run (the request failed), keep what was profiled
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop(request.path, {"error": repr(exception)})
+
+
+@app.teardown_appcontext
+def release_db_editor(exception):
+    # return the request's connection to the pool
+    db_editor = g.pop("db_editor", None)
+    if db_editor is not None:
+        db_editor.disconnect()
+
+
+def query_arg(name: str, type, default=None):
+    """
+    query_arg Returns a query argument converted by type, raising on a malformed value.
+
+    request.args.get(name, type=...) silently returns the default for a value it can't convert.
+
+    Args:
+        name (str): Query argument.
+        type (callable): Conversion, e.g. int or float.
+        default (optional): Value when the argument is missing. Defaults to None.
+
+    Raises:
+        ValueError: The argument can't be converted.
+
+    Returns:
+        The converted value, or default.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return type(value)
+    except ValueError:
+        raise ValueError(f"{name} is not a valid {type.__name__}: {value!r}.")
+
+
+def stream_export(name: str, open_stream):
+    """
+    stream_export Returns a streaming CSV or NDJSON response (?format=) of a DatabaseEditor row stream.
+
+    The export runs on its own pooled connection, held while the response is being sent and
+    released when the stream ends or the client disconnects.
+
+    Args:
+        name (str): Name of the exported table, used for the download file name.
+        open_stream (callable): Takes a DatabaseEditor and returns its row stream, raising
+            ValueError for invalid filters.
+
+    Returns:
+        Response: Streaming response, or an error and a 400 status.
+    """
+    export_format = request.args.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return {"error": f"Unknown export format {export_format}"}, 400
+    encode, mimetype = EXPORT_FORMATS[export_format]
+
+    db_editor = new_db_editor()
+    try:
+        stream = open_stream(db_editor)
+    except ValueError as e:
+        db_editor.disconnect()
+        return {"error": f"Invalid export query: {e}"}, 400
+
+    response = Response(
+        encode(stream),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={name}.{export_format}"},
+    )
+
+    @response.call_on_close
+    def release_export():
+        # runs once the response is sent or the client went away
+        stream.close()
+        db_editor.disconnect()
+
+    return response
+
+
+def conditional(*names: str, quotes: bool = False):
+    """
+    conditional Decorator answering conditional GETs of a resource from the data versions it reads.
+
+    The ETag is a hash of the versions of the named data sets (see
+    DatabaseEditor._bump_data_versions), "{t_id}" in a name is replaced with the requested
+    ticker. When it matches If-None-Match the response is a 304, read with a single query and
+    without calling the resource. Responses carry "Cache-Control: no-cache", so browsers
+    revalidate them instead of fetching them again.
+
+    The hash is in g.data_version and the versions in g.data_versions while the resource runs.
+    A resource serving older data (e.g. a stale cached view) replaces g.data_version with the
+    version of that data, so the ETag matches the body.
+
+    Args:
+        names (str): Data sets the resource reads, e.g. "portfolio" or "ticker_data:{t_id}".
+        quotes (bool, optional): The response includes current prices, the ETag also changes
+            every QUOTE_CACHE_TTL seconds. Defaults to False.
+    """
+
+    def decorator(get):
+        @functools.wraps(get)
+        def wrapper(self, **kwargs):
+            keys = [n.format(t_id=str(kwargs.get("t_id", "")).upper()) for n in names]
+            versions = g.data_versions = self.db_editor.get_data_versions(keys)
+            g.data_version = hashlib.sha1(
+                repr(sorted(versions.items())).encode()
+            ).hexdigest()[:20]
+
+            def response_headers():
+                etag = g.data_version
+                if quotes:
+                    etag += f"-{int(time.time() // quote_cache.ttl)}"
+                return etag, {"ETag": f'W/"{etag}"', "Cache-Control": "no-cache"}
+
+            etag, headers = response_headers()
+            if request.if_none_match.contains_weak(etag):
+                return Response(status=304, headers=headers)
+
+            result = get(self, **kwargs)
+            etag, headers = response_headers()
+            if isinstance(result, Response):
+                if result.status_code == 200:
+                    result.headers.update(headers)
+                return result
+            data, code, result_headers = unpack(result)
+            if code == 200:
+                result_headers = {**result_headers, **headers}
+            return data, code, result_headers
+
+        return wrapper
+
+    return decorator
+
 
-    def __del__(self):
-        self.db_editor.disconnect()
+class CreatePortfolioTableItem(Resource):
+    def __init__(self):
+        self.db_editor = get_db_editor()
 
     # GET /portfolio_table
+    @conditional(*VIEW_DEPENDENCIES["portfolio_table"], quotes=True)
     def get(self):
-        table = {}
-        for t_id in self.db_editor.get_tickers():
-            # try:
-            market_value = self.db_editor.get_market_value(t_id)
-            num_shares = self.db_editor.get_num_shares(t_id)
-            asset_type = self.db_editor.get_asset_type(t_id)
-            net_gainloss = self.db_editor.calc_profit(t_id)[1]
-            
-            # fetch yfinance data for a given ticker
-            ticker = yf.Ticker(t_id)
-            high_52 = ticker.info["fiftyTwoWeekHigh"]
-            low_52 = ticker.info["fiftyTwoWeekLow"]
-            name = ticker.info["shortName"]
-
-            high_52 = f"{high_52:.2f}"
-            low_52 = f"{low_52:.2f}"
-
-            table[t_id] = {
-                "market_value": f"{market_value:.2f}",
-                "num_shares": num_shares,
-                "net_gainloss":  f"{net_gainloss:.2f}",
-                "high_52": high_52,
-                "low_52": low_52,
-                "name": name,
-                "asset_type": asset_type,
-            }
-            # except:
-            #     return {"error": f"Data for ticker {t_id} not found"}, 404
-
-        # sort table by num_shares
-        table = dict(
-            sorted(table.items(), key=lambda item: item[1]["num_shares"], reverse=True)
+        """
+        get Get a row per holding with its market value, profit and metadata.
+
+        Uncached tickers are priced in one batch within PORTFOLIO_TICKER_TIMEOUT once started
+        and PORTFOLIO_TABLE_DEADLINE overall. Rows that missed the deadline or failed use the last
+        stored close, with "stale": true and the reason in "error".
+
+        The table is served from the view cache for PORTFOLIO_TABLE_CACHE_TTL seconds, then
+        for VIEW_CACHE_STALE_TTL more while it is recomputed in the background.
+
+        Returns:
+            dict: A dictionary containing the row of each ticker.
+        """
+        table, g.data_version = view_cache.get_or_compute(
+            "portfolio_table",
+            lambda: build_portfolio_table(self.db_editor),
+            PORTFOLIO_TABLE_CACHE_TTL,
+            g.data_version,
+            refresh=compute_view(build_portfolio_table),
         )
         return table, 200
 
 
 class PortfolioResource(Resource):
     def __init__(self):
-        self.db_editor = DatabaseEditor(
-            host="localhost", user="root", password=DB_PASSWORD, database="team11"
-        )
-
-    def __del__(self):
-        self.db_editor.disconnect()
+        self.db_editor = get_db_editor()
 
     # GET /portfolio
+    @conditional("portfolio", quotes=True)
     def get(self):
         """
         get Get the portfolio from the database (table: portfolio)
@@ -87,14 +420,10 @@ class PortfolioResource(Resource):
 
 class TransactionHistoryResource(Resource):
     def __init__(self):
-        self.db_editor = DatabaseEditor(
-            host="localhost", user="root", password=DB_PASSWORD, database="team11"
-        )
-
-    def __del__(self):
-        self.db_editor.disconnect()
+        self.db_editor = get_db_editor()
 
     # GET /transaction_history/<t_id>
+    @conditional("transactions")
     def get(self, t_id):
         """
         get Get all transactions for a given ticker from the database.
@@ -111,33 +440,37 @@ class TransactionHistoryResource(Resource):
 
 class TransactionsHistoryResource(Resource):
     def __init__(self):
-        self.db_editor = DatabaseEditor(
-            host="localhost", user="root", password=DB_PASSWORD, database="team11"
-        )
-
-    def __del__(self):
-        self.db_editor.disconnect()
+        self.db_editor = get_db_editor()
 
-    # GET /transaction_history
+    # GET /transaction_history?limit=&after=&ticker=&type=&start=&end=
+    @conditional("transactions")
     def get(self):
         """
-        get Get the complete transaction history from the database.
+        get Get one page of the transaction history from the database, most recent first.
+
+        Query args: limit (page size), after (the "next" cursor of the previous page), ticker,
+        type ("buy" or "sell"), start and end (ISO dates).
 
         Returns:
-            dict: A dictionary containing the transaction history data.
+            dict: A dictionary containing the transactions of the page and the cursor of the next page.
         """
-        transaction_history = self.db_editor.get_transaction_history()
-        return transaction_history, 200
+        try:
+            page = self.db_editor.get_transaction_page(
+                limit=query_arg("limit", int, TRANSACTION_PAGE_SIZE),
+                after=request.args.get("after"),
+                ticker_id=request.args.get("ticker"),
+                transaction_type=request.args.get("type"),
+                start=request.args.get("start"),
+                end=request.args.get("end"),
+            )
+        except ValueError as e:
+            return {"error": f"Invalid transaction history query: {e}"}, 400
+        return page, 200
 
 
 class BuyResource(Resource):
     def __init__(self):
-        self.db_editor = DatabaseEditor(
-            host="localhost", user="root", password=DB_PASSWORD, database="team11"
-        )
-
-    def __del__(self):
-        self.db_editor.disconnect()
+        self.db_editor = get_db_editor()
 
     # POST /buy/<t_id>/<num_shares>
     def post(self, t_id, num_shares):
@@ -148,18 +481,16 @@ class BuyResource(Resource):
             t_id (int): ID of the ticker to buy.
             num_shares (int): Number of shares to purchase.
         """
-        status = self.db_editor.buy_ticker(t_id, num_shares)
-        return status, 200
+        result = self.db_editor.execute_trade(t_id, num_shares, "buy")
+        if result["status"] == "ok":
+            # backfill the price history in the background
+            refresh_scheduler.submit(t_id)
+        return result["message"], 200
 
 
 class SellResource(Resource):
     def __init__(self):
-        self.db_editor = DatabaseEditor(
-            host="localhost", user="root", password=DB_PASSWORD, database="team11"
-        )
-
-    def __del__(self):
-        self.db_editor.disconnect()
+        self.db_editor = get_db_editor()
 
     # POST /sell/<t_id>/<num_shares>
     def post(self, t_id, num_shares):
@@ -170,20 +501,86 @@ class SellResource(Resource):
             t_id (int): ID of the ticker to sell.
             num_shares (int): Number of shares to sell.
         """
-        status = self.db_editor.sell_ticker(t_id, num_shares)
-        return status, 200
+        result = self.db_editor.execute_trade(t_id, num_shares, "sell")
+        if result["status"] == "ok":
+            refresh_scheduler.submit(t_id)
+        return result["message"], 200
 
 
-class TickersResource(Resource):
+class OrdersResource(Resource):
     def __init__(self):
-        self.db_editor = DatabaseEditor(
-            host="localhost", user="root", password=DB_PASSWORD, database="team11"
+        self.db_editor = get_db_editor()
+
+    # POST /orders
+    def post(self):
+        """
+        post Execute a batch of buy and sell orders.
+
+        The body is a JSON list of {"ticker_id", "num_shares", "transaction_type"} orders,
+        or an object with that list under "orders".
+
+        Returns:
+            dict: A dictionary containing the status of each order and the batch throughput.
+        """
+        payload = request.get_json(silent=True)
+        orders = payload.get("orders") if isinstance(payload, dict) else payload
+        if not isinstance(orders, list) or not orders:
+            return {"error": "Expected a JSON list of orders"}, 400
+
+        result = self.db_editor.execute_orders(orders)
+        # backfill the price history of the traded tickers in the background
+        for t_id in {r["ticker_id"] for r in result["results"] if r["status"] == "ok"}:
+            refresh_scheduler.submit(t_id)
+        return result, 200
+
+
+class TransactionsExportResource(Resource):
+    # GET /export/transactions?format=&start=&end=&ticker=
+    def get(self):
+        """
+        get Stream the transactions in date order as CSV or NDJSON.
+
+        Returns:
+            Response: Streaming response with the transactions.
+        """
+        return stream_export(
+            "transactions",
+            lambda db_editor: db_editor.stream_transactions(
+                start=request.args.get("start"),
+                end=request.args.get("end"),
+                ticker_id=request.args.get("ticker"),
+            ),
+        )
+
+
+class TickerDataExportResource(Resource):
+    # GET /export/ticker_data[/<t_id>]?format=&start=&end=
+    def get(self, t_id=None):
+        """
+        get Stream the price history of one or all tickers as CSV or NDJSON.
+
+        Args:
+            t_id (str, optional): Symbol of the ticker to export. Defaults to None (all tickers).
+
+        Returns:
+            Response: Streaming response with the ticker_data rows.
+        """
+        return stream_export(
+            f"ticker_data_{t_id.upper()}" if t_id else "ticker_data",
+            lambda db_editor: db_editor.stream_ticker_data(
+                ticker_id=t_id,
+                start=request.args.get("start"),
+                end=request.args.get("end"),
+            ),
         )
 
-    def __del__(self):
-        self.db_editor.disconnect()
+
+class TickersResource(Resource):
+    def __init__(self):
+        self.db_editor = get_db_editor()
 
     # GET /tickers
+    @conditional("portfolio")
     def get(self):
         """
         get Get all tickers in the user's portfolio.
@@ -197,14 +594,10 @@ class TickersResource(Resource):
 
 class TickerDataResource(Resource):
     def __init__(self):
-        self.db_editor = DatabaseEditor(
-            host="localhost", user="root", password=DB_PASSWORD, database="team11"
-        )
-
-    def __del__(self):
-        self.db_editor.disconnect()
+        self.db_editor = get_db_editor()
 
     # GET /tickers/<t_id>
+    @conditional("portfolio")
     def get(self, t_id):
         """
         get Get a ticker from the database (table: portfolio)
@@ -221,39 +614,222 @@ class TickerDataResource(Resource):
 
 class TickerDataTableResource(Resource):
     def __init__(self):
-        self.db_editor = DatabaseEditor(
-            host="localhost", user="root", password=DB_PASSWORD, database="team11"
-        )
-
-    def __del__(self):
-        self.db_editor.disconnect()
+        self.db_editor = get_db_editor()
 
-    # GET /ticker_data/<t_id>
+    # GET /ticker_data/<t_id>?start=&end=&resolution=&max_points=
+    @conditional("ticker_data:{t_id}")
     def get(self, t_id):
-        return self.db_editor.get_ticker_data(t_id)
+        """
+        get Get the bars of a ticker, optionally limited to a date range and downsampled.
+
+        Query args: start and end (ISO dates), resolution ("raw", "daily", "weekly" or
+        "monthly" OHLC bars with summed volume) and max_points (shape-preserving LTTB
+        decimation of the result, e.g. the width of the chart in pixels).
+
+        Returns:
+            Response: JSON list of rows, see DatabaseEditor.get_ticker_data.
+        """
+        try:
+            return self.db_editor.get_ticker_data(
+                t_id,
+                g.data_versions[f"ticker_data:{t_id.upper()}"],
+                start=request.args.get("start"),
+                end=request.args.get("end"),
+                resolution=request.args.get("resolution", "raw"),
+                max_points=query_arg("max_points", int),
+            )
+        except ValueError as e:
+            return {"error": f"Invalid ticker data query: {e}"}, 400
 
 
 class AssetsBreakdownResource(Resource):
     def __init__(self):
-        self.db_editor = DatabaseEditor(
-            host="localhost", user="root", password=DB_PASSWORD, database="team11"
-        )
-
-    def __del__(self):
-        self.db_editor.disconnect()
+        self.db_editor = get_db_editor()
 
     # GET /assets_breakdown
+    @conditional(*VIEW_DEPENDENCIES["assets_breakdown"])
     def get(self):
         """
-        get Get the asset breakdown from the database (table: portfolio)
+        get Get the asset breakdown from the database (table: portfolio), through the view cache
 
         Returns:
             dict: A dictionary containing the asset breakdown data.
         """
-        asset_breakdown = self.db_editor.asset_type_breakdown()
+        asset_breakdown, g.data_version = view_cache.get_or_compute(
+            "assets_breakdown",
+            lambda: DatabaseEditor.asset_type_breakdown(self.db_editor),
+            ASSETS_BREAKDOWN_CACHE_TTL,
+            g.data_version,
+            refresh=compute_view(DatabaseEditor.asset_type_breakdown),
+        )
         return asset_breakdown, 200
 
 
+class PortfolioRiskResource(Resource):
+    def __init__(self):
+        self.db_editor = get_db_editor()
+
+    # GET /analytics/risk?benchmark=&start=&end=&confidence=&horizon=
+    @conditional("portfolio", "ticker_data")
+    def get(self):
+        """
+        get Get the volatility, beta and value at risk of each holding and of the portfolio.
+
+        Query args: benchmark (ticker with bars in ticker_data, default ANALYTICS_BENCHMARK),
+        start and end (ISO dates), confidence (VaR level, default 0.95) and horizon (VaR days,
+        default 1).
+
+        Returns:
+            dict: A dictionary containing the risk of each holding and of the portfolio.
+        """
+        try:
+            risk = self.db_editor.get_portfolio_risk(
+                benchmark=request.args.get("benchmark", ANALYTICS_BENCHMARK),
+                start=request.args.get("start"),
+                end=request.args.get("end"),
+                confidence=query_arg("confidence", float, 0.95),
+                horizon=query_arg("horizon", int, 1),
+            )
+        except ValueError as e:
+            return {"error": f"Invalid risk query: {e}"}, 400
+        return risk, 200
+
+
+class CorrelationResource(Resource):
+    def __init__(self):
+        self.db_editor = get_db_editor()
+
+    # GET /analytics/correlation?tickers=&kind=&start=&end=
+    @conditional("portfolio", "ticker_data")
+    def get(self):
+        """
+        get Get the correlation (kind=corr) or annualized covariance (kind=cov) matrix of daily log returns.
+
+        Query args: tickers (comma separated, default the holdings), kind, start and end
+        (ISO dates).
+
+        Returns:
+            dict: A dictionary containing the tickers and the matrix.
+        """
+        tickers = request.args.get("tickers")
+        try:
+            matrix = self.db_editor.get_correlations(
+                ticker_ids=tickers.split(",") if tickers else None,
+                start=request.args.get("start"),
+                end=request.args.get("end"),
+                kind=request.args.get("kind", "corr"),
+            )
+        except ValueError as e:
+            return {"error": f"Invalid correlation query: {e}"}, 400
+        return matrix, 200
+
+
+class RollingStatsResource(Resource):
+    def __init__(self):
+        self.db_editor = get_db_editor()
+
+    # GET /analytics/rolling?tickers=
+    @conditional("portfolio", "return_stats")
+    def get(self):
+        """
+        get Get the running mean, volatility and correlations of daily log returns, over the whole history and the rolling window.
+
+        Query args: tickers (comma separated, default the holdings).
+
+        Returns:
+            dict: A dictionary containing the statistics of each ticker and pair.
+        """
+        tickers = request.args.get("tickers")
+        return (
+            self.db_editor.get_return_stats(tickers.split(",") if tickers else None),
+            200,
+        )
+
+
+class QuoteCacheResource(Resource):
+    # GET /quote_cache
+    def get(self):
+        """
+        get Get the hit/miss counters of the process-wide quote cache.
+
+        Returns:
+            dict: A dictionary containing the quote cache stats.
+        """
+        return quote_cache.stats(), 200
+
+
+class ViewCacheResource(Resource):
+    # GET /view_cache
+    def get(self):
+        """
+        get Get the counters of the computed view cache and the age of each cached view.
+
+        Returns:
+            dict: A dictionary containing the view cache stats.
+        """
+        return view_cache.stats(), 200
+
+
+class RefreshRunsResource(Resource):
+    # GET /refresh_runs
+    def get(self):
+        """
+        get Get the most recent background refresh jobs and when the next run is due.
+
+        Returns:
+            dict: A dictionary containing the refresh job records.
+        """
+        next_run_at = refresh_scheduler.next_run_at
+        return {
+            "next_run_at": next_run_at.isoformat() if next_run_at else None,
+            "runs": refresh_scheduler.runs(),
+        }, 200
+
+
+class TradeStatsResource(Resource):
+    # GET /trade_stats
+    def get(self):
+        """
+        get Get the latency percentiles and average db/upstream cost of recent trades.
+
+        Returns:
+            dict: A dictionary containing the trade stats.
+        """
+        return trade_stats.summary(), 200
+
+
+class ProfilesResource(Resource):
+    # GET /profiles?limit=
+    def get(self):
+        """
+        get List the most recent request profiles, admins only (X-Profile-Token header or ?profile=).
+
+        Returns:
+            dict: A dictionary containing the summary and file paths of each profile, newest first.
+        """
+        if not PROFILING_ENABLED:
+            return {"error": "Profiling is disabled, set PROFILING_ENABLED=1"}, 404
+        if not is_admin(profiling_token()):
+            return {"error": "A valid profiling token is required"}, 403
+        try:
+            limit = query_arg("limit", int, 20)
+        except ValueError as e:
+            return {"error": f"Invalid profiles query: {e}"}, 400
+        return {"profiles": list_profiles(limit)}, 200
+
+
+class DbPoolResource(Resource):
+    # GET /db_pool
+    def get(self):
+        """
+        get Get the usage counters of the database connection pool.
+
+        Returns:
+            dict: A dictionary containing the connection pool stats.
+        """
+        return db_pool.stats(), 200
+
+
 # add resources to api
 api.add_resource(CreatePortfolioTableItem, "/portfolio_table")
 api.add_resource(PortfolioResource, "/portfolio")
@@ -261,41 +837,41 @@ api.add_resource(TransactionHistoryResource, "/transaction_history/<string:t_id>
 api.add_resource(TransactionsHistoryResource, "/transaction_history")
 api.add_resource(BuyResource, "/buy/<string:t_id>/<int:num_shares>")
 api.add_resource(SellResource, "/sell/<string:t_id>/<int:num_shares>")
+api.add_resource(OrdersResource, "/orders")
+api.add_resource(TransactionsExportResource, "/export/transactions")
+api.add_resource(
+    TickerDataExportResource, "/export/ticker_data", "/export/ticker_data/<string:t_id>"
+)
 api.add_resource(TickersResource, "/tickers")
 api.add_resource(TickerDataResource, "/tickers/<string:t_id>")
 api.add_resource(AssetsBreakdownResource, "/assets_breakdown")
 api.add_resource(TickerDataTableResource, "/ticker_data/<string:t_id>")
+api.add_resource(PortfolioRiskResource, "/analytics/risk")
+api.add_resource(CorrelationResource, "/analytics/correlation")
+api.add_resource(RollingStatsResource, "/analytics/rolling")
+api.add_resource(QuoteCacheResource, "/quote_cache")
+api.add_resource(ViewCacheResource, "/view_cache")
+api.add_resource(DbPoolResource, "/db_pool")
+api.add_resource(ProfilesResource, "/profiles")
+api.add_resource(RefreshRunsResource, "/refresh_runs")
+api.add_resource(TradeStatsResource, "/trade_stats")
 
 
 @app.route("/")
 def home():
-    db_editor = DatabaseEditor(
-        host="localhost", user="root", password=DB_PASSWORD, database="team11"
-    )
+    db_editor = get_db_editor()
 
     portfolio_data = db_editor.display_portfolio_yf()
-    
     # asset_type_data = db_editor.asset_type_breakdown()
-    for ticker in db_editor.get_tickers():
-        db_editor.backlog_ticker_data(ticker)
-
-    # refresh db with yfinance data
-    # db_editor.update_ticker_data()
-    db_editor.disconnect()
 
+    # ticker data and metadata are refreshed by refresh_scheduler, not on page load
     return render_template("home.html", portfolio_data=portfolio_data)
 
 
 @app.route("/transactions")
 def transactions():
-    # get transcation history
-    db_editor = DatabaseEditor(
-        host="localhost", user="root", password=DB_PASSWORD, database="team11"
-    )
-
-    transaction_history = db_editor.get_transaction_history()
-    db_editor.disconnect()
-    return render_template("transactions.html", transaction_history=transaction_history)
+    # the transaction history is loaded page by page from /transaction_history
+    return render_template("transactions.html", page_size=TRANSACTION_PAGE_SIZE)
 
 
 @app.route("/about")
@@ -310,17 +886,16 @@ def buy_sell():
     num_shares = request.form["num_shares"]
     transaction_type = request.form["transaction_type"]
 
-    db_editor = DatabaseEditor(
-        host="localhost", user="root", password=DB_PASSWORD, database="team11"
-    )
+    db_editor = get_db_editor()
 
-    if transaction_type == "buy":
-        status = db_editor.buy_ticker(ticker_id, num_shares)
-    else:  # sell
-        status = db_editor.sell_ticker(ticker_id, num_shares)
+    if transaction_type != "buy":
+        transaction_type = "sell"
+    result = db_editor.execute_trade(ticker_id, num_shares, transaction_type)
+    if result["status"] == "ok":
+        # backfill the price history in the background
+        refresh_scheduler.submit(ticker_id)
 
-    db_editor.disconnect()
-    return render_template("transaction_status.html", status=status)
+    return render_template("transaction_status.html", status=result["message"])
 
 
 @app.route("/docs")
@@ -328,5 +903,11 @@ def docs():
     return render_template("docs.html")
 
 
+@app.route("/metrics")
+def prometheus_metrics():
+    # request, database and Yahoo! Finance latencies in the Prometheus text format
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
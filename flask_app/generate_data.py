@@ -1,12 +1,29 @@
+import argparse
+import csv
+import logging
 import os
 import random
+import tempfile
 from datetime import datetime, time, timedelta
 
+import mysql.connector
+import numpy as np
+import pandas as pd
 from db_api import DatabaseEditor
 from dotenv import load_dotenv
+from ohlcv_store import ohlcv_store
+from positions import apply_trade, empty_position
 
 load_dotenv()
 DB_PASSWORD = os.getenv("DB_PASSWORD")
+# rows sent per multi-row INSERT (or per LOAD DATA file) by the synthetic generator
+SYNTHETIC_BATCH_SIZE = int(os.getenv("SYNTHETIC_BATCH_SIZE", "10000"))
+# transactions generated, loaded and committed at a time by the synthetic generator
+SYNTHETIC_CHUNK_SIZE = int(os.getenv("SYNTHETIC_CHUNK_SIZE", "200000"))
+
+SESSION_OPEN = np.timedelta64(9 * 3600 + 30 * 60, "s")
+SESSION_SECONDS = 23400  # 9:30 to 16:00
+TRADING_DAYS = 252  # per year, the GBM time step is one trading day
 
 
 def random_stock_market_datetime(start_date=datetime(2023, 1, 1), end_date=None):
@@ -39,9 +56,396 @@ def random_stock_market_datetime(start_date=datetime(2023, 1, 1), end_date=None)
     return random_dt
 
 
+def synthetic_market(num_tickers: int, dates, seed: int = 0):
+    """
+    synthetic_market Simulate a ticker universe and its daily bars with geometric Brownian motion.
+
+    Each ticker gets its own drift and volatility, closes follow
+    S_t = S_t-1 * exp((mu - sigma^2 / 2) dt + sigma sqrt(dt) Z) with dt one trading day, opens gap
+    from the previous close and highs/lows reach past both. The same seed gives the same market.
+
+    Args:
+        num_tickers (int): Number of tickers.
+        dates (pd.DatetimeIndex): Dates of the bars (midnight).
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        list: (ticker_id, name, quote_type) of each ticker.
+        dict: open, high, low, close and volume arrays of shape (tickers, bars).
+    """
+    rng = np.random.default_rng([seed, 0])
+    shape = (num_tickers, len(dates))
+    universe = [
+        (f"SYN{i:05d}", f"Synthetic Asset {i}", "ETF" if is_etf else "EQUITY")
+        for i, is_etf in enumerate(rng.random(num_tickers) < 0.2)
+    ]
+
+    step = np.sqrt(1 / TRADING_DAYS)
+    mu = rng.normal(0.07, 0.1, (num_tickers, 1))
+    sigma = rng.uniform(0.15, 0.6, (num_tickers, 1))
+    first = np.exp(rng.normal(np.log(50), 1, (num_tickers, 1)))
+
+    log_returns = (
+        mu - sigma**2 / 2
+    ) * step**2 + sigma * step * rng.standard_normal(shape)
+    close = first * np.exp(np.cumsum(log_returns, axis=1))
+    previous = np.concatenate((first, close[:, :-1]), axis=1)
+    open_ = previous * np.exp(0.2 * sigma * step * rng.standard_normal(shape))
+    reach = np.abs(rng.standard_normal((2,) + shape)) * sigma * step / 2
+
+    return universe, {
+        "open": open_.round(4),
+        "high": (np.maximum(open_, close) * (1 + reach[0])).round(4),
+        "low": (np.minimum(open_, close) * (1 - reach[1])).round(4),
+        "close": close.round(4),
+        "volume": rng.lognormal(np.log(10**6), 1, shape).astype(np.int64),
+    }
+
+
+def synthetic_transactions(
+    universe: list,
+    dates,
+    prices: dict,
+    num_transactions: int,
+    positions: dict,
+    daily: dict,
+    seed: int = 0,
+    chunk_size: int = SYNTHETIC_CHUNK_SIZE,
+):
+    """
+    synthetic_transactions Generate a valid transaction history over a synthetic market, in date order.
+
+    Trade times are uniform over the trading sessions, tickers are picked with a skewed
+    (Zipf-like) popularity and trades are priced between the open and close of their bar by time
+    of day. A trade is a sell with probability 0.45 when enough shares are held and a buy
+    otherwise, so no position goes negative.
+
+    Args:
+        universe (list): (ticker_id, name, quote_type) of each ticker, see synthetic_market.
+        dates (pd.DatetimeIndex): Dates of the bars (midnight).
+        prices (dict): Bar arrays, see synthetic_market.
+        num_transactions (int): Number of transactions.
+        positions (dict): Position of each ticker, updated with every trade.
+        daily (dict): "shares" and "investment" arrays of shape (tickers, bars), the net shares
+            and money traded each day are added to them.
+        seed (int, optional): Random seed. Defaults to 0.
+        chunk_size (int, optional): Transactions per chunk. Defaults to SYNTHETIC_CHUNK_SIZE.
+
+    Yields:
+        list: (ticker_id, num_shares, price, transaction_type, date) rows of each chunk.
+    """
+    rng = np.random.default_rng([seed, 1])
+    num_tickers, num_bars = prices["close"].shape
+    ticker_ids = [t[0] for t in universe]
+    popularity = 1 / np.arange(1, num_tickers + 1) ** 0.8
+    session_opens = dates.values.astype("datetime64[s]") + SESSION_OPEN
+
+    # seconds of trading since the first session, sorted so the history is in date order
+    seconds = np.sort(rng.integers(0, num_bars * SESSION_SECONDS, num_transactions))
+
+    for begin in range(0, num_transactions, chunk_size):
+        bar, offset = np.divmod(seconds[begin : begin + chunk_size], SESSION_SECONDS)
+        tickers = rng.choice(num_tickers, len(bar), p=popularity / popularity.sum())
+        num_shares = rng.integers(1, 20, len(bar))
+        wants_sell = rng.random(len(bar)) < 0.45
+        open_ = prices["open"][tickers, bar]
+        close = prices["close"][tickers, bar]
+        price = (open_ + (close - open_) * offset / SESSION_SECONDS).round(4)
+        dates_ = (session_opens[bar] + offset.astype("timedelta64[s]")).tolist()
+
+        rows = []
+        is_sell = np.zeros(len(bar), dtype=bool)
+        for i, (t, n, sell, p, date) in enumerate(
+            zip(
+                tickers.tolist(),
+                num_shares.tolist(),
+                wants_sell.tolist(),
+                price.tolist(),
+                dates_,
+            )
+        ):
+            ticker_id = ticker_ids[t]
+            if sell and positions[ticker_id]["shares_held"] >= n:
+                is_sell[i] = True
+                rows.append((ticker_id, n, -p, "sell", date))
+            else:
+                rows.append((ticker_id, n, p, "buy", date))
+            positions[ticker_id] = apply_trade(
+                positions[ticker_id], rows[-1][3], n, p, date
+            )
+
+        # note: price is stored as a negative number for sell transactions
+        signed_shares = np.where(is_sell, -num_shares, num_shares)
+        np.add.at(daily["shares"], (tickers, bar), signed_shares)
+        np.add.at(
+            daily["investment"],
+            (tickers, bar),
+            np.abs(signed_shares) * np.where(is_sell, -price, price),
+        )
+        yield rows
+
+
+def bulk_load(cursor, table: str, columns: list, rows: list, method: str = "insert"):
+    """
+    bulk_load Load rows into a table SYNTHETIC_BATCH_SIZE at a time, without committing.
+
+    With "insert", mysql-connector sends each executemany() batch as a single multi-row INSERT.
+    With "infile", each batch is written to a temporary CSV file and loaded with
+    LOAD DATA LOCAL INFILE, which needs local_infile enabled on the server and the connection.
+
+    Args:
+        cursor (MySQLCursor): Cursor of the loading connection.
+        table (str): Table to load.
+        columns (list): Column of each row value.
+        rows (list): Rows to load.
+        method (str, optional): "insert" or "infile". Defaults to "insert".
+    """
+    for begin in range(0, len(rows), SYNTHETIC_BATCH_SIZE):
+        batch = rows[begin : begin + SYNTHETIC_BATCH_SIZE]
+        if method == "insert":
+            cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))});",
+                batch,
+            )
+            continue
+
+        with tempfile.NamedTemporaryFile(
+            "w", newline="", suffix=".csv", delete=False
+        ) as f:
+            csv.writer(f).writerows(batch)
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} FIELDS TERMINATED BY ',' "
+                f"OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\r\\n' ({', '.join(columns)});",
+                (f.name,),
+            )
+        finally:
+            os.remove(f.name)
+
+
+def generate_synthetic(
+    db_editor,
+    num_tickers: int = 100,
+    num_transactions: int = 100000,
+    start: datetime = datetime(2015, 1, 1),
+    end: datetime = None,
+    seed: int = 0,
+    method: str = "insert",
+    chunk_size: int = SYNTHETIC_CHUNK_SIZE,
+):
+    """
+    generate_synthetic Fill an empty database with a seeded synthetic market and transaction history.
+
+    Loads consistent tickers, ticker_data, transactions, positions and portfolio rows: bars carry
+    the profit of the history at each date (as recompute_profits would store it), the ledger and
+    portfolio hold the final positions, the return statistics are built and the watermarks are
+    current, so nothing is fetched from Yahoo! Finance afterwards. Transactions are generated,
+    loaded and committed chunk_size at a time with unique and foreign key checks off, 10M of
+    them take minutes.
+
+    Args:
+        db_editor (DatabaseEditor): Editor connected to an empty database (fresh schema.sql).
+        num_tickers (int, optional): Number of tickers. Defaults to 100.
+        num_transactions (int, optional): Number of transactions. Defaults to 100000.
+        start (datetime, optional): Date of the first bar. Defaults to 2015-01-01.
+        end (datetime, optional): Date of the last bar. Defaults to None (yesterday).
+        seed (int, optional): Random seed. Defaults to 0.
+        method (str, optional): "insert" (multi-row INSERTs) or "infile" (LOAD DATA LOCAL INFILE).
+            Defaults to "insert".
+        chunk_size (int, optional): Transactions per commit. Defaults to SYNTHETIC_CHUNK_SIZE.
+
+    Raises:
+        ValueError: The database already has tickers, or there is no business day between start and end.
+
+    Returns:
+        dict: Number of tickers, bars and transactions loaded and the seconds it took.
+    """
+    started = datetime.now()
+    db_editor.cursor.execute("SELECT COUNT(*) FROM tickers;")
+    if db_editor.cursor.fetchone()[0] > 0:
+        raise ValueError(
+            f"{db_editor.db_name} already has tickers, load synthetic data into a fresh schema."
+        )
+    # a fresh schema restarts the data versions, drop the bars stored for the previous one
+    ohlcv_store(db_editor.db_name).clear()
+    if end is None:
+        end = datetime.combine(datetime.today().date(), time()) - timedelta(days=1)
+    dates = pd.bdate_range(start, end, normalize=True)
+    if len(dates) == 0:
+        raise ValueError(f"No business day between {start} and {end}.")
+
+    universe, prices = synthetic_market(num_tickers, dates, seed)
+    bar_dates = dates.to_pydatetime().tolist()
+    year = slice(-TRADING_DAYS, None)
+    db_editor.cursor.executemany(
+        "INSERT INTO tickers (ticker_id, name, quote_type, high_52, low_52, refreshed_at, "
+        "last_bar_at, checked_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s);",
+        [
+            (ticker_id, name, quote_type, high, low, started, bar_dates[-1], started)
+            for (ticker_id, name, quote_type), high, low in zip(
+                universe,
+                prices["high"][:, year].max(axis=1).tolist(),
+                prices["low"][:, year].min(axis=1).tolist(),
+            )
+        ],
+    )
+    db_editor.db.commit()
+
+    if method == "infile":
+        db = mysql.connector.connect(
+            host=db_editor.host,
+            user=db_editor.user,
+            password=db_editor.password,
+            database=db_editor.db_name,
+            allow_local_infile=True,
+        )
+        cursor = db.cursor()
+    else:
+        db, cursor = db_editor.db, db_editor.cursor
+    cursor.execute("SET unique_checks = 0, foreign_key_checks = 0;")
+
+    try:
+        positions = {t[0]: empty_position() for t in universe}
+        daily = {
+            "shares": np.zeros(prices["close"].shape),
+            "investment": np.zeros(prices["close"].shape),
+        }
+        loaded = 0
+        for rows in synthetic_transactions(
+            universe,
+            dates,
+            prices,
+            num_transactions,
+            positions,
+            daily,
+            seed,
+            chunk_size,
+        ):
+            bulk_load(
+                cursor,
+                "transactions",
+                ["ticker_id", "num_shares", "price", "transaction_type", "date"],
+                rows,
+                method,
+            )
+            db.commit()
+            loaded += len(rows)
+            logging.info(f"Loaded {loaded}/{num_transactions} transactions.")
+
+        # shares held and money invested up to midnight of each bar, as in profit_series
+        held = np.cumsum(daily["shares"], axis=1) - daily["shares"]
+        invested = np.cumsum(daily["investment"], axis=1) - daily["investment"]
+        abs_profit = held * prices["close"] - invested
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent_profit = np.where(invested != 0, abs_profit / invested * 100, 0.0)
+
+        rows = []
+        for i, (ticker_id, _, _) in enumerate(universe):
+            rows += zip(
+                [ticker_id] * len(bar_dates),
+                *(prices[c][i].tolist() for c in ("open", "high", "low", "close")),
+                prices["volume"][i].tolist(),
+                bar_dates,
+                abs_profit[i].round(4).tolist(),
+                percent_profit[i].round(4).tolist(),
+            )
+            if len(rows) >= chunk_size or i == len(universe) - 1:
+                bulk_load(
+                    cursor,
+                    "ticker_data",
+                    ["ticker_id", "open", "high", "low", "close", "volume", "date"]
+                    + ["abs_profit", "percent_profit"],
+                    rows,
+                    method,
+                )
+                db.commit()
+                rows = []
+    finally:
+        cursor.execute("SET unique_checks = 1, foreign_key_checks = 1;")
+        if method == "infile":
+            cursor.close()
+            db.close()
+
+    db_editor._save_positions(
+        {t: p for t, p in positions.items() if p["last_trade_at"] is not None}
+    )
+    db_editor.cursor.executemany(
+        "INSERT INTO portfolio (ticker_id, total_shares, total_return, asset_type) "
+        "VALUES (%s, %s, 0, %s);",
+        [
+            (ticker_id, positions[ticker_id]["shares_held"], quote_type)
+            for ticker_id, _, quote_type in universe
+            if positions[ticker_id]["shares_held"] > 0
+        ],
+    )
+    db_editor.db.commit()
+    # the bars were loaded in bulk, not through ingestion
+    db_editor.rebuild_return_stats()
+
+    summary = {
+        "tickers": num_tickers,
+        "bars": num_tickers * len(dates),
+        "transactions": num_transactions,
+        "seconds": (datetime.now() - started).total_seconds(),
+    }
+    logging.info(f"Generated synthetic data in {db_editor.db_name}: {summary}.")
+    return summary
+
+
 # !! GENERATES A VALID PORTFOLIO HISTORY
 if __name__ == "__main__":
-    db_editor = DatabaseEditor(password=DB_PASSWORD, database="team11")
+    parser = argparse.ArgumentParser(
+        description="Generate a valid portfolio history, from live trades or a synthetic market."
+    )
+    parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="bulk load a seeded synthetic market instead of trading real tickers",
+    )
+    parser.add_argument("--tickers", type=int, default=100, help="synthetic tickers")
+    parser.add_argument(
+        "--transactions", type=int, default=100000, help="synthetic transactions"
+    )
+    parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        default=datetime(2015, 1, 1),
+        help="date of the first synthetic bar (default: 2015-01-01)",
+    )
+    parser.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        help="date of the last synthetic bar (default: yesterday)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--method",
+        choices=["insert", "infile"],
+        default="insert",
+        help="multi-row INSERTs or LOAD DATA LOCAL INFILE (needs local_infile=ON)",
+    )
+    parser.add_argument("--database", default="team11", help="database to fill")
+    args = parser.parse_args()
+
+    db_editor = DatabaseEditor(password=DB_PASSWORD, database=args.database)
+
+    if args.synthetic:
+        summary = generate_synthetic(
+            db_editor,
+            args.tickers,
+            args.transactions,
+            args.start,
+            args.end,
+            args.seed,
+            args.method,
+        )
+        print(
+            f"Loaded {summary['transactions']} transactions and {summary['bars']} bars of "
+            f"{summary['tickers']} tickers in {summary['seconds']:.1f}s."
+        )
+        db_editor.disconnect()
+        raise SystemExit(0)
 
     # random datetimes to backfill the database
     datetimes = [random_stock_market_datetime() for _ in range(100)]
@@ -73,3 +477,6 @@ if __name__ == "__main__":
             db_editor.sell_ticker(ticker, num_shares, dt)
         else:
             db_editor.buy_ticker(ticker, num_shares, dt)
+
+    # trades don't download price history, backfill it for every holding
+    db_editor.refresh_ticker_data()
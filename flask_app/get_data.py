@@ -1,71 +1,79 @@
-import time
-from datetime import datetime
-import pandas as pd
-import numpy as np
-import yfinance as yf
-import requests
+import argparse
 import json
-import mysql.connector
 import logging
+import os
 
-# start date is 1/1/2023
-start_date = int(round(datetime(2023, 1, 1).timestamp()))
-
-# end date is today
-end_date = int(round(time.time()))
-
-
-stock = "SPY"
-stock2 = "AAPL"
-stock3 = "^TNX"
-
-df_spy = pd.read_csv(
-    f"https://query1.finance.yahoo.com/v7/finance/download/{stock}?period1={start_date}&period2={end_date}&interval=1d&events=history&includeAdjustedClose=true",
-    parse_dates=["Date"],
-    index_col="Date",
-)
-
-df_apple = pd.read_csv(
-    f"https://query1.finance.yahoo.com/v7/finance/download/{stock2}?period1={start_date}&period2={end_date}&interval=1d&events=history&includeAdjustedClose=true",
-    parse_dates=["Date"],
-    index_col="Date",
-)
+import pandas as pd
+from analytics import ANALYTICS_BENCHMARK, correlation_matrix, covariance_matrix
+from db_api import DatabaseEditor
+from dotenv import load_dotenv
 
-df_bonds = pd.read_csv(
-    f"https://query1.finance.yahoo.com/v7/finance/download/{stock3}?period1={start_date}&period2={end_date}&interval=1d&events=history&includeAdjustedClose=true",
-    parse_dates=["Date"],
-    index_col="Date",
-)
+load_dotenv()
+DB_PASSWORD = os.getenv("DB_PASSWORD")
 
-df_spy = pd.DataFrame(df_spy)
-# print(df_bonds)
-# print(df_spy)
-# print(df_apple)
 
-# Create a df containing all ticker info
-ticker_list = ["SPY", "AAPL", "^TNX"]
-port = (
-    df_spy[["Close"]]
-    .merge(df_apple[["Close"]], on="Date")
-    .merge(df_bonds[["Close"]], on="Date")
-)
-port.columns = ticker_list
+def print_analytics(db_editor: DatabaseEditor, args):
+    """
+    print_analytics Print the covariance and correlation of the daily log returns of tickers and the portfolio risk.
 
-returns = np.log(port / port.shift(1))
-returns_mean = returns.mean() * 143
+    Args:
+        db_editor (DatabaseEditor): Editor of the database with the bars.
+        args (argparse.Namespace): Command line arguments.
+    """
+    returns = db_editor.get_returns(args.tickers or None, args.start, args.end)
+    if returns.empty:
+        print("No returns in ticker_data for these tickers and dates.")
+        return
+    if args.returns:
+        returns.to_csv(args.returns)
+        print(
+            f"Wrote {returns.shape[0]} x {returns.shape[1]} returns to {args.returns}."
+        )
 
-print(returns.cov() * 143)
-print(returns.corr())
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(f"Annualized covariance of daily log returns ({len(returns)} days):")
+        print(covariance_matrix(returns))
+        print("\nCorrelation:")
+        print(correlation_matrix(returns))
 
-# client = {'total_inv': 300000,
-#           'spy_shares':15, 'app_shares':30, 'bonds_shares': 60}
-# totalshare = client[]
-# #asset_price =
-# spy_asset = client['spy_shares']*port['SPY'][-1]
-# #print(returns_mean)
+    if not args.tickers:
+        risk = db_editor.get_portfolio_risk(
+            args.benchmark, args.start, args.end, args.confidence, args.horizon
+        )
+        print("\nPortfolio risk:")
+        print(json.dumps(risk, indent=2))
 
-# client_cash = pd.DataFrame()
 
-# client.cash
+# !! ANALYTICS OF THE DAILY BARS STORED IN TICKER_DATA
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Return covariance, correlation and portfolio risk from ticker_data."
+    )
+    parser.add_argument(
+        "tickers", nargs="*", type=str.upper, help="tickers (default: the holdings)"
+    )
+    parser.add_argument("--start", help="first date (ISO format)")
+    parser.add_argument("--end", help="last date (ISO format)")
+    parser.add_argument(
+        "--benchmark",
+        default=ANALYTICS_BENCHMARK,
+        help="ticker the betas are measured against",
+    )
+    parser.add_argument(
+        "--confidence", type=float, default=0.95, help="value at risk confidence level"
+    )
+    parser.add_argument(
+        "--horizon", type=int, default=1, help="value at risk horizon in days"
+    )
+    parser.add_argument(
+        "--returns", help="also write the return matrix to this CSV file"
+    )
+    parser.add_argument("--database", default="team11", help="database name")
+    args = parser.parse_args()
 
-# port = pd.concat([df_spy[['Close']], df_apple[['Close']]], df_bonds[['Close']], axis=2)
+    logging.getLogger().setLevel(logging.WARNING)
+    db_editor = DatabaseEditor(password=DB_PASSWORD, database=args.database)
+    try:
+        print_analytics(db_editor, args)
+    finally:
+        db_editor.disconnect()
@@ -0,0 +1,123 @@
+import argparse
+import logging
+import os
+
+from db_api import DatabaseEditor
+from dotenv import load_dotenv
+from migrations import migrate, migration_status
+from query_plans import explain_queries
+
+load_dotenv()
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+
+
+def recompute_profits(db_editor: DatabaseEditor, args):
+    updated = db_editor.recompute_profits(args.tickers or None)
+    logging.info(f"Recomputed profits for {updated} bars.")
+
+
+def verify_positions(db_editor: DatabaseEditor, args):
+    mismatches = db_editor.rebuild_positions(verify_only=True)
+    if mismatches:
+        logging.error(f"{len(mismatches)} positions do not match the transactions.")
+        raise SystemExit(1)
+    logging.info("All positions match the transactions.")
+
+
+def rebuild_positions(db_editor: DatabaseEditor, args):
+    mismatches = db_editor.rebuild_positions()
+    logging.info(f"Rebuilt {len(mismatches)} positions.")
+
+
+def rebuild_return_stats(db_editor: DatabaseEditor, args):
+    result = db_editor.rebuild_return_stats(args.tickers or None)
+    logging.info(
+        f"Rebuilt the return statistics of {result['tickers']} tickers and {result['pairs']} pairs."
+    )
+
+
+def run_migrations(db_editor: DatabaseEditor, args):
+    migrate(db_editor, target=args.target, dry_run=args.dry_run)
+
+
+def show_migrations(db_editor: DatabaseEditor, args):
+    for m in migration_status(db_editor):
+        state = f"applied {m['applied_at']}" if m["applied_at"] else "pending"
+        if m["modified"]:
+            state += " (file changed since)"
+        print(f"{m['version']:04d} {m['name']}: {state}")
+
+
+def check_query_plans(db_editor: DatabaseEditor, args):
+    failures, _ = explain_queries(db_editor)
+    if failures:
+        raise SystemExit(1)
+
+
+# !! MAINTENANCE COMMANDS FOR THE PORTFOLIO DATABASE
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Portfolio database maintenance.")
+    parser.add_argument("--database", default="team11", help="database name")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    recompute = subparsers.add_parser(
+        "recompute-profits",
+        help="recalculate abs_profit/percent_profit for the stored bars",
+    )
+    recompute.add_argument(
+        "tickers", nargs="*", help="tickers to recompute (default: all)"
+    )
+    recompute.set_defaults(func=recompute_profits)
+
+    verify = subparsers.add_parser(
+        "verify-positions",
+        help="check the positions ledger and portfolio shares against the transactions",
+    )
+    verify.set_defaults(func=verify_positions)
+
+    rebuild = subparsers.add_parser(
+        "rebuild-positions",
+        help="replay the transactions and fix the positions ledger and portfolio shares",
+    )
+    rebuild.set_defaults(func=rebuild_positions)
+
+    return_stats = subparsers.add_parser(
+        "rebuild-return-stats",
+        help="recompute the running return statistics from ticker_data, "
+        "after history was deleted or bulk loaded",
+    )
+    return_stats.add_argument(
+        "tickers", nargs="*", help="tickers to rebuild (default: all)"
+    )
+    return_stats.set_defaults(func=rebuild_return_stats)
+
+    migrate_parser = subparsers.add_parser(
+        "migrate", help="apply the pending schema migrations in schema/migrations"
+    )
+    migrate_parser.add_argument(
+        "--target", type=int, help="last migration version to apply (default: all)"
+    )
+    migrate_parser.add_argument(
+        "--dry-run", action="store_true", help="only print the statements to run"
+    )
+    migrate_parser.set_defaults(func=run_migrations)
+
+    status = subparsers.add_parser(
+        "migration-status",
+        help="list the schema migrations and whether they are applied",
+    )
+    status.set_defaults(func=show_migrations)
+
+    explain = subparsers.add_parser(
+        "explain-queries",
+        help="EXPLAIN the DatabaseEditor queries and fail on full table scans without an index",
+    )
+    explain.set_defaults(func=check_query_plans)
+
+    args = parser.parse_args()
+
+    db_editor = DatabaseEditor(password=DB_PASSWORD, database=args.database)
+    try:
+        args.func(db_editor, args)
+    finally:
+        db_editor.disconnect()
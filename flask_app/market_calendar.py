@@ -0,0 +1,100 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+# regular trading hours of the US exchanges, exchange holidays are not modelled
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+
+
+def market_now():
+    """
+    market_now Returns the current exchange-local time.
+
+    Returns:
+        datetime: Naive datetime in the exchange time zone, like the bars in ticker_data.
+    """
+    return datetime.now(MARKET_TZ).replace(tzinfo=None)
+
+
+def is_trading_day(day):
+    """
+    is_trading_day Check if the market trades on a given day (Monday to Friday).
+
+    Args:
+        day (date): Day to check.
+
+    Returns:
+        bool: True if the day is a weekday, False otherwise.
+    """
+    return day.weekday() < 5
+
+
+def is_market_open(now: datetime = None):
+    """
+    is_market_open Check if the market is in its regular trading session.
+
+    Args:
+        now (datetime, optional): Exchange-local time. Defaults to None (market_now()).
+
+    Returns:
+        bool: True during regular trading hours, False otherwise.
+    """
+    if now is None:
+        now = market_now()
+    return is_trading_day(now.date()) and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def session_date(now: datetime = None):
+    """
+    session_date Returns the day of the latest trading session that has opened.
+
+    Args:
+        now (datetime, optional): Exchange-local time. Defaults to None (market_now()).
+
+    Returns:
+        date: Today during or after the session, otherwise the previous trading day.
+    """
+    if now is None:
+        now = market_now()
+    day = now.date()
+    if not is_trading_day(day) or now.time() < MARKET_OPEN:
+        day -= timedelta(days=1)
+        while not is_trading_day(day):
+            day -= timedelta(days=1)
+    return day
+
+
+def session_close(day):
+    """
+    session_close Returns the closing time of the session on a given day.
+
+    Args:
+        day (date): Trading day.
+
+    Returns:
+        datetime: Naive exchange-local datetime of the close.
+    """
+    return datetime.combine(day, MARKET_CLOSE)
+
+
+def next_session_event(now: datetime = None):
+    """
+    next_session_event Returns the next market open or close after now.
+
+    Args:
+        now (datetime, optional): Exchange-local time. Defaults to None (market_now()).
+
+    Returns:
+        datetime: Naive exchange-local datetime of the next open or close.
+    """
+    if now is None:
+        now = market_now()
+    day = now.date()
+    while True:
+        if is_trading_day(day):
+            for event in (MARKET_OPEN, MARKET_CLOSE):
+                at = datetime.combine(day, event)
+                if at > now:
+                    return at
+        day += timedelta(days=1)
@@ -0,0 +1,299 @@
+import bisect
+import os
+import re
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# upper bounds in seconds of the latency histogram buckets
+METRICS_BUCKETS = tuple(
+    float(b)
+    for b in os.getenv(
+        "METRICS_BUCKETS", "0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10"
+    ).split(",")
+)
+
+# first keyword of a statement and the first table it reads or writes: the one right after a
+# leading UPDATE, otherwise the first one after FROM, INTO or TABLE
+STATEMENT = re.compile(
+    r"^\s*(?:(UPDATE)\s+(?:(?:LOW_PRIORITY|IGNORE)\s+)*`?(\w+)"
+    r"|(\w+)(?:.*?\b(?:FROM|INTO(?:\s+TABLE)?|TABLE(?:\s+IF\s+(?:NOT\s+)?EXISTS)?)\s+`?(\w+))?)",
+    re.IGNORECASE | re.DOTALL,
+)
+_statement_labels = {}
+
+
+def statement_labels(operation: str):
+    """
+    statement_labels Returns the (operation, table) labels of an SQL statement, e.g. ("select", "portfolio").
+
+    Args:
+        operation (str): SQL statement.
+
+    Returns:
+        tuple: Lower case statement keyword and table name ("" if there is none).
+    """
+    labels = _statement_labels.get(operation)
+    if labels is None:
+        match = STATEMENT.match(operation)
+        if match is None:
+            labels = ("other", "")
+        else:
+            keyword = match.group(1) or match.group(3)
+            table = match.group(2) or match.group(4) or ""
+            labels = (keyword.lower(), table.lower())
+        # statements are parameterized, only the few built with values inline are not cached
+        if len(_statement_labels) < 1024:
+            _statement_labels[operation] = labels
+    return labels
+
+
+def _format_labels(names: tuple, values: tuple):
+    if not names:
+        return ""
+    escaped = (
+        str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for v in values
+    )
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+# times a block and records it in a histogram, counting the exceptions raised
+class _Timer:
+    __slots__ = ("histogram", "labels", "errors", "start")
+
+    def __init__(self, histogram, labels: tuple, errors=None):
+        self.histogram = histogram
+        self.labels = labels
+        self.errors = errors
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(self.labels, time.perf_counter() - self.start)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(self.labels)
+        return False
+
+
+# monotonically increasing count per label values
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        """
+        __init__ Initializer for the Counter class.
+
+        Args:
+            name (str): Metric name.
+            help (str): Description shown in the HELP line.
+            labels (tuple, optional): Label names. Defaults to ().
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+# latency distribution per label values, with cumulative buckets as Prometheus expects
+class Histogram:
+    def __init__(
+        self, name: str, help: str, labels: tuple = (), buckets=METRICS_BUCKETS
+    ):
+        """
+        __init__ Initializer for the Histogram class.
+
+        Args:
+            name (str): Metric name.
+            help (str): Description shown in the HELP line.
+            labels (tuple, optional): Label names. Defaults to ().
+            buckets (tuple, optional): Bucket upper bounds, ascending. Defaults to METRICS_BUCKETS.
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count of each bucket (not cumulative) and of +Inf, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def time(self, labels: tuple = (), errors: Counter = None):
+        """
+        time Returns a context manager recording the wall time of its block.
+
+        Args:
+            labels (tuple, optional): Label values. Defaults to ().
+            errors (Counter, optional): Counter incremented with the same labels when the block
+                raises. Defaults to None.
+
+        Returns:
+            _Timer: The context manager.
+        """
+        return _Timer(self, labels, errors)
+
+    def render(self):
+        with self._lock:
+            series = {labels: list(s) for labels, s in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        for labels, counts in sorted(series.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                total += count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, labels + (le,))} {total}"
+                )
+            label_text = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{label_text} {counts[-1]}")
+            lines.append(f"{self.name}_count{label_text} {total}")
+        return lines
+
+
+# values read from another object (pool, cache...) each time the metrics are scraped
+class Callback:
+    def __init__(self, name: str, help: str, metric_type: str, labels: tuple, read):
+        """
+        __init__ Initializer for the Callback class.
+
+        Args:
+            name (str): Metric name.
+            help (str): Description shown in the HELP line.
+            metric_type (str): "gauge" or "counter".
+            labels (tuple): Label names.
+            read (callable): Returns the value, or a dict of values per label values.
+        """
+        self.name = name
+        self.help = help
+        self.metric_type = metric_type
+        self.labels = tuple(labels)
+        self.read = read
+
+    def render(self):
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+# process-wide registry rendered by the /metrics endpoint
+class Metrics:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple = ()):
+        return self._register(Histogram(name, help, labels))
+
+    def callback(
+        self, name: str, help: str, metric_type: str, read, labels: tuple = ()
+    ):
+        return self._register(Callback(name, help, metric_type, labels, read))
+
+    def render(self):
+        """
+        render Returns every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, one sample per line.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+db_query_seconds = metrics.histogram(
+    "db_query_duration_seconds",
+    "Time to execute a statement on the database, by statement type and table.",
+    ("operation", "table"),
+)
+db_query_errors = metrics.counter(
+    "db_query_errors_total",
+    "Statements that raised an error, by statement type and table.",
+    ("operation", "table"),
+)
+upstream_call_seconds = metrics.histogram(
+    "upstream_request_duration_seconds",
+    "Time of a Yahoo! Finance request, by call (info, history, download).",
+    ("call",),
+)
+upstream_call_errors = metrics.counter(
+    "upstream_request_errors_total",
+    "Yahoo! Finance requests that raised an error, by call.",
+    ("call",),
+)
+http_request_seconds = metrics.histogram(
+    "http_request_duration_seconds",
+    "Time to handle a request until the response is returned (streamed bodies excluded), "
+    "by method, route and status.",
+    ("method", "endpoint", "status"),
+)
+
+
+def time_statement(operation: str):
+    """
+    time_statement Returns a context manager recording the duration of a database statement.
+
+    Args:
+        operation (str): SQL statement.
+
+    Returns:
+        _Timer: The context manager.
+    """
+    return db_query_seconds.time(statement_labels(operation), db_query_errors)
+
+
+def time_upstream(call: str):
+    """
+    time_upstream Returns a context manager recording the duration of a Yahoo! Finance request.
+
+    Args:
+        call (str): Kind of request, e.g. "info", "history" or "download".
+
+    Returns:
+        _Timer: The context manager.
+    """
+    return upstream_call_seconds.time((call,), upstream_call_errors)
@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import re
+
+import mysql.connector
+
+# numbered schema changes: schema/migrations/<version>_<name>.sql
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "schema", "migrations"
+)
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+# errors raised when a statement's change is already in the schema (applied by hand before
+# migrations existed): table exists, duplicate column, duplicate key name, multiple primary keys
+ALREADY_APPLIED_ERRORS = {1050, 1060, 1061, 1068}
+
+
+def discover_migrations(path: str = MIGRATIONS_DIR):
+    """
+    discover_migrations Returns the migration files in a directory, ordered by version.
+
+    Args:
+        path (str, optional): Migrations directory. Defaults to MIGRATIONS_DIR.
+
+    Raises:
+        ValueError: Two files have the same version.
+
+    Returns:
+        list: (version, name, file path) of each migration.
+    """
+    migrations = {}
+    for file_name in sorted(os.listdir(path)):
+        match = MIGRATION_FILE.match(file_name)
+        if match is None:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {file_name}.")
+        migrations[version] = (version, match.group(2), os.path.join(path, file_name))
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def split_statements(sql: str):
+    """
+    split_statements Split a migration file into statements, dropping comment lines.
+
+    Statements end with a semicolon at the end of a line.
+
+    Args:
+        sql (str): Contents of the migration file.
+
+    Returns:
+        list: SQL statements.
+    """
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE)
+    return [s.strip() for s in statements if s.strip()]
+
+
+def checksum(file_path: str):
+    """
+    checksum Returns the sha256 of a migration file.
+
+    Args:
+        file_path (str): Path of the migration file.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def applied_migrations(db_editor):
+    """
+    applied_migrations Returns the migrations recorded in the schema_migrations table, creating it if needed.
+
+    Args:
+        db_editor (DatabaseEditor): Editor connected to the database.
+
+    Returns:
+        dict: (name, checksum, applied_at) for each applied version.
+    """
+    db_editor.cursor.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INT PRIMARY KEY, name VARCHAR(100) NOT NULL, checksum CHAR(64), "
+        "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);"
+    )
+    db_editor.cursor.execute(
+        "SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version;"
+    )
+    return {row[0]: row[1:] for row in db_editor.cursor.fetchall()}
+
+
+def migration_status(db_editor, path: str = MIGRATIONS_DIR):
+    """
+    migration_status Compare the migration files with the migrations applied to the database.
+
+    Args:
+        db_editor (DatabaseEditor): Editor connected to the database.
+        path (str, optional): Migrations directory. Defaults to MIGRATIONS_DIR.
+
+    Returns:
+        list: Dicts with the version, name, applied_at (None if pending) and whether the file
+            changed since it was applied.
+    """
+    applied = applied_migrations(db_editor)
+    status = []
+    for version, name, file_path in discover_migrations(path):
+        _, applied_checksum, applied_at = applied.get(version, (None, None, None))
+        status.append(
+            {
+                "version": version,
+                "name": name,
+                "applied_at": applied_at,
+                "modified": applied_checksum is not None
+                and applied_checksum != checksum(file_path),
+            }
+        )
+    return status
+
+
+def migrate(db_editor, target: int = None, dry_run: bool = False, path=MIGRATIONS_DIR):
+    """
+    migrate Apply the pending migrations in version order, up to an optional target version.
+
+    MySQL commits schema changes implicitly, so each migration is recorded right after its
+    statements succeed and a failing migration stops the run: fix it and run migrate again.
+    Statements whose change is already in the schema are skipped with a warning.
+
+    Args:
+        db_editor (DatabaseEditor): Editor connected to the database.
+        target (int, optional): Last version to apply. Defaults to None (all).
+        dry_run (bool, optional): Only log the statements that would run. Defaults to False.
+        path (str, optional): Migrations directory. Defaults to MIGRATIONS_DIR.
+
+    Returns:
+        list: Versions applied (or that would be applied on a dry run).
+    """
+    applied = applied_migrations(db_editor)
+    done = []
+    for version, name, file_path in discover_migrations(path):
+        if version in applied or (target is not None and version > target):
+            continue
+
+        with open(file_path) as f:
+            statements = split_statements(f.read())
+
+        logging.info(f"Applying migration {version} ({name}).")
+        for statement in statements:
+            if dry_run:
+                logging.info(f"[dry run] {statement}")
+                continue
+            try:
+                db_editor.cursor.execute(statement)
+            except mysql.connector.Error as e:
+                if e.errno not in ALREADY_APPLIED_ERRORS:
+                    db_editor.db.rollback()
+                    logging.error(f"Migration {version} ({name}) failed: {e}")
+                    raise
+                logging.warning(f"Skipping a change already in the schema: {e.msg}")
+
+        if not dry_run:
+            db_editor.cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s);",
+                (version, name, checksum(file_path)),
+            )
+            db_editor.db.commit()
+        done.append(version)
+
+    logging.info(
+        f"{'Would apply' if dry_run else 'Applied'} {len(done)} migrations to {db_editor.db_name}."
+    )
+    return done
@@ -0,0 +1,368 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from urllib.parse import quote
+
+import numpy as np
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows, writers of other processes are not excluded
+    fcntl = None
+
+load_dotenv()
+# set to 0 to read /ticker_data and the analytics straight from the database
+OHLCV_STORE_ENABLED = os.getenv("OHLCV_STORE_ENABLED", "1") == "1"
+# directory of the columnar copy of ticker_data, one subdirectory per database
+OHLCV_STORE_DIR = os.getenv(
+    "OHLCV_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ohlcv"),
+)
+
+# columns of a ticker, each stored in its own file of fixed-size values
+COLUMNS = {
+    "date": np.dtype("datetime64[s]"),
+    "open": np.dtype("float64"),
+    "high": np.dtype("float64"),
+    "low": np.dtype("float64"),
+    "close": np.dtype("float64"),
+    "volume": np.dtype("int64"),
+    "abs_profit": np.dtype("float64"),
+    "percent_profit": np.dtype("float64"),
+}
+# decimals of the DECIMAL(15, 4) columns of ticker_data, bars written through are rounded alike
+PRICE_DECIMALS = 4
+
+
+def empty_bars():
+    """
+    empty_bars Returns bars with no rows.
+
+    Returns:
+        dict: An empty array per column of COLUMNS.
+    """
+    return {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+
+
+def bars_from_rows(rows: list):
+    """
+    bars_from_rows Convert ticker_data rows to columns.
+
+    Args:
+        rows (list): (date, open, high, low, close, volume, abs_profit, percent_profit) tuples,
+            ascending by date. NULL prices and profits become NaN, NULL volumes 0.
+
+    Returns:
+        dict: An array per column of COLUMNS.
+    """
+    if not rows:
+        return empty_bars()
+    columns = list(zip(*rows))
+    bars = {}
+    for (name, dtype), values in zip(COLUMNS.items(), columns):
+        if name == "volume":
+            values = [v or 0 for v in values]
+        bars[name] = np.array(values, dtype=dtype)
+    return bars
+
+
+def column_to_list(column):
+    """
+    column_to_list Convert a column to a list for a JSON response, NaN (NULL) becoming None.
+
+    Args:
+        column (np.ndarray): Column of bars.
+
+    Returns:
+        list: The values.
+    """
+    values = column.tolist()
+    if column.dtype.kind == "f" and np.isnan(column).any():
+        values = [None if v != v else v for v in values]
+    return values
+
+
+def bars_between(bars: dict, start=None, end=None):
+    """
+    bars_between Returns the bars dated from start (included) to end (excluded), as views without copies.
+
+    Args:
+        bars (dict): Bars as returned by OhlcvStore.read.
+        start (datetime, optional): First date. Defaults to None (the first bar).
+        end (datetime, optional): Date after the last bar. Defaults to None (after the last bar).
+
+    Returns:
+        dict: A slice of each column.
+    """
+    dates = bars["date"]
+    first = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "s"))
+    last = (
+        len(dates)
+        if end is None
+        else np.searchsorted(dates, np.datetime64(end, "s"))
+    )
+    return {name: column[first:last] for name, column in bars.items()}
+
+
+# per-ticker memory-mapped columns of ticker_data, written through by ingestion
+class OhlcvStore:
+    def __init__(self, path: str):
+        """
+        __init__ Initializer for the OhlcvStore class.
+
+        Each ticker has a meta.json file (generation, rows, data version) and a directory per
+        generation holding one <column>.bin file per column. Appends write past the end of the
+        current generation and publish the new row count in meta.json last, so readers never
+        see a partial bar. Rows already published are never written in place: any other change,
+        a refetch of the latest bars included, writes a new generation and deletes the old one,
+        mappings still open on it stay valid until they are dropped.
+
+        Args:
+            path (str): Directory of the store, e.g. OHLCV_STORE_DIR/<database>.
+        """
+        self.path = path
+        self.hits = 0
+        self.syncs = 0
+        self._maps = (
+            {}
+        )  # ticker -> (generation, mapped rows, dict of read-only memmaps)
+        self._lock = threading.Lock()
+
+    def _ticker_dir(self, ticker_id: str):
+        return os.path.join(self.path, quote(ticker_id.upper(), safe=""))
+
+    def _meta(self, ticker_id: str):
+        try:
+            with open(os.path.join(self._ticker_dir(ticker_id), "meta.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_meta(self, ticker_id: str, meta: dict):
+        path = os.path.join(self._ticker_dir(ticker_id), "meta.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def _writing(self, ticker_id: str):
+        # excludes writers of other processes (maintenance, generate_data) on top of self._lock
+        os.makedirs(self._ticker_dir(ticker_id), exist_ok=True)
+        return _FileLock(os.path.join(self._ticker_dir(ticker_id), ".lock"))
+
+    def _map(self, ticker_id: str, meta: dict):
+        rows = meta["rows"]
+        if rows == 0:
+            return empty_bars()
+        cached = self._maps.get(ticker_id)
+        if cached is None or cached[0] != meta["generation"] or cached[1] < rows:
+            directory = os.path.join(
+                self._ticker_dir(ticker_id), str(meta["generation"])
+            )
+            arrays = {
+                name: np.memmap(
+                    os.path.join(directory, f"{name}.bin"), dtype=dtype, mode="r"
+                )
+                for name, dtype in COLUMNS.items()
+            }
+            cached = (meta["generation"], len(arrays["date"]), arrays)
+            self._maps[ticker_id] = cached
+        return {name: column[:rows] for name, column in cached[2].items()}
+
+    def read(self, ticker_id: str, version: int, load):
+        """
+        read Returns the bars of a ticker, resynced from the database if they are not at version.
+
+        Args:
+            ticker_id (str): Ticker to read.
+            version (int): Current version of the "ticker_data:<ticker>" data set.
+            load (callable): Zero-argument function returning the bars of the ticker from the
+                database, see bars_from_rows.
+
+        Returns:
+            dict: A read-only array per column of COLUMNS, ascending by date.
+        """
+        ticker_id = ticker_id.upper()
+        for _ in range(3):
+            with self._lock:
+                meta = self._meta(ticker_id)
+                if meta is not None and meta["version"] == version:
+                    try:
+                        bars = self._map(ticker_id, meta)
+                        self.hits += 1
+                        return bars
+                    except FileNotFoundError:
+                        continue  # replaced by another process meanwhile, read meta again
+
+            bars = load()
+            with self._lock, self._writing(ticker_id):
+                meta = self._meta(ticker_id)
+                if meta is None or meta["version"] != version:
+                    self._rewrite(ticker_id, bars, version)
+                    self.syncs += 1
+            logging.info(
+                f"Synced {len(bars['date'])} bars of {ticker_id} to the OHLCV store."
+            )
+            return bars
+        return load()
+
+    def upsert(self, ticker_id: str, bars: dict, version: int):
+        """
+        upsert Write ingested bars through to the store.
+
+        Applied only if the store holds version - 1, the state the bars were written on top of.
+        Otherwise the store is left as is and the next read resyncs it.
+
+        Args:
+            ticker_id (str): Ticker of the bars.
+            bars (dict): An array per column of COLUMNS, ascending by date.
+            version (int): Version of "ticker_data:<ticker>" once the bars are committed.
+
+        Returns:
+            bool: True if the bars were written.
+        """
+        ticker_id = ticker_id.upper()
+        if len(bars["date"]) == 0:
+            return False
+        bars = {
+            name: column.round(PRICE_DECIMALS) if column.dtype.kind == "f" else column
+            for name, column in bars.items()
+        }
+        with self._lock, self._writing(ticker_id):
+            meta = self._meta(ticker_id)
+            if meta is None or meta["version"] != version - 1:
+                return False
+            stored = self._map(ticker_id, meta)
+            dates = stored["date"]
+            new_dates = bars["date"]
+
+            first = int(np.searchsorted(dates, new_dates[0]))
+            if first == len(dates):
+                # new bars only: write past the published rows, no reader has them mapped
+                self._write_from(ticker_id, meta, first, bars)
+                meta["rows"] = first + len(new_dates)
+                meta["version"] = version
+                self._write_meta(ticker_id, meta)
+            else:
+                # a refetch of stored bars or a backfill of older history: readers may hold
+                # the stored rows, merge into a new generation
+                merged = {
+                    name: np.concatenate([np.asarray(stored[name]), bars[name]])
+                    for name in COLUMNS
+                }
+                # keep the last of duplicate dates, i.e. the ingested bar
+                order = np.argsort(merged["date"], kind="stable")
+                keep = np.ones(len(order), bool)
+                keep[:-1] = merged["date"][order][1:] != merged["date"][order][:-1]
+                order = order[keep]
+                self._rewrite(
+                    ticker_id, {n: c[order] for n, c in merged.items()}, version
+                )
+        return True
+
+    def _write_from(self, ticker_id: str, meta: dict, first: int, bars: dict):
+        directory = os.path.join(self._ticker_dir(ticker_id), str(meta["generation"]))
+        if meta["rows"] == 0:
+            os.makedirs(directory, exist_ok=True)
+        for name, dtype in COLUMNS.items():
+            path = os.path.join(directory, f"{name}.bin")
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.seek(first * dtype.itemsize)
+                f.write(np.ascontiguousarray(bars[name], dtype).tobytes())
+
+    def _rewrite(self, ticker_id: str, bars: dict, version: int):
+        meta = self._meta(ticker_id)
+        old_generation = None if meta is None else meta["generation"]
+        generation = 0 if meta is None else meta["generation"] + 1
+        directory = os.path.join(self._ticker_dir(ticker_id), str(generation))
+        os.makedirs(directory, exist_ok=True)
+        for name, dtype in COLUMNS.items():
+            np.ascontiguousarray(bars[name], dtype).tofile(
+                os.path.join(directory, f"{name}.bin")
+            )
+        self._write_meta(
+            ticker_id,
+            {"generation": generation, "rows": len(bars["date"]), "version": version},
+        )
+        if old_generation is not None:
+            shutil.rmtree(
+                os.path.join(self._ticker_dir(ticker_id), str(old_generation)),
+                ignore_errors=True,
+            )
+
+    def clear(self):
+        """
+        clear Delete every ticker of the store, e.g. when its database is recreated.
+        """
+        with self._lock:
+            self._maps.clear()
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def stats(self):
+        """
+        stats Returns the store counters.
+
+        Returns:
+            dict: Reads served from the store, resyncs from the database and mapped tickers.
+        """
+        with self._lock:
+            return {
+                "path": os.path.abspath(self.path),
+                "hits": self.hits,
+                "syncs": self.syncs,
+                "mapped_tickers": len(self._maps),
+            }
+
+
+# exclusive lock on a file, a no-op where fcntl is not available
+class _FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+        return False
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def ohlcv_store(database: str):
+    """
+    ohlcv_store Returns the process-wide OHLCV store of a database.
+
+    Args:
+        database (str): Database name.
+
+    Returns:
+        OhlcvStore: The store, under OHLCV_STORE_DIR/<database>.
+    """
+    with _stores_lock:
+        store = _stores.get(database)
+        if store is None:
+            store = _stores[database] = OhlcvStore(
+                os.path.join(OHLCV_STORE_DIR, database)
+            )
+        return store
+
+
+def clear_stores():
+    """
+    clear_stores Delete the bars of every store opened by this process.
+    """
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.clear()
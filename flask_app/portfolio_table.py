@@ -0,0 +1,176 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+from positions import position_profit
+from quote_cache import quote_cache
+
+load_dotenv()
+# max number of tickers priced at the same time, shared by all requests
+PORTFOLIO_TABLE_WORKERS = int(os.getenv("PORTFOLIO_TABLE_WORKERS", "8"))
+# seconds the pricing of the uncached tickers may take once it has started
+PORTFOLIO_TICKER_TIMEOUT = float(os.getenv("PORTFOLIO_TICKER_TIMEOUT", "2"))
+# seconds the whole table may take, rows still pending are returned as stale
+PORTFOLIO_TABLE_DEADLINE = float(os.getenv("PORTFOLIO_TABLE_DEADLINE", "4"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=PORTFOLIO_TABLE_WORKERS, thread_name_prefix="portfolio-table"
+)
+
+
+def _format(value):
+    return f"{value:.2f}" if value is not None else "N/A"
+
+
+def _price(db_editor, ticker_ids: list, started: dict):
+    started["at"] = time.monotonic()
+    return db_editor.get_market_values(ticker_ids)
+
+
+def price_holdings(
+    db_editor,
+    ticker_ids: list,
+    ticker_timeout: float = PORTFOLIO_TICKER_TIMEOUT,
+    deadline: float = PORTFOLIO_TABLE_DEADLINE,
+):
+    """
+    price_holdings Price tickers on the shared worker pool, within a pricing and an overall deadline.
+
+    Cached quotes are used directly, the other tickers are priced by one job on the pool with
+    DatabaseEditor.get_market_values (batched download, and the quote cache's single flight
+    with concurrent requests). The job is the only user of the editor while it runs. The
+    uncached tickers fail when the job raises, runs longer than ticker_timeout, or is still
+    pending when the overall deadline expires, and a ticker fails when it got no price. A job
+    that is still running is left to finish in the background and fills the quote cache for
+    the next request.
+
+    Args:
+        db_editor (DatabaseEditor): Editor used for the upstream calls (no database access).
+        ticker_ids (list): Tickers to price (upper case).
+        ticker_timeout (float, optional): Seconds the pricing may take once started. Defaults to PORTFOLIO_TICKER_TIMEOUT.
+        deadline (float, optional): Seconds for all tickers. Defaults to PORTFOLIO_TABLE_DEADLINE.
+
+    Returns:
+        dict: Price of each ticker that was priced in time.
+        dict: Reason for each ticker that was not.
+    """
+    start = time.monotonic()
+    prices = quote_cache.get_cached(ticker_ids)
+    misses = [t for t in ticker_ids if t not in prices]
+    errors = {}
+    if not misses:
+        return prices, errors
+
+    started = {}  # time the pricing started, written by the worker
+    future = _executor.submit(_price, db_editor, misses, started)
+    error = None
+    while True:
+        now = time.monotonic()
+        if now >= start + deadline:
+            error = f"not priced within the {deadline}s deadline"
+            break
+        if "at" in started and now - started["at"] > ticker_timeout:
+            error = f"timed out after {ticker_timeout}s"
+            break
+
+        # wake up at the overall deadline, the pricing deadline, or to check the queued job
+        wake_at = start + deadline
+        if "at" in started:
+            wake_at = min(wake_at, started["at"] + ticker_timeout)
+        else:
+            wake_at = min(wake_at, now + 0.05)
+        done, _ = wait([future], timeout=max(0, wake_at - now))
+        if done:
+            break
+
+    if error is None:
+        try:
+            fetched = future.result()
+        except Exception as e:
+            logging.warning(f"Unable to price {misses}: {e}")
+            error = str(e) or type(e).__name__
+    else:
+        # a queued job is dropped, a running one finishes in the background
+        future.cancel()
+
+    for ticker_id in misses:
+        if error is not None:
+            errors[ticker_id] = error
+        elif fetched.get(ticker_id) is None:
+            errors[ticker_id] = "no market value"
+        else:
+            prices[ticker_id] = fetched[ticker_id]
+
+    if errors:
+        logging.warning(
+            f"Priced {len(prices)}/{len(ticker_ids)} tickers in {time.monotonic() - start:.2f}s, "
+            f"failed: {errors}."
+        )
+    return prices, errors
+
+
+def build_portfolio_table(
+    db_editor,
+    ticker_timeout: float = PORTFOLIO_TICKER_TIMEOUT,
+    deadline: float = PORTFOLIO_TABLE_DEADLINE,
+):
+    """
+    build_portfolio_table Returns one row per holding with its market value, profit and metadata.
+
+    Shares, positions, metadata and last stored closes are read with one query each, then the
+    tickers are priced on the worker pool (see price_holdings). A ticker that could not be priced in
+    time is valued at its last stored close and marked "stale", with the reason in "error".
+
+    Args:
+        db_editor (DatabaseEditor): Editor of the current request.
+        ticker_timeout (float, optional): Seconds the pricing may take once started. Defaults to PORTFOLIO_TICKER_TIMEOUT.
+        deadline (float, optional): Seconds for the pricing of all tickers. Defaults to PORTFOLIO_TABLE_DEADLINE.
+
+    Returns:
+        dict: Row of each ticker, sorted by number of shares (descending).
+    """
+    db_editor.cursor.execute("SELECT ticker_id, total_shares FROM portfolio;")
+    shares = {t.upper(): n for t, n in db_editor.cursor.fetchall()}
+    ticker_ids = list(shares)
+
+    positions = db_editor.get_positions(ticker_ids)
+    metadata = db_editor.get_ticker_metadata(ticker_ids)
+    last_closes = db_editor.get_last_closes(ticker_ids)
+
+    prices, errors = price_holdings(db_editor, ticker_ids, ticker_timeout, deadline)
+
+    table = {}
+    for ticker_id in ticker_ids:
+        ticker_metadata = metadata.get(ticker_id, {})
+        row = {
+            "num_shares": shares[ticker_id],
+            "high_52": _format(ticker_metadata.get("high_52")),
+            "low_52": _format(ticker_metadata.get("low_52")),
+            "name": ticker_metadata.get("name"),
+            "asset_type": ticker_metadata.get("quote_type", "N/A"),
+            "stale": ticker_id not in prices,
+        }
+
+        market_value = prices.get(ticker_id)
+        if market_value is None:
+            row["error"] = errors.get(ticker_id)
+            if ticker_id in last_closes:
+                market_value, as_of = last_closes[ticker_id]
+                row["as_of"] = str(as_of)
+
+        if market_value is None:
+            row["market_value"] = "N/A"
+            row["net_gainloss"] = "N/A"
+        else:
+            row["market_value"] = _format(float(market_value))
+            row["net_gainloss"] = _format(
+                position_profit(positions[ticker_id], market_value)[1]
+            )
+        table[ticker_id] = row
+
+    # sort table by num_shares
+    return dict(
+        sorted(table.items(), key=lambda item: item[1]["num_shares"], reverse=True)
+    )
@@ -0,0 +1,102 @@
+def empty_position():
+    """
+    empty_position Returns the ledger entry of a ticker that was never traded.
+
+    Returns:
+        dict: Position with no shares, cost or P&L.
+    """
+    return {
+        "shares_held": 0,
+        "total_cost": 0.0,
+        "realized_pnl": 0.0,
+        "shares_bought": 0,
+        "buy_weight": 0.0,
+        "last_trade_at": None,
+    }
+
+
+def apply_trade(position: dict, transaction_type: str, num_shares: int, price, date):
+    """
+    apply_trade Returns a position updated with one trade, using the average cost method.
+
+    Args:
+        position (dict): Current position, see empty_position.
+        transaction_type (str): "buy" or "sell".
+        num_shares (int): Number of shares traded.
+        price (float): Price per share as stored in the transactions table (negative for sells).
+        date (datetime): Time of the trade.
+
+    Returns:
+        dict: The updated position.
+    """
+    position = dict(position)
+    num_shares = int(num_shares)
+    price = abs(float(price))
+
+    if transaction_type == "buy":
+        position["shares_held"] += num_shares
+        position["total_cost"] += num_shares * price
+        position["shares_bought"] += num_shares
+        # sum of num_shares / price over all buys, see DatabaseEditor.calc_gainloss
+        position["buy_weight"] += num_shares / price
+    else:
+        held = position["shares_held"]
+        avg_cost = position["total_cost"] / held if held > 0 else 0.0
+        sold_cost = min(num_shares, max(held, 0)) * avg_cost
+        position["shares_held"] -= num_shares
+        position["total_cost"] -= sold_cost
+        position["realized_pnl"] += num_shares * price - sold_cost
+
+    if position["last_trade_at"] is None or (
+        date is not None and date > position["last_trade_at"]
+    ):
+        position["last_trade_at"] = date
+
+    return position
+
+
+def replay(transactions):
+    """
+    replay Builds the position of every ticker from its full transaction history.
+
+    Args:
+        transactions (list): (ticker_id, num_shares, price, transaction_type, date) rows ordered by
+            date and transaction number.
+
+    Returns:
+        dict: Position for each ticker (upper case).
+    """
+    positions = {}
+    for ticker_id, num_shares, price, transaction_type, date in transactions:
+        ticker_id = ticker_id.upper()
+        positions[ticker_id] = apply_trade(
+            positions.get(ticker_id, empty_position()),
+            transaction_type,
+            num_shares,
+            price,
+            date,
+        )
+    return positions
+
+
+def position_profit(position: dict, close):
+    """
+    position_profit Returns the profit of a position at a given price.
+
+    Args:
+        position (dict): Position, see empty_position.
+        close (float): Price per share.
+
+    Returns:
+        tuple: Absolute profit and percent profit.
+    """
+    # money spent on buys minus money received from sells
+    total_investment = position["total_cost"] - position["realized_pnl"]
+    absolute_profit = position["shares_held"] * float(close) - total_investment
+
+    if total_investment != 0:
+        percent_profit = (absolute_profit / total_investment) * 100
+    else:
+        percent_profit = 0  # no investment, no profit
+
+    return absolute_profit, percent_profit
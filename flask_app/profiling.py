@@ -0,0 +1,204 @@
+import cProfile
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# set to 1 to allow profiling requests that carry the PROFILING_TOKEN
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+# admin secret sent in the X-Profile-Token header or the ?profile= query argument
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+# directory the profiles are written to
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "profiles"),
+)
+# seconds between two stack samples of the collapsed-stack output
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# number of profiles kept, older ones are deleted
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# cProfile can't profile two requests at once, concurrent ones are served unprofiled
+_profiling = threading.Lock()
+
+
+def is_admin(token: str):
+    """
+    is_admin Check a profiling token against PROFILING_TOKEN.
+
+    Args:
+        token (str): Token sent with the request, None if there is none.
+
+    Returns:
+        bool: True if profiling is enabled and the token matches.
+    """
+    if not PROFILING_ENABLED or not PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+
+# thread sampling the stack of another thread, counting identical stacks
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        """
+        __init__ Initializer for the StackSampler class.
+
+        Args:
+            thread_id (int): Identifier of the thread to sample.
+            interval (float, optional): Seconds between samples. Defaults to PROFILE_SAMPLE_INTERVAL.
+        """
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()  # "outer;...;inner" -> number of samples
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+# profile of one request: cProfile statistics plus sampled stacks for flame graphs
+class RequestProfiler:
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        """
+        __init__ Initializer for the RequestProfiler class, call start() from the request's thread.
+
+        Args:
+            interval (float, optional): Seconds between stack samples. Defaults to PROFILE_SAMPLE_INTERVAL.
+        """
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.sampler = None
+        self.started_at = None
+        self._start = None
+
+    def start(self):
+        """
+        start Start profiling the current thread.
+
+        Returns:
+            bool: False if another request is being profiled (this one is not).
+        """
+        if not _profiling.acquire(blocking=False):
+            logging.warning("A request is already being profiled, skipping this one.")
+            return False
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.sampler = StackSampler(threading.get_ident(), self.interval)
+        self.sampler.start()
+        self.profile.enable()
+        return True
+
+    def stop(self, endpoint: str, details: dict = None, path: str = PROFILE_DIR):
+        """
+        stop Stop profiling and write the <id>.pstats, <id>.collapsed and <id>.json files.
+
+        The .pstats file loads with pstats.Stats or snakeviz, the .collapsed file has one
+        "outer;...;inner count" line per sampled stack, the input of flamegraph.pl and speedscope.
+
+        Args:
+            endpoint (str): Route of the request, part of the profile id.
+            details (dict, optional): Extra fields saved in the .json file. Defaults to None.
+            path (str, optional): Directory of the profiles. Defaults to PROFILE_DIR.
+
+        Returns:
+            dict: Summary of the profile, as listed by list_profiles.
+        """
+        try:
+            self.profile.disable()
+            self.sampler.stop()
+        finally:
+            _profiling.release()
+        wall_ms = (time.perf_counter() - self._start) * 1000
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", endpoint).strip("_") or "root"
+        profile_id = f"{self.started_at:%Y%m%dT%H%M%S%f}_{slug}"
+        base = os.path.join(path, profile_id)
+        os.makedirs(path, exist_ok=True)
+
+        self.profile.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w") as f:
+            for stack, count in self.sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        summary = {
+            "id": profile_id,
+            "endpoint": endpoint,
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "wall_ms": round(wall_ms, 3),
+            "samples": sum(self.sampler.stacks.values()),
+            "pstats": base + ".pstats",
+            "collapsed": base + ".collapsed",
+            **(details or {}),
+        }
+        with open(base + ".json", "w") as f:
+            json.dump(summary, f, indent=2)
+
+        prune_profiles(path)
+        logging.info(f"Profiled {endpoint} in {wall_ms:.1f}ms, saved as {profile_id}.")
+        return summary
+
+
+def prune_profiles(path: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+    """
+    prune_profiles Delete the files of all but the most recent profiles.
+
+    Args:
+        path (str, optional): Directory of the profiles. Defaults to PROFILE_DIR.
+        keep (int, optional): Number of profiles kept. Defaults to PROFILE_KEEP.
+    """
+    profile_ids = sorted(f[:-5] for f in os.listdir(path) if f.endswith(".json"))
+    for profile_id in profile_ids[: max(len(profile_ids) - keep, 0)]:
+        for extension in (".json", ".pstats", ".collapsed"):
+            try:
+                os.remove(os.path.join(path, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(limit: int = 20, path: str = PROFILE_DIR):
+    """
+    list_profiles Returns the summaries of the most recent profiles, newest first.
+
+    Args:
+        limit (int, optional): Max number of profiles. Defaults to 20.
+        path (str, optional): Directory of the profiles. Defaults to PROFILE_DIR.
+
+    Returns:
+        list: Profile summaries, see RequestProfiler.stop.
+    """
+    if not os.path.isdir(path):
+        return []
+
+    profiles = []
+    for file_name in sorted(os.listdir(path), reverse=True):
+        if not file_name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(path, file_name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # being written or pruned
+        if len(profiles) >= limit:
+            break
+    return profiles
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+
+def profit_series(transactions: pd.DataFrame, dates, closes):
+    """
+    profit_series Calculate the absolute and percent profit of a position at every bar in one pass.
+
+    Cumulative shares held and money invested are running sums over the transactions, and each bar
+    looks up the sums of the transactions made up to midnight of its date with a binary search,
+    matching DatabaseEditor.calc_profit for every date.
+
+    Args:
+        transactions (pd.DataFrame): Transactions of one ticker with date, num_shares, price and
+            transaction_type columns. Sell prices are negative, as stored in the transactions table.
+        dates (array-like): Datetimes of the bars, ascending.
+        closes (array-like): Closing price of each bar.
+
+    Returns:
+        pd.DataFrame: abs_profit and percent_profit columns, one row per bar.
+    """
+    days = pd.DatetimeIndex(dates).normalize().values
+    closes = np.asarray(closes, dtype=float)
+
+    transactions = transactions.sort_values("date", kind="stable")
+    num_shares = transactions["num_shares"].to_numpy(dtype=float)
+    price = transactions["price"].to_numpy(dtype=float)
+    is_buy = (transactions["transaction_type"] == "buy").to_numpy()
+
+    # running totals, with a leading 0 for bars before the first transaction
+    shares_held = np.concatenate(
+        ([0.0], np.cumsum(np.where(is_buy, num_shares, -num_shares)))
+    )
+    # note: price is stored as a negative number for sell transactions
+    investment = np.concatenate(([0.0], np.cumsum(num_shares * price)))
+
+    # number of transactions made up to each bar
+    trade_dates = pd.DatetimeIndex(transactions["date"]).values
+    counts = np.searchsorted(trade_dates, days, side="right")
+
+    abs_profit = shares_held[counts] * closes - investment[counts]
+    invested = investment[counts]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent_profit = np.where(invested != 0, abs_profit / invested * 100, 0.0)
+
+    return pd.DataFrame(
+        {"abs_profit": abs_profit, "percent_profit": percent_profit},
+        index=pd.DatetimeIndex(dates),
+    )
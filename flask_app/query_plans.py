@@ -0,0 +1,283 @@
+import logging
+from datetime import datetime
+
+SAMPLE_TICKER = "SPY"
+SAMPLE_DATE = datetime(2024, 1, 2, 16, 0)
+
+# (name, query, params, reads the whole table on purpose) for the statements DatabaseEditor
+# runs, with the same WHERE/ORDER BY shape; keep in sync when adding or changing a query
+QUERIES = [
+    (
+        "get_ticker",
+        "SELECT * FROM portfolio WHERE ticker_id = %s",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    ("get_tickers", "SELECT ticker_id FROM portfolio", (), True),
+    (
+        "calc_profit close",
+        "SELECT close FROM ticker_data WHERE ticker_id = %s AND date = %s",
+        (SAMPLE_TICKER, SAMPLE_DATE),
+        False,
+    ),
+    (
+        "calc_profit transactions",
+        "SELECT num_shares, price, transaction_type FROM transactions "
+        "WHERE ticker_id = %s AND date <= %s",
+        (SAMPLE_TICKER, SAMPLE_DATE),
+        False,
+    ),
+    (
+        "update_total_return",
+        "UPDATE portfolio SET total_return = %s WHERE ticker_id = %s",
+        (0, SAMPLE_TICKER),
+        False,
+    ),
+    (
+        "get_position",
+        "SELECT shares_held, total_cost, realized_pnl, shares_bought, buy_weight, last_trade_at "
+        "FROM positions WHERE ticker_id = %s FOR UPDATE",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "rebuild_positions",
+        "SELECT ticker_id, num_shares, price, transaction_type, date FROM transactions "
+        "ORDER BY date, transaction_num",
+        (),
+        True,
+    ),
+    (
+        "trade portfolio upsert",
+        "INSERT INTO portfolio (ticker_id, total_shares, total_return, asset_type) "
+        "VALUES (%s, %s, 0, COALESCE(%s, (SELECT quote_type FROM tickers WHERE ticker_id = %s), 'N/A')) "
+        "ON DUPLICATE KEY UPDATE total_shares = VALUES(total_shares)",
+        (SAMPLE_TICKER, 0, None, SAMPLE_TICKER),
+        False,
+    ),
+    (
+        "trade watermark",
+        "UPDATE tickers SET last_bar_at = LEAST(COALESCE(last_bar_at, %s), %s), "
+        "checked_at = NULL WHERE ticker_id = %s",
+        (SAMPLE_DATE, SAMPLE_DATE, SAMPLE_TICKER),
+        False,
+    ),
+    (
+        "trade close position",
+        "DELETE FROM portfolio WHERE ticker_id = %s",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "trade delete history",
+        "DELETE FROM ticker_data WHERE ticker_id = %s",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "refresh watermarks",
+        "SELECT t.ticker_id, t.last_bar_at, t.checked_at, MIN(tr.date) FROM tickers t "
+        "LEFT JOIN transactions tr ON tr.ticker_id = t.ticker_id WHERE t.ticker_id IN (%s) "
+        "GROUP BY t.ticker_id, t.last_bar_at, t.checked_at",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "load transactions",
+        "SELECT date, num_shares, price, transaction_type FROM transactions "
+        "WHERE ticker_id = %s AND date <= %s ORDER BY date",
+        (SAMPLE_TICKER, SAMPLE_DATE),
+        False,
+    ),
+    (
+        "recompute bars",
+        "SELECT date, close FROM ticker_data WHERE ticker_id = %s ORDER BY date",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "load bars",
+        "SELECT date, open, high, low, close, volume, abs_profit, percent_profit "
+        "FROM ticker_data WHERE ticker_id = %s ORDER BY date",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "get_holdings",
+        "SELECT ticker_id, total_shares FROM portfolio WHERE total_shares <> 0",
+        (),
+        True,
+    ),
+    (
+        "load return_stats",
+        "SELECT ticker_id, last_date, last_close, n, mean, m2, window_dates, window_returns, "
+        "window_head, window_count, window_mean, window_m2 FROM return_stats "
+        "WHERE ticker_id IN (%s)",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "fold return_stats bars",
+        "SELECT date, close FROM ticker_data WHERE ticker_id = %s AND date < %s "
+        "AND date > %s AND close IS NOT NULL ORDER BY date",
+        (SAMPLE_TICKER, SAMPLE_DATE, SAMPLE_DATE),
+        False,
+    ),
+    (
+        "daily_returns of the other tickers",
+        "SELECT ticker_id, date, log_return FROM daily_returns "
+        "WHERE date BETWEEN %s AND %s AND ticker_id <> %s",
+        (SAMPLE_DATE, SAMPLE_DATE, SAMPLE_TICKER),
+        False,
+    ),
+    (
+        "rebuild daily_returns",
+        "SELECT ticker_id, date, log_return FROM daily_returns ORDER BY ticker_id, date",
+        (),
+        True,
+    ),
+    (
+        "load pair stats",
+        "SELECT ticker_a, ticker_b, n, mean_a, mean_b, m2_a, m2_b, c FROM return_pair_stats "
+        "WHERE ticker_a = %s UNION ALL "
+        "SELECT ticker_a, ticker_b, n, mean_a, mean_b, m2_a, m2_b, c FROM return_pair_stats "
+        "WHERE ticker_b = %s",
+        (SAMPLE_TICKER, SAMPLE_TICKER),
+        False,
+    ),
+    (
+        "get_return_stats pairs",
+        "SELECT ticker_a, ticker_b, n, m2_a, m2_b, c FROM return_pair_stats "
+        "WHERE ticker_a IN (%s) AND ticker_b IN (%s) ORDER BY ticker_a, ticker_b",
+        (SAMPLE_TICKER, SAMPLE_TICKER),
+        False,
+    ),
+    (
+        "get_ticker_metadata",
+        "SELECT ticker_id, name, quote_type, high_52, low_52, refreshed_at FROM tickers "
+        "WHERE ticker_id IN (%s) AND refreshed_at IS NOT NULL",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "get_transactions",
+        "SELECT * FROM transactions WHERE ticker_id = %s",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "transaction page",
+        "SELECT transaction_num, ticker_id, num_shares, price, transaction_type, date "
+        "FROM transactions WHERE (date, transaction_num) < (%s, %s) "
+        "ORDER BY date DESC, transaction_num DESC LIMIT 51",
+        (SAMPLE_DATE, 1000),
+        False,
+    ),
+    (
+        "transaction page by ticker",
+        "SELECT transaction_num, ticker_id, num_shares, price, transaction_type, date "
+        "FROM transactions WHERE ticker_id = %s AND date >= %s "
+        "ORDER BY date DESC, transaction_num DESC LIMIT 51",
+        (SAMPLE_TICKER, SAMPLE_DATE),
+        False,
+    ),
+    (
+        "export ticker_data",
+        "SELECT ticker_id, date, open, high, low, close, volume, abs_profit, percent_profit "
+        "FROM ticker_data WHERE ticker_id = %s AND date >= %s ORDER BY ticker_id, date",
+        (SAMPLE_TICKER, SAMPLE_DATE),
+        False,
+    ),
+    (
+        "get_positions",
+        "SELECT shares_held, total_cost, realized_pnl, shares_bought, buy_weight, last_trade_at, "
+        "ticker_id FROM positions WHERE ticker_id IN (%s)",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "get_last_closes",
+        "SELECT td.ticker_id, td.close, td.date FROM tickers t "
+        "JOIN ticker_data td ON td.ticker_id = t.ticker_id AND td.date = t.last_bar_at "
+        "WHERE t.ticker_id IN (%s)",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "portfolio table shares",
+        "SELECT ticker_id, total_shares FROM portfolio",
+        (),
+        True,
+    ),
+    (
+        "get_num_shares",
+        "SELECT total_shares FROM portfolio WHERE ticker_id = %s",
+        (SAMPLE_TICKER,),
+        False,
+    ),
+    (
+        "get_data_versions",
+        "SELECT name, version FROM data_versions WHERE name IN (%s, %s)",
+        ("portfolio", f"ticker_data:{SAMPLE_TICKER}"),
+        False,
+    ),
+    ("display_portfolio", "SELECT * FROM portfolio", (), True),
+    (
+        "asset_type_breakdown",
+        "SELECT total_shares, asset_type FROM portfolio",
+        (),
+        True,
+    ),
+]
+
+
+def explain_queries(db_editor, queries: list = QUERIES):
+    """
+    explain_queries Run EXPLAIN on the DatabaseEditor queries and report the ones scanning whole tables.
+
+    A full table scan (access type ALL) fails the check when the table has no index the query
+    could use. When the optimizer had usable indexes but still chose a scan it is only a
+    warning: on small tables a scan is cheaper, it should go away as the table grows.
+
+    Args:
+        db_editor (DatabaseEditor): Editor connected to the database.
+        queries (list, optional): (name, query, params, full scan allowed) tuples. Defaults to QUERIES.
+
+    Returns:
+        list: Failures, dicts with the query name, table and reason.
+        list: Warnings, same format.
+    """
+    failures = []
+    warnings = []
+    for name, query, params, full_scan_ok in queries:
+        db_editor.cursor.execute("EXPLAIN " + query, params)
+        columns = [c[0] for c in db_editor.cursor.description]
+        plan = [dict(zip(columns, row)) for row in db_editor.cursor.fetchall()]
+
+        for step in plan:
+            if step.get("type") != "ALL" or full_scan_ok:
+                continue
+            if step.get("select_type") == "INSERT":
+                # the row written, not a scan: the duplicate key check is a primary key lookup
+                continue
+            finding = {"query": name, "table": step.get("table")}
+            if step.get("possible_keys") is None:
+                finding["reason"] = "full table scan, no usable index"
+                failures.append(finding)
+                logging.error(
+                    f"{name}: full table scan of {finding['table']}, no usable index."
+                )
+            else:
+                finding["reason"] = (
+                    f"full table scan, {step['possible_keys']} not chosen"
+                )
+                warnings.append(finding)
+                logging.warning(
+                    f"{name}: full table scan of {finding['table']} although "
+                    f"{step['possible_keys']} could be used (small table?)."
+                )
+
+    logging.info(
+        f"Explained {len(queries)} queries: {len(failures)} failures, {len(warnings)} warnings."
+    )
+    return failures, warnings
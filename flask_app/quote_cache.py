@@ -0,0 +1,271 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", "60"))
+QUOTE_CACHE_SIZE = int(os.getenv("QUOTE_CACHE_SIZE", "512"))
+# seconds a failed fetch is remembered, callers get None meanwhile instead of calling upstream again
+QUOTE_CACHE_NEGATIVE_TTL = float(os.getenv("QUOTE_CACHE_NEGATIVE_TTL", "5"))
+
+
+# process-wide cache for market quotes, shared by every DatabaseEditor
+class QuoteCache:
+    def __init__(
+        self,
+        ttl: float = QUOTE_CACHE_TTL,
+        maxsize: int = QUOTE_CACHE_SIZE,
+        negative_ttl: float = QUOTE_CACHE_NEGATIVE_TTL,
+    ):
+        """
+        __init__ Initializer for the QuoteCache class.
+
+        Args:
+            ttl (float, optional): Seconds a quote stays fresh. Defaults to QUOTE_CACHE_TTL.
+            maxsize (int, optional): Max number of tickers kept before the least recently used
+                one is evicted. Defaults to QUOTE_CACHE_SIZE.
+            negative_ttl (float, optional): Seconds a failed fetch (an exception or None) is
+                cached as None, 0 to not cache it. Defaults to QUOTE_CACHE_NEGATIVE_TTL.
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = (
+            OrderedDict()
+        )  # key -> (value, expires_at), None for a failed fetch
+        self._inflight = {}  # key -> threading.Event for the fetch in progress
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str):
+        # caller must hold self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str):
+        """
+        get Returns the cached value for a key, or None if it is missing, expired or failed.
+
+        Args:
+            key (str): Ticker symbol.
+
+        Returns:
+            float: Cached value, or None.
+        """
+        key = key.upper()
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def get_cached(self, keys: list):
+        """
+        get_cached Returns the cached values of the keys that have a fresh one.
+
+        Only the hits are counted: the caller fetches the other keys through get_or_fetch or
+        get_or_fetch_many, which count them as misses. Keys whose fetch failed recently are
+        left to those too, they return None for them without calling upstream.
+
+        Args:
+            keys (list): Ticker symbols.
+
+        Returns:
+            dict: Cached value of each key (upper case) that has one.
+        """
+        values = {}
+        with self._lock:
+            for key in dict.fromkeys(k.upper() for k in keys):
+                entry = self._lookup(key)
+                if entry is not None and entry[0] is not None:
+                    self.hits += 1
+                    values[key] = entry[0]
+        return values
+
+    def set(self, key: str, value):
+        """
+        set Stores a value in the cache, evicting the least recently used entry if full.
+
+        Args:
+            key (str): Ticker symbol.
+            value (float): Value to cache. None values are not cached.
+        """
+        if value is None:
+            return
+        self._store(key.upper(), value)
+
+    def _store(self, key: str, value):
+        # None records a failed fetch, for negative_ttl seconds
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                logging.debug(f"Evicted {evicted} from the quote cache.")
+
+    def get_or_fetch(self, key: str, fetch):
+        """
+        get_or_fetch Returns the cached value for a key, calling fetch() on a miss.
+
+        Concurrent misses for the same key share a single call to fetch(): the first caller
+        fetches, the others wait for its result. A failed fetch (an exception or None) is
+        cached as None for negative_ttl seconds, the waiters and the next callers get None
+        without calling fetch() again.
+
+        Args:
+            key (str): Ticker symbol.
+            fetch (callable): Zero-argument function returning the fresh value.
+
+        Returns:
+            float: Cached or freshly fetched value (None if the fetch failed).
+        """
+        key = key.upper()
+        while True:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+
+                event = self._inflight.get(key)
+                if event is None:
+                    # this thread is the leader for the key
+                    self.misses += 1
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    break
+
+            # another thread is fetching the key, wait for it and look again
+            event.wait()
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+            # nothing cached (negative_ttl is 0 or it was evicted), fetch ourselves
+            return fetch()
+
+        value = None
+        try:
+            value = fetch()
+            return value
+        finally:
+            self._store(key, value)
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def get_or_fetch_many(self, keys: list, fetch):
+        """
+        get_or_fetch_many Returns the cached values of many keys, calling fetch() once for the misses.
+
+        Same single flight and caching of failed fetches as get_or_fetch: keys another thread
+        is already fetching are waited for instead of being fetched again.
+
+        Args:
+            keys (list): Ticker symbols.
+            fetch (callable): Function of a list of keys returning a dict of the fresh values
+                it got.
+
+        Returns:
+            dict: Cached or freshly fetched value of each key (None if the fetch failed), in
+                the order of keys.
+        """
+        keys = list(dict.fromkeys(k.upper() for k in keys))
+        values = {}
+        leading = []
+        waiting = []
+        with self._lock:
+            for key in keys:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.hits += 1
+                    values[key] = entry[0]
+                elif key in self._inflight:
+                    waiting.append((key, self._inflight[key]))
+                else:
+                    # this thread is the leader for the key
+                    self.misses += 1
+                    self._inflight[key] = threading.Event()
+                    leading.append(key)
+
+        try:
+            if leading:
+                fetched = {}
+                try:
+                    fetched = fetch(leading)
+                finally:
+                    for key in leading:
+                        values[key] = fetched.get(key)
+                        self._store(key, values[key])
+        finally:
+            with self._lock:
+                events = [self._inflight.pop(key) for key in leading]
+            for event in events:
+                event.set()
+
+        failed = []
+        for key, event in waiting:
+            event.wait()
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.hits += 1
+                    values[key] = entry[0]
+                else:
+                    failed.append(key)
+        if failed:
+            # nothing cached (negative_ttl is 0 or they were evicted), fetch ourselves
+            fetched = fetch(failed)
+            values.update({key: fetched.get(key) for key in failed})
+        return {key: values[key] for key in keys}
+
+    def invalidate(self, key: str = None):
+        """
+        invalidate Drops a key from the cache, or every key if none is given.
+
+        Args:
+            key (str, optional): Ticker symbol to drop. Defaults to None.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key.upper(), None)
+
+    def stats(self):
+        """
+        stats Returns the cache counters.
+
+        Returns:
+            dict: Hits, misses, hit rate, current size and configuration of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+quote_cache = QuoteCache()
@@ -0,0 +1,234 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from market_calendar import is_market_open, market_now, next_session_event
+
+load_dotenv()
+# seconds between refresh runs while the market is open
+REFRESH_INTERVAL = int(os.getenv("REFRESH_INTERVAL", "900"))
+# max number of tickers refreshed at the same time
+REFRESH_WORKERS = int(os.getenv("REFRESH_WORKERS", "4"))
+# seconds to wait after the open/close so upstream has the new bar
+SESSION_EVENT_DELAY = int(os.getenv("SESSION_EVENT_DELAY", "120"))
+
+
+# runs DatabaseEditor.update_ticker_data for every holding in the background
+class RefreshScheduler:
+    def __init__(
+        self,
+        editor_factory,
+        interval: int = REFRESH_INTERVAL,
+        workers: int = REFRESH_WORKERS,
+        history: int = 500,
+    ):
+        """
+        __init__ Initializer for the RefreshScheduler class.
+
+        Args:
+            editor_factory (callable): Zero-argument function returning a new DatabaseEditor. Each job
+                gets its own editor and disconnects it when done.
+            interval (int, optional): Seconds between runs while the market is open. Defaults to REFRESH_INTERVAL.
+            workers (int, optional): Size of the worker pool. Defaults to REFRESH_WORKERS.
+            history (int, optional): Number of job records kept. Defaults to 500.
+        """
+        self.editor_factory = editor_factory
+        self.interval = interval
+        self.workers = workers
+
+        self._executor = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running = set()  # tickers with a job in progress
+        self._dirty = set()  # tickers submitted again while their job was in progress
+        self._runs = deque(maxlen=history)
+        self.next_run_at = None
+
+    def start(self):
+        """
+        start Starts the scheduler thread, does nothing if it is already running.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="refresh"
+            )
+            self._thread = threading.Thread(
+                target=self._loop, name="refresh-scheduler", daemon=True
+            )
+            self._thread.start()
+        logging.info(
+            f"Refresh scheduler started ({self.workers} workers, every {self.interval}s while the market is open)."
+        )
+
+    def stop(self):
+        """
+        stop Stops the scheduler thread and waits for the jobs in progress.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            executor, self._executor = self._executor, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join()
+        executor.shutdown(wait=True)
+        logging.info("Refresh scheduler stopped.")
+
+    def _next_run(self, now: datetime):
+        """
+        _next_run Returns when the next run should start.
+
+        Runs happen every interval while the market is open, and shortly after each open and close
+        so the first and final bars of a session are picked up.
+
+        Args:
+            now (datetime): Exchange-local time.
+
+        Returns:
+            datetime: Exchange-local time of the next run.
+        """
+        next_event = next_session_event(now) + timedelta(seconds=SESSION_EVENT_DELAY)
+        if is_market_open(now):
+            return min(now + timedelta(seconds=self.interval), next_event)
+        return next_event
+
+    def _loop(self):
+        # refresh once at startup, then follow the market hours
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logging.exception("Refresh run failed.")
+
+            now = market_now()
+            self.next_run_at = self._next_run(now)
+            self._stop.wait((self.next_run_at - now).total_seconds())
+
+    def run_once(self):
+        """
+        run_once Submits one refresh job per ticker in the portfolio to the worker pool.
+
+        Tickers whose previous job is still running are skipped.
+
+        Returns:
+            list: Futures of the submitted jobs.
+        """
+        db_editor = self.editor_factory()
+        try:
+            tickers = db_editor.get_tickers() or []
+        finally:
+            db_editor.disconnect()
+
+        futures = [self.submit(ticker_id, rerun=False) for ticker_id in tickers]
+        return [f for f in futures if f is not None]
+
+    def submit(self, ticker_id: str, rerun: bool = True):
+        """
+        submit Queues a refresh job for one ticker, e.g. right after it was traded.
+
+        If the ticker is already being refreshed, the job in progress may have fetched its bars
+        before the change and write back the checked_at the change cleared. The ticker is then
+        refreshed again, whatever its checked_at, once that job finishes.
+
+        Args:
+            ticker_id (str): Ticker to refresh.
+            rerun (bool, optional): Refresh the ticker again after a job in progress, instead of
+                skipping it. Defaults to True.
+
+        Returns:
+            Future: The submitted job, None if the scheduler is stopped or the ticker is already
+                being refreshed.
+        """
+        ticker_id = ticker_id.upper()
+        with self._lock:
+            if self._executor is None:
+                return None
+            overlap = ticker_id in self._running
+            if overlap:
+                if rerun:
+                    self._dirty.add(ticker_id)
+            else:
+                self._running.add(ticker_id)
+                future = self._executor.submit(self._refresh, ticker_id)
+        if overlap:
+            self._record(ticker_id, time.time(), 0.0, "overlap")
+            return None
+        return future
+
+    def _refresh(self, ticker_id: str, force: bool = False):
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            db_editor = self.editor_factory()
+            try:
+                result = db_editor.update_ticker_data([ticker_id], force=force)
+            finally:
+                db_editor.disconnect()
+            outcome = "skipped" if result["skipped"] else "ok"
+            self._record(
+                ticker_id,
+                started_at,
+                time.perf_counter() - start,
+                outcome,
+                result["rows"],
+            )
+        except Exception as e:
+            logging.exception(f"Refreshing {ticker_id} failed.")
+            self._record(
+                ticker_id,
+                started_at,
+                time.perf_counter() - start,
+                "error",
+                error=str(e),
+            )
+        finally:
+            with self._lock:
+                if ticker_id in self._dirty and self._executor is not None:
+                    # submitted during this job, the ticker stays in _running
+                    self._dirty.discard(ticker_id)
+                    self._executor.submit(self._refresh, ticker_id, True)
+                else:
+                    self._dirty.discard(ticker_id)
+                    self._running.discard(ticker_id)
+
+    def _record(
+        self,
+        ticker_id: str,
+        started_at: float,
+        duration: float,
+        outcome: str,
+        rows: int = 0,
+        error: str = None,
+    ):
+        with self._lock:
+            self._runs.append(
+                {
+                    "ticker_id": ticker_id,
+                    "started_at": datetime.fromtimestamp(started_at).isoformat(),
+                    "duration": duration,
+                    "outcome": outcome,
+                    "rows": rows,
+                    "error": error,
+                }
+            )
+
+    def runs(self):
+        """
+        runs Returns the most recent job records, newest first.
+
+        Returns:
+            list: Ticker, start time, duration in seconds, outcome ("ok", "skipped", "overlap" or
+                "error"), bars written and error message of each job. An "overlap" submitted by
+                a trade is followed by a rerun once the job in progress finishes.
+        """
+        with self._lock:
+            return list(reversed(self._runs))
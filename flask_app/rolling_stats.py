@@ -0,0 +1,320 @@
+import os
+
+import numpy as np
+import pandas as pd
+from analytics import TRADING_DAYS, pairwise_moments
+from dotenv import load_dotenv
+
+load_dotenv()
+# number of most recent daily returns of the rolling mean, volatility and correlations
+ROLLING_WINDOW = int(os.getenv("ROLLING_WINDOW", "63"))
+
+
+def empty_stats(window: int = ROLLING_WINDOW):
+    """
+    empty_stats Returns the return statistics of a ticker without any bar.
+
+    Args:
+        window (int, optional): Size of the rolling window. Defaults to ROLLING_WINDOW.
+
+    Returns:
+        dict: Expanding (n, mean, m2) and rolling (ring buffer of dates and returns, its mean
+            and m2) statistics of the daily log returns, and the last bar they include.
+    """
+    return {
+        "last_date": None,
+        "last_close": None,
+        "n": 0,
+        "mean": 0.0,
+        "m2": 0.0,
+        "window_dates": np.zeros(window, "datetime64[s]"),
+        "window_returns": np.zeros(window),
+        "window_head": 0,  # slot of the next return, the oldest one once the window is full
+        "window_count": 0,
+        "window_mean": 0.0,
+        "window_m2": 0.0,
+    }
+
+
+def add_bar(stats: dict, date, close: float):
+    """
+    add_bar Fold the next bar of a ticker into its statistics in O(1), updating stats in place.
+
+    The expanding mean and sum of squared deviations (m2) follow Welford's algorithm. The
+    rolling ones add the new return and, once the window is full, remove the one it replaces
+    in the ring buffer.
+
+    Args:
+        stats (dict): Statistics of the ticker, see empty_stats.
+        date (datetime): Date of the bar, after stats["last_date"].
+        close (float): Closing price.
+
+    Returns:
+        float: Log return of the bar, None for the first bar or a non-positive price.
+    """
+    last_close = stats["last_close"]
+    stats["last_date"] = date
+    stats["last_close"] = close
+    if last_close is None or last_close <= 0 or close <= 0:
+        return None
+    r = float(np.log(close / last_close))
+
+    stats["n"] += 1
+    delta = r - stats["mean"]
+    stats["mean"] += delta / stats["n"]
+    stats["m2"] += delta * (r - stats["mean"])
+
+    window = len(stats["window_returns"])
+    head = stats["window_head"]
+    if stats["window_count"] < window:
+        stats["window_count"] += 1
+        delta = r - stats["window_mean"]
+        stats["window_mean"] += delta / stats["window_count"]
+        stats["window_m2"] += delta * (r - stats["window_mean"])
+    else:
+        # replace the oldest return, the window size stays the same
+        old = float(stats["window_returns"][head])
+        old_mean = stats["window_mean"]
+        stats["window_mean"] += (r - old) / window
+        stats["window_m2"] += (r - old) * (r - stats["window_mean"] + old - old_mean)
+    stats["window_returns"][head] = r
+    stats["window_dates"][head] = np.datetime64(date, "s")
+    stats["window_head"] = (head + 1) % window
+    return r
+
+
+def window_series(stats: dict):
+    """
+    window_series Returns the returns of the rolling window, oldest first.
+
+    Args:
+        stats (dict): Statistics of a ticker, see empty_stats.
+
+    Returns:
+        np.ndarray: datetime64 dates.
+        np.ndarray: Log returns.
+    """
+    window = len(stats["window_returns"])
+    count = stats["window_count"]
+    order = (stats["window_head"] - count + np.arange(count)) % window
+    return stats["window_dates"][order], stats["window_returns"][order]
+
+
+def _fill_window(stats: dict, dates: np.ndarray, returns: np.ndarray):
+    # ring buffer holding the latest returns from slot 0, oldest first
+    window = len(stats["window_returns"])
+    dates, returns = dates[-window:], returns[-window:]
+    stats["window_dates"][: len(dates)] = dates
+    stats["window_returns"][: len(returns)] = returns
+    stats["window_head"] = len(returns) % window
+    stats["window_count"] = len(returns)
+    stats["window_mean"] = float(returns.mean()) if len(returns) else 0.0
+    stats["window_m2"] = (
+        float(((returns - returns.mean()) ** 2).sum()) if len(returns) else 0.0
+    )
+
+
+def resize_window(stats: dict, window: int):
+    """
+    resize_window Returns the statistics with a rolling window of another size, keeping the latest returns.
+
+    Args:
+        stats (dict): Statistics of a ticker, see empty_stats.
+        window (int): New size of the window.
+
+    Returns:
+        dict: The statistics, unchanged if the window already has that size.
+    """
+    if len(stats["window_returns"]) == window:
+        return stats
+    resized = dict(stats)
+    resized["window_dates"] = np.zeros(window, "datetime64[s]")
+    resized["window_returns"] = np.zeros(window)
+    _fill_window(resized, *window_series(stats))
+    return resized
+
+
+def stats_from_bars(
+    dates: np.ndarray, closes: np.ndarray, window: int = ROLLING_WINDOW
+):
+    """
+    stats_from_bars Returns the statistics of a whole history at once, as add_bar would build them.
+
+    Args:
+        dates (np.ndarray): datetime64 dates of the bars, ascending.
+        closes (np.ndarray): Closing prices.
+        window (int, optional): Size of the rolling window. Defaults to ROLLING_WINDOW.
+
+    Returns:
+        dict: Statistics, see empty_stats.
+    """
+    stats = empty_stats(window)
+    if len(dates) == 0:
+        return stats
+    returns, return_dates = bar_returns(dates, closes)
+
+    stats["last_date"] = pd.Timestamp(dates[-1]).to_pydatetime()
+    stats["last_close"] = float(closes[-1])
+    if len(returns):
+        stats["n"] = len(returns)
+        stats["mean"] = float(returns.mean())
+        stats["m2"] = float(((returns - returns.mean()) ** 2).sum())
+        _fill_window(stats, return_dates, returns)
+    return stats
+
+
+def bar_returns(dates: np.ndarray, closes: np.ndarray):
+    """
+    bar_returns Returns the log return of each bar from the previous bar of the same ticker.
+
+    Args:
+        dates (np.ndarray): datetime64 dates of the bars, ascending.
+        closes (np.ndarray): Closing prices.
+
+    Returns:
+        np.ndarray: Log returns, without those of non-positive or missing prices.
+        np.ndarray: Their dates.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(closes))
+    valid = np.isfinite(returns)
+    return returns[valid], dates[1:][valid]
+
+
+def pair_moments(returns: pd.DataFrame):
+    """
+    pair_moments Returns the statistics of every pair of tickers over the dates both have a return.
+
+    Same values as folding the returns one date at a time with add_pair_returns.
+
+    Args:
+        returns (pd.DataFrame): Log returns of each ticker by date, NaN where it has none.
+
+    Returns:
+        list: (ticker_a, ticker_b, n, mean_a, mean_b, m2_a, m2_b, c) with ticker_a < ticker_b,
+            for the pairs sharing at least one date.
+    """
+    returns = returns.reindex(columns=sorted(returns.columns))
+    tickers = np.array(returns.columns, dtype=object)
+    n, sums, squares, cross = pairwise_moments(returns)
+
+    a, b = np.triu_indices(len(tickers), 1)
+    shared = n[a, b] > 0
+    a, b = a[shared], b[shared]
+    count = n[a, b]
+    return list(
+        zip(
+            tickers[a],
+            tickers[b],
+            count.astype(int).tolist(),
+            (sums[a, b] / count).tolist(),
+            (sums[b, a] / count).tolist(),
+            (squares[a, b] - sums[a, b] ** 2 / count).tolist(),
+            (squares[b, a] - sums[b, a] ** 2 / count).tolist(),
+            (cross[a, b] - sums[a, b] * sums[b, a] / count).tolist(),
+        )
+    )
+
+
+def add_pair_returns(pair: tuple, r_a: float, r_b: float):
+    """
+    add_pair_returns Fold the returns of a pair on a new shared date into its statistics in O(1).
+
+    Welford's update of both means and sums of squared deviations, plus the co-moment c, the
+    sum of the products of the deviations.
+
+    Args:
+        pair (tuple): (n, mean_a, mean_b, m2_a, m2_b, c), zeros for a new pair.
+        r_a (float): Return of the first ticker.
+        r_b (float): Return of the second ticker.
+
+    Returns:
+        tuple: The updated (n, mean_a, mean_b, m2_a, m2_b, c).
+    """
+    n, mean_a, mean_b, m2_a, m2_b, c = pair
+    n += 1
+    delta_a = r_a - mean_a
+    delta_b = r_b - mean_b
+    mean_a += delta_a / n
+    mean_b += delta_b / n
+    return (
+        n,
+        mean_a,
+        mean_b,
+        m2_a + delta_a * (r_a - mean_a),
+        m2_b + delta_b * (r_b - mean_b),
+        c + delta_a * (r_b - mean_b),
+    )
+
+
+def stats_summary(stats: dict):
+    """
+    stats_summary Returns the current mean and annualized volatility of a ticker's daily log returns.
+
+    Args:
+        stats (dict): Statistics of the ticker, see empty_stats.
+
+    Returns:
+        dict: Expanding and rolling number of returns, mean and volatility, and the last bar.
+    """
+
+    def volatility(m2, n):
+        return float(np.sqrt(max(m2, 0.0) / (n - 1) * TRADING_DAYS)) if n > 1 else None
+
+    return {
+        "last_date": stats["last_date"].isoformat() if stats["last_date"] else None,
+        "returns": stats["n"],
+        "mean": stats["mean"] if stats["n"] else None,
+        "volatility": volatility(stats["m2"], stats["n"]),
+        "window_returns": stats["window_count"],
+        "window_mean": stats["window_mean"] if stats["window_count"] else None,
+        "window_volatility": volatility(stats["window_m2"], stats["window_count"]),
+    }
+
+
+def pair_summary(pair: tuple, stats_a: dict, stats_b: dict):
+    """
+    pair_summary Returns the expanding and rolling covariance and correlation of a pair.
+
+    The expanding values come from the stored co-moment, the rolling ones from the returns the
+    two ring buffers share, O(window) without reading any bar.
+
+    Args:
+        pair (tuple): (n, m2_a, m2_b, c) of the pair.
+        stats_a (dict): Statistics of the first ticker, see empty_stats.
+        stats_b (dict): Statistics of the second ticker.
+
+    Returns:
+        dict: Number of shared returns, annualized covariance and correlation, expanding and rolling.
+    """
+    n, m2_a, m2_b, c = pair
+
+    def moments(n, m2_a, m2_b, c):
+        if n < 2:
+            return None, None
+        denominator = np.sqrt(m2_a * m2_b)
+        correlation = (
+            float(np.clip(c / denominator, -1, 1)) if denominator > 0 else None
+        )
+        return float(c / (n - 1) * TRADING_DAYS), correlation
+
+    covariance, correlation = moments(n, m2_a, m2_b, c)
+
+    dates_a, returns_a = window_series(stats_a)
+    dates_b, returns_b = window_series(stats_b)
+    _, index_a, index_b = np.intersect1d(dates_a, dates_b, return_indices=True)
+    x, y = returns_a[index_a], returns_b[index_b]
+    window_covariance, window_correlation = moments(
+        len(x),
+        float(((x - x.mean()) ** 2).sum()) if len(x) else 0.0,
+        float(((y - y.mean()) ** 2).sum()) if len(y) else 0.0,
+        float(((x - x.mean()) * (y - y.mean())).sum()) if len(x) else 0.0,
+    )
+    return {
+        "returns": int(n),
+        "covariance": covariance,
+        "correlation": correlation,
+        "window_returns": len(x),
+        "window_covariance": window_covariance,
+        "window_correlation": window_correlation,
+    }
@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+from collections import deque
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# wall time a single trade should stay under, in milliseconds
+TRADE_LATENCY_BUDGET_MS = float(os.getenv("TRADE_LATENCY_BUDGET_MS", "250"))
+
+
+# process-wide record of the cost of recent trades
+class TradeStats:
+    def __init__(self, budget_ms: float = TRADE_LATENCY_BUDGET_MS, history: int = 1000):
+        """
+        __init__ Initializer for the TradeStats class.
+
+        Args:
+            budget_ms (float, optional): Latency budget of a trade. Defaults to TRADE_LATENCY_BUDGET_MS.
+            history (int, optional): Number of trades kept for the percentiles. Defaults to 1000.
+        """
+        self.budget_ms = budget_ms
+        self.count = 0
+        self.over_budget = 0
+        self.batches = 0
+        self.batch_orders = 0
+        self.batch_seconds = 0.0
+        # (wall_ms, db_round_trips, upstream_calls) of the latest trades
+        self._recent = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def record(
+        self, ticker_id: str, wall_ms: float, db_round_trips: int, upstream_calls: int
+    ):
+        """
+        record Records the cost of one trade, warning if it went over the latency budget.
+
+        Args:
+            ticker_id (str): Ticker traded.
+            wall_ms (float): Wall time of the trade in milliseconds.
+            db_round_trips (int): Number of statements sent to the database, commit included.
+            upstream_calls (int): Number of requests made to Yahoo! Finance.
+        """
+        with self._lock:
+            self.count += 1
+            self._recent.append((wall_ms, db_round_trips, upstream_calls))
+            if wall_ms > self.budget_ms:
+                self.over_budget += 1
+
+        if wall_ms > self.budget_ms:
+            logging.warning(
+                f"Trade of {ticker_id} took {wall_ms:.1f}ms ({db_round_trips} db round trips, "
+                f"{upstream_calls} upstream calls), over the {self.budget_ms:.0f}ms budget."
+            )
+
+    def record_batch(
+        self,
+        num_orders: int,
+        succeeded: int,
+        wall_ms: float,
+        db_round_trips: int,
+        upstream_calls: int,
+    ):
+        """
+        record_batch Records the cost of one batch of orders.
+
+        Args:
+            num_orders (int): Number of orders in the batch.
+            succeeded (int): Number of orders executed.
+            wall_ms (float): Wall time of the batch in milliseconds.
+            db_round_trips (int): Number of statements sent to the database, commits included.
+            upstream_calls (int): Number of requests made to Yahoo! Finance.
+        """
+        with self._lock:
+            self.batches += 1
+            self.batch_orders += num_orders
+            self.batch_seconds += wall_ms / 1000
+
+        logging.info(
+            f"Batch of {num_orders} orders ({succeeded} executed) took {wall_ms:.1f}ms "
+            f"({db_round_trips} db round trips, {upstream_calls} upstream calls)."
+        )
+
+    def summary(self):
+        """
+        summary Returns latency percentiles and average costs of the recent trades.
+
+        Returns:
+            dict: Trade counts, wall time percentiles, average round trips/upstream calls and
+                batch throughput in orders per second.
+        """
+        with self._lock:
+            recent = list(self._recent)
+            count, over_budget = self.count, self.over_budget
+            batches, batch_orders = self.batches, self.batch_orders
+            batch_seconds = self.batch_seconds
+
+        summary = {
+            "count": count,
+            "over_budget": over_budget,
+            "budget_ms": self.budget_ms,
+            "batches": batches,
+            "batch_orders": batch_orders,
+            "batch_orders_per_sec": (
+                batch_orders / batch_seconds if batch_seconds > 0 else None
+            ),
+        }
+        if not recent:
+            return summary
+
+        wall = sorted(r[0] for r in recent)
+        for p in (50, 95, 99):
+            summary[f"p{p}_ms"] = wall[min(len(wall) - 1, len(wall) * p // 100)]
+        summary["avg_db_round_trips"] = sum(r[1] for r in recent) / len(recent)
+        summary["avg_upstream_calls"] = sum(r[2] for r in recent) / len(recent)
+        return summary
+
+
+trade_stats = TradeStats()
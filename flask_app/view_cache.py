@@ -0,0 +1,193 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# seconds past its TTL an expired view is still served while it is recomputed in the background
+VIEW_CACHE_STALE_TTL = float(os.getenv("VIEW_CACHE_STALE_TTL", "300"))
+# max number of views recomputed in the background at the same time
+VIEW_CACHE_WORKERS = int(os.getenv("VIEW_CACHE_WORKERS", "2"))
+
+
+# a computed view, the data version it was computed from and when
+class _Entry:
+    __slots__ = ("value", "version", "computed_at", "invalidated")
+
+    def __init__(self, value, version, invalidated: bool = False):
+        self.value = value
+        self.version = version
+        self.computed_at = time.monotonic()
+        self.invalidated = invalidated
+
+
+# process-wide cache of computed responses (portfolio table, asset breakdown...)
+class ViewCache:
+    def __init__(
+        self, stale_ttl: float = VIEW_CACHE_STALE_TTL, workers: int = VIEW_CACHE_WORKERS
+    ):
+        """
+        __init__ Initializer for the ViewCache class.
+
+        Args:
+            stale_ttl (float, optional): Seconds an expired view may still be served while it is
+                recomputed. Defaults to VIEW_CACHE_STALE_TTL.
+            workers (int, optional): Max background recomputes at once. Defaults to VIEW_CACHE_WORKERS.
+        """
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+        self._entries = {}  # key -> _Entry
+        self._running = {}  # key -> threading.Event of the recompute in progress
+        self._generations = (
+            {}
+        )  # key -> number of invalidations, to spot races with a recompute
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="view-cache"
+        )
+
+    def get_or_compute(self, key: str, compute, ttl: float, version=None, refresh=None):
+        """
+        get_or_compute Returns a cached view, computing it when needed, with stale-while-revalidate.
+
+        - fresh (computed from the same version, not invalidated, within ttl): served.
+        - a recompute is already running: the current value is served, readers never wait for it.
+        - expired less than stale_ttl ago: served, and recomputed in the background.
+        - invalidated, computed from another version, too old or missing: recomputed by this
+          caller, concurrent callers with nothing to serve wait for it (single flight).
+
+        Args:
+            key (str): Name of the view.
+            compute (callable): Zero-argument function computing the view in this thread.
+            ttl (float): Seconds the view stays fresh.
+            version (optional): Version of the data the view is computed from, e.g. from the
+                data_versions table. Defaults to None.
+            refresh (callable, optional): Zero-argument function computing the view in a
+                background thread, e.g. with its own database connection. Defaults to None
+                (compute).
+
+        Returns:
+            object: The view.
+            object: Version the returned view was computed from.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                age = time.monotonic() - entry.computed_at if entry else None
+                current = (
+                    entry is not None
+                    and not entry.invalidated
+                    and entry.version == version
+                )
+                if current and age < ttl:
+                    self.hits += 1
+                    return entry.value, entry.version
+
+                running = self._running.get(key)
+                if entry is not None and running is not None:
+                    self.stale_hits += 1
+                    return entry.value, entry.version
+
+                if current and age < ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    self.refreshes += 1
+                    event = self._running[key] = threading.Event()
+                    generation = self._generations.get(key, 0)
+                    self._executor.submit(
+                        self._recompute,
+                        key,
+                        refresh or compute,
+                        version,
+                        generation,
+                        event,
+                    )
+                    return entry.value, entry.version
+
+                if running is None:
+                    # this thread is the leader for the key
+                    self.misses += 1
+                    event = self._running[key] = threading.Event()
+                    generation = self._generations.get(key, 0)
+                    break
+
+            # nothing to serve yet, wait for the recompute in progress and look again
+            running.wait()
+
+        try:
+            value = compute()
+            self._store(key, value, version, generation)
+            return value, version
+        finally:
+            with self._lock:
+                del self._running[key]
+            event.set()
+
+    def _recompute(self, key: str, compute, version, generation: int, event):
+        try:
+            self._store(key, compute(), version, generation)
+        except Exception:
+            logging.exception(f"Unable to recompute the {key} view.")
+        finally:
+            with self._lock:
+                del self._running[key]
+            event.set()
+
+    def _store(self, key: str, value, version, generation: int):
+        with self._lock:
+            # invalidated while it was being computed: keep it to serve, but not as fresh
+            invalidated = self._generations.get(key, 0) != generation
+            self._entries[key] = _Entry(value, version, invalidated)
+
+    def invalidate(self, keys: list = None):
+        """
+        invalidate Marks views as out of date, the next reader recomputes them.
+
+        Invalidated views are still served while their recompute is running.
+
+        Args:
+            keys (list, optional): Views to invalidate. Defaults to None (all).
+        """
+        with self._lock:
+            if keys is None:
+                keys = list(self._entries)
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+                entry = self._entries.get(key)
+                if entry is not None and not entry.invalidated:
+                    entry.invalidated = True
+                    self.invalidations += 1
+
+    def stats(self):
+        """
+        stats Returns the cache counters.
+
+        Returns:
+            dict: Hits, stale hits, misses, background refreshes, invalidations and the cached views.
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "invalidations": self.invalidations,
+                "views": {
+                    key: {
+                        "age": now - entry.computed_at,
+                        "invalidated": entry.invalidated,
+                        "recomputing": key in self._running,
+                    }
+                    for key, entry in self._entries.items()
+                },
+            }
+
+
+view_cache = ViewCache()
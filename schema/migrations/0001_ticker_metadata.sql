@@ -0,0 +1,11 @@
+-- Yahoo! Finance metadata and ticker_data high-water marks in the tickers table
+ALTER TABLE tickers ADD COLUMN name VARCHAR(100);
+ALTER TABLE tickers ADD COLUMN quote_type VARCHAR(20);
+ALTER TABLE tickers ADD COLUMN high_52 DECIMAL(15, 4);
+ALTER TABLE tickers ADD COLUMN low_52 DECIMAL(15, 4);
+-- last time the metadata was fetched, NULL if never
+ALTER TABLE tickers ADD COLUMN refreshed_at TIMESTAMP NULL;
+-- date of the latest bar in ticker_data
+ALTER TABLE tickers ADD COLUMN last_bar_at TIMESTAMP NULL;
+-- last time upstream was asked for new bars
+ALTER TABLE tickers ADD COLUMN checked_at TIMESTAMP NULL;
@@ -0,0 +1,11 @@
+-- running position per ticker, fill it with `python maintenance.py rebuild-positions`
+CREATE TABLE positions (
+    ticker_id VARCHAR(10) PRIMARY KEY,
+    shares_held INT NOT NULL DEFAULT 0,
+    total_cost DECIMAL(15, 4) NOT NULL DEFAULT 0,
+    realized_pnl DECIMAL(15, 4) NOT NULL DEFAULT 0,
+    shares_bought INT NOT NULL DEFAULT 0,
+    buy_weight DOUBLE NOT NULL DEFAULT 0,
+    last_trade_at TIMESTAMP NULL,
+    FOREIGN KEY(ticker_id) REFERENCES tickers(ticker_id)
+);
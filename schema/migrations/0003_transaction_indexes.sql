@@ -0,0 +1,3 @@
+-- keyset pagination of the history and per-ticker lookups (calc_profit, calc_gainloss, refresh)
+CREATE INDEX idx_transactions_date ON transactions (date, transaction_num);
+CREATE INDEX idx_transactions_ticker_date ON transactions (ticker_id, date, transaction_num);
@@ -0,0 +1,3 @@
+-- every trade looks the portfolio up by ticker_id, and a ticker has at most one row
+DELETE FROM portfolio WHERE ticker_id IS NULL;
+ALTER TABLE portfolio ADD PRIMARY KEY (ticker_id);
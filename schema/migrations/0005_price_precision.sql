@@ -0,0 +1,13 @@
+-- DECIMAL without a scale rounds prices to whole dollars, and INT volumes overflow for SPY
+ALTER TABLE ticker_data
+    MODIFY abs_profit DECIMAL(15, 4),
+    MODIFY percent_profit DECIMAL(15, 4),
+    MODIFY open DECIMAL(15, 4),
+    MODIFY low DECIMAL(15, 4),
+    MODIFY close DECIMAL(15, 4),
+    MODIFY high DECIMAL(15, 4),
+    MODIFY volume BIGINT;
+ALTER TABLE portfolio MODIFY total_return DECIMAL(15, 4);
+ALTER TABLE transactions MODIFY price DECIMAL(15, 4);
+-- the stored bars were rounded, clear the high-water marks so the next refresh downloads them again
+UPDATE tickers SET last_bar_at = NULL, checked_at = NULL;
@@ -0,0 +1,6 @@
+-- change counter of each data set, bumped by trades and ingestion, the ETags of the read endpoints
+CREATE TABLE data_versions (
+    name VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,42 @@
+-- running statistics of the daily log returns, updated by ingestion, see flask_app/rolling_stats.py
+-- they start empty: run "python maintenance.py rebuild-return-stats" once after applying this
+CREATE TABLE return_stats (
+    ticker_id VARCHAR(10) PRIMARY KEY,
+    last_date TIMESTAMP NULL, -- latest bar folded in
+    last_close DOUBLE,
+    n BIGINT NOT NULL DEFAULT 0,
+    mean DOUBLE NOT NULL DEFAULT 0,
+    m2 DOUBLE NOT NULL DEFAULT 0, -- sum of squared deviations from the mean
+    window_dates BLOB, -- ring buffer of the latest returns: int64 seconds
+    window_returns BLOB, -- and float64 returns
+    window_head INT NOT NULL DEFAULT 0,
+    window_count INT NOT NULL DEFAULT 0,
+    window_mean DOUBLE NOT NULL DEFAULT 0,
+    window_m2 DOUBLE NOT NULL DEFAULT 0,
+    FOREIGN KEY(ticker_id) REFERENCES tickers(ticker_id)
+);
+
+CREATE TABLE return_pair_stats (
+    ticker_a VARCHAR(10),
+    ticker_b VARCHAR(10), -- ticker_a < ticker_b
+    n BIGINT NOT NULL DEFAULT 0, -- dates both tickers have a return
+    mean_a DOUBLE NOT NULL DEFAULT 0,
+    mean_b DOUBLE NOT NULL DEFAULT 0,
+    m2_a DOUBLE NOT NULL DEFAULT 0,
+    m2_b DOUBLE NOT NULL DEFAULT 0,
+    c DOUBLE NOT NULL DEFAULT 0, -- co-moment, sum of the products of the deviations
+    PRIMARY KEY (ticker_a, ticker_b),
+    INDEX idx_return_pair_stats_b (ticker_b),
+    FOREIGN KEY(ticker_a) REFERENCES tickers(ticker_id),
+    FOREIGN KEY(ticker_b) REFERENCES tickers(ticker_id)
+);
+
+-- log return of each bar folded into return_stats, the other side of a pair's next update
+CREATE TABLE daily_returns (
+    ticker_id VARCHAR(10),
+    date TIMESTAMP NOT NULL,
+    log_return DOUBLE NOT NULL,
+    PRIMARY KEY (ticker_id, date),
+    INDEX idx_daily_returns_date (date),
+    FOREIGN KEY(ticker_id) REFERENCES tickers(ticker_id)
+);
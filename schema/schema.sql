@@ -2,21 +2,28 @@ CREATE DATABASE team11;
 
 USE team11;
 
--- Tickers (not necessarily ones the user has)
+-- Tickers (not necessarily ones the user has) and their Yahoo! Finance metadata
 CREATE TABLE tickers (
-    ticker_id VARCHAR(10) PRIMARY KEY
+    ticker_id VARCHAR(10) PRIMARY KEY,
+    name VARCHAR(100),
+    quote_type VARCHAR(20),
+    high_52 DECIMAL(15, 4),
+    low_52 DECIMAL(15, 4),
+    refreshed_at TIMESTAMP NULL, -- last time the metadata was fetched, NULL if never
+    last_bar_at TIMESTAMP NULL, -- high-water mark: date of the latest bar in ticker_data
+    checked_at TIMESTAMP NULL -- last time upstream was asked for new bars
 );
 
 -- data for the portfolio tickers 
 CREATE TABLE ticker_data (
     ticker_id VARCHAR(10),
-    abs_profit DECIMAL,
-    percent_profit DECIMAL,
-    open DECIMAL,
-    low DECIMAL,
-    close DECIMAL,
-    high DECIMAL,
-    volume INT,
+    abs_profit DECIMAL(15, 4),
+    percent_profit DECIMAL(15, 4),
+    open DECIMAL(15, 4),
+    low DECIMAL(15, 4),
+    close DECIMAL(15, 4),
+    high DECIMAL(15, 4),
+    volume BIGINT,
     date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY(ticker_id) REFERENCES tickers(ticker_id),
     UNIQUE KEY unique_ticker_date (ticker_id, date)
@@ -24,9 +31,9 @@ CREATE TABLE ticker_data (
 
 -- Tickers the user has
 CREATE TABLE portfolio (
-    ticker_id VARCHAR(10),
+    ticker_id VARCHAR(10) PRIMARY KEY,
     total_shares INT,
-    total_return DECIMAL,
+    total_return DECIMAL(15, 4),
     asset_type VARCHAR(10),
     FOREIGN KEY(ticker_id) REFERENCES tickers(ticker_id)
 );
@@ -35,12 +42,94 @@ CREATE TABLE transactions (
     transaction_num INT AUTO_INCREMENT PRIMARY KEY,
     ticker_id VARCHAR(10),
     num_shares INT,
-    price DECIMAL, -- price per share (negative for sell)
+    price DECIMAL(15, 4), -- price per share (negative for sell)
     transaction_type VARCHAR(10), -- buy or sell
     date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(ticker_id) REFERENCES tickers(ticker_id),
+    -- keyset pagination of the history, newest first, optionally for one ticker
+    INDEX idx_transactions_date (date, transaction_num),
+    INDEX idx_transactions_ticker_date (ticker_id, date, transaction_num)
+);
+
+-- running position per ticker, updated in the same transaction as each trade
+CREATE TABLE positions (
+    ticker_id VARCHAR(10) PRIMARY KEY,
+    shares_held INT NOT NULL DEFAULT 0,
+    total_cost DECIMAL(15, 4) NOT NULL DEFAULT 0, -- average cost basis of the shares held
+    realized_pnl DECIMAL(15, 4) NOT NULL DEFAULT 0,
+    shares_bought INT NOT NULL DEFAULT 0, -- all shares ever bought
+    buy_weight DOUBLE NOT NULL DEFAULT 0, -- sum of num_shares / price over all buys
+    last_trade_at TIMESTAMP NULL,
+    FOREIGN KEY(ticker_id) REFERENCES tickers(ticker_id)
+);
+
+-- change counter of each data set ("portfolio", "ticker_data:SPY"...), the ETags of the read endpoints
+CREATE TABLE data_versions (
+    name VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- running statistics of the daily log returns, updated by ingestion, see flask_app/rolling_stats.py
+CREATE TABLE return_stats (
+    ticker_id VARCHAR(10) PRIMARY KEY,
+    last_date TIMESTAMP NULL, -- latest bar folded in
+    last_close DOUBLE,
+    n BIGINT NOT NULL DEFAULT 0,
+    mean DOUBLE NOT NULL DEFAULT 0,
+    m2 DOUBLE NOT NULL DEFAULT 0, -- sum of squared deviations from the mean
+    window_dates BLOB, -- ring buffer of the latest returns: int64 seconds
+    window_returns BLOB, -- and float64 returns
+    window_head INT NOT NULL DEFAULT 0,
+    window_count INT NOT NULL DEFAULT 0,
+    window_mean DOUBLE NOT NULL DEFAULT 0,
+    window_m2 DOUBLE NOT NULL DEFAULT 0,
     FOREIGN KEY(ticker_id) REFERENCES tickers(ticker_id)
 );
 
+CREATE TABLE return_pair_stats (
+    ticker_a VARCHAR(10),
+    ticker_b VARCHAR(10), -- ticker_a < ticker_b
+    n BIGINT NOT NULL DEFAULT 0, -- dates both tickers have a return
+    mean_a DOUBLE NOT NULL DEFAULT 0,
+    mean_b DOUBLE NOT NULL DEFAULT 0,
+    m2_a DOUBLE NOT NULL DEFAULT 0,
+    m2_b DOUBLE NOT NULL DEFAULT 0,
+    c DOUBLE NOT NULL DEFAULT 0, -- co-moment, sum of the products of the deviations
+    PRIMARY KEY (ticker_a, ticker_b),
+    INDEX idx_return_pair_stats_b (ticker_b),
+    FOREIGN KEY(ticker_a) REFERENCES tickers(ticker_id),
+    FOREIGN KEY(ticker_b) REFERENCES tickers(ticker_id)
+);
+
+-- log return of each bar folded into return_stats, the other side of a pair's next update
+CREATE TABLE daily_returns (
+    ticker_id VARCHAR(10),
+    date TIMESTAMP NOT NULL,
+    log_return DOUBLE NOT NULL,
+    PRIMARY KEY (ticker_id, date),
+    INDEX idx_daily_returns_date (date),
+    FOREIGN KEY(ticker_id) REFERENCES tickers(ticker_id)
+);
+
+-- schema changes applied to the database, see flask_app/migrations.py
+CREATE TABLE schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    checksum CHAR(64), -- sha256 of the migration file, NULL if it came with schema.sql
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- this file already includes every migration in schema/migrations, keep in sync when adding one
+INSERT INTO schema_migrations (version, name) VALUES
+    (1, 'ticker_metadata'),
+    (2, 'positions_ledger'),
+    (3, 'transaction_indexes'),
+    (4, 'portfolio_primary_key'),
+    (5, 'price_precision'),
+    (6, 'data_versions'),
+    (7, 'return_stats');
+
 -- CREATE TABLE ticker_returns (
 --     ticker_id VARCHAR(10),
 --     mean_return DECIMAL,
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the modules of flask_app import each other by their flat names
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app")
+)
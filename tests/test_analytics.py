@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analytics import (
+    TRADING_DAYS,
+    correlation_matrix,
+    covariance_matrix,
+    portfolio_risk,
+    price_matrix,
+    returns_matrix,
+    value_at_risk,
+)
+
+
+def make_bars(dates, closes):
+    return {
+        "date": np.array(dates, dtype="datetime64[s]"),
+        "close": np.array(closes, dtype=np.float64),
+    }
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    values = rng.normal(0, 0.01, (300, 6))
+    # tickers without a return on some dates, and one with a single return
+    values[rng.random(values.shape) < 0.2] = np.nan
+    values[:-1, 5] = np.nan
+    return pd.DataFrame(values, columns=list("ABCDEF"))
+
+
+def test_covariance_matrix_matches_pandas(returns):
+    expected = returns.cov() * TRADING_DAYS
+    pd.testing.assert_frame_equal(covariance_matrix(returns), expected)
+
+
+def test_correlation_matrix_matches_pandas(returns):
+    pd.testing.assert_frame_equal(correlation_matrix(returns), returns.corr())
+
+
+def test_returns_matrix_aligns_tickers_on_the_union_of_dates():
+    prices = price_matrix(
+        {
+            "A": make_bars(["2024-01-01", "2024-01-02", "2024-01-03"], [1, 2, 4]),
+            "B": make_bars(["2024-01-02", "2024-01-03"], [10, 5]),
+        }
+    )
+    returns = returns_matrix(prices, "simple")
+    assert list(returns.index.strftime("%Y-%m-%d")) == ["2024-01-02", "2024-01-03"]
+    np.testing.assert_allclose(returns["A"], [1.0, 1.0])
+    np.testing.assert_allclose(returns["B"], [np.nan, -0.5])
+
+
+def test_portfolio_risk_without_holdings():
+    risk = portfolio_risk({}, {})
+    assert risk["tickers"] == {}
+    assert risk["observations"] == 0
+    assert risk["portfolio"]["value"] == 0.0
+    assert risk["portfolio"]["volatility"] is None
+    assert risk["portfolio"]["beta"] is None
+    assert risk["portfolio"]["value_at_risk"]["historical"] is None
+
+
+def test_portfolio_risk_without_holdings_still_validates_arguments():
+    with pytest.raises(ValueError):
+        portfolio_risk({}, {}, confidence=1.5)
+
+
+def random_bars(rng, n, scale):
+    dates = pd.bdate_range("2024-01-01", periods=n).to_numpy()
+    return make_bars(dates, 100 * np.exp(np.cumsum(rng.normal(0, scale, n))))
+
+
+def test_portfolio_risk_without_benchmark_bars_has_no_beta():
+    rng = np.random.default_rng(1)
+    bars = {"A": random_bars(rng, 50, 0.01), "B": random_bars(rng, 50, 0.02)}
+    risk = portfolio_risk(bars, {"A": 10, "B": 5}, benchmark="SPY")
+    assert risk["benchmark"] is None
+    assert risk["portfolio"]["beta"] is None
+    assert all(t["beta"] is None for t in risk["tickers"].values())
+    assert risk["portfolio"]["volatility"] > 0
+
+
+def test_portfolio_risk_matches_pandas():
+    rng = np.random.default_rng(2)
+    bars = {t: random_bars(rng, 120, 0.01) for t in ("A", "B", "SPY")}
+    shares = {"A": 10, "B": 5}
+    risk = portfolio_risk(bars, shares, benchmark="SPY")
+
+    closes = pd.DataFrame({t: b["close"] for t, b in bars.items()})
+    returns = np.log(closes).diff().dropna()
+    cov = returns.cov() * TRADING_DAYS
+    values = closes.iloc[-1][["A", "B"]] * pd.Series(shares)
+    w = values / values.sum()
+    assert np.isclose(risk["portfolio"]["value"], values.sum())
+    assert np.isclose(
+        risk["portfolio"]["volatility"],
+        np.sqrt(w @ cov.loc[["A", "B"], ["A", "B"]] @ w),
+    )
+    beta = cov["SPY"] / cov.at["SPY", "SPY"]
+    assert np.isclose(risk["tickers"]["A"]["beta"], beta["A"])
+    assert np.isclose(risk["portfolio"]["beta"], (beta[["A", "B"]] * w).sum())
+
+
+def test_portfolio_risk_with_a_single_return_has_no_volatility():
+    bars = {"A": make_bars(["2024-01-01", "2024-01-02"], [10, 11])}
+    risk = portfolio_risk(bars, {"A": 1})
+    assert risk["portfolio"]["volatility"] is None
+    assert risk["tickers"]["A"]["volatility"] is None
+
+
+def test_value_at_risk_of_constant_returns():
+    var = value_at_risk(np.full(10, np.log(0.99)), 1000, 0.95)
+    assert np.isclose(var["historical"]["fraction"], 0.01)
+    assert np.isclose(var["parametric"]["amount"], 10)
+
+
+def test_portfolio_risk_leaves_out_the_dates_only_the_benchmark_has():
+    rng = np.random.default_rng(3)
+    spy = random_bars(rng, 1000, 0.01)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 60)))
+    a = make_bars(spy["date"][-60:], closes)
+    risk = portfolio_risk({"A": a, "SPY": spy}, {"A": 10}, benchmark="SPY")
+    alone = portfolio_risk({"A": a}, {"A": 10}, benchmark="SPY")
+
+    assert risk["observations"] == alone["observations"] == 59
+    assert risk["start"] == alone["start"]
+    expected = alone["portfolio"]["value_at_risk"]
+    for method, var in risk["portfolio"]["value_at_risk"].items():
+        assert var == expected[method]
+    assert risk["portfolio"]["value_at_risk"]["historical"]["fraction"] > 0
@@ -0,0 +1,32 @@
+import pytest
+from metrics import statement_labels
+
+
+@pytest.mark.parametrize(
+    "statement, labels",
+    [
+        ("SELECT * FROM portfolio WHERE ticker_id = %s;", ("select", "portfolio")),
+        (
+            "UPDATE portfolio SET total_shares = %s WHERE ticker_id = %s;",
+            ("update", "portfolio"),
+        ),
+        (
+            "  update `tickers` SET last_bar_at = NULL WHERE ticker_id = %s;",
+            ("update", "tickers"),
+        ),
+        ("UPDATE IGNORE positions SET shares_held = 0;", ("update", "positions")),
+        (
+            "INSERT INTO data_versions (name, version) VALUES (%s, 1) "
+            "ON DUPLICATE KEY UPDATE version = version + 1;",
+            ("insert", "data_versions"),
+        ),
+        ("DELETE FROM ticker_data WHERE ticker_id = %s;", ("delete", "ticker_data")),
+        (
+            "CREATE TABLE IF NOT EXISTS schema_migrations (",
+            ("create", "schema_migrations"),
+        ),
+        ("COMMIT", ("commit", "")),
+    ],
+)
+def test_statement_labels(statement, labels):
+    assert statement_labels(statement) == labels
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from ohlcv_store import OhlcvStore, bars_from_rows
+
+
+def make_bars(first: int, n: int, price: float):
+    dates = pd.bdate_range("2024-01-01", periods=first + n)[first:]
+    return bars_from_rows(
+        [(d.to_pydatetime(), price, price, price, price, 100, 0.0, 0.0) for d in dates]
+    )
+
+
+def test_refetch_of_the_latest_bars_leaves_mapped_rows_untouched(tmp_path):
+    store = OhlcvStore(str(tmp_path))
+    history = make_bars(0, 5, 10.0)
+    store.read("AAA", 1, lambda: history)
+    held = store.read("AAA", 1, lambda: history)
+    assert store.hits == 1
+
+    # the latest bar moved and a new one came in
+    assert store.upsert("AAA", make_bars(4, 2, 11.0), 2)
+    bars = store.read("AAA", 2, lambda: None)
+
+    np.testing.assert_array_equal(held["close"], [10.0] * 5)
+    np.testing.assert_array_equal(held["open"], [10.0] * 5)
+    np.testing.assert_array_equal(bars["close"], [10.0] * 4 + [11.0] * 2)
+    assert store._meta("AAA")["generation"] == 1
+
+
+def test_new_bars_are_appended_to_the_current_generation(tmp_path):
+    store = OhlcvStore(str(tmp_path))
+    history = make_bars(0, 5, 10.0)
+    held = store.read("AAA", 1, lambda: history)
+
+    assert store.upsert("AAA", make_bars(5, 3, 12.0), 2)
+    bars = store.read("AAA", 2, lambda: None)
+
+    assert store._meta("AAA")["generation"] == 0
+    assert len(held["close"]) == 5
+    np.testing.assert_array_equal(bars["close"], [10.0] * 5 + [12.0] * 3)
+    np.testing.assert_array_equal(bars["date"][:5], history["date"])
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+from portfolio_table import price_holdings
+from quote_cache import quote_cache
+
+
+class QuoteEditor:
+    def __init__(self, prices: dict, delay: float = 0.0):
+        self.prices = prices
+        self.delay = delay
+        self.calls = []
+        self.threads = set()
+        self.released = threading.Event()
+
+    def get_market_values(self, ticker_ids: list):
+        self.threads.add(threading.get_ident())
+
+        def fetch(misses):
+            self.calls.append(misses)
+            self.released.wait(self.delay)
+            return {t: self.prices.get(t) for t in misses}
+
+        return quote_cache.get_or_fetch_many(ticker_ids, fetch)
+
+
+@pytest.fixture(autouse=True)
+def empty_quote_cache():
+    quote_cache.invalidate()
+    yield
+    quote_cache.invalidate()
+
+
+def test_price_holdings_counts_each_lookup_once_and_prices_misses_in_one_batch():
+    quote_cache.set("SPY", 500.0)
+    before = quote_cache.stats()
+    db_editor = QuoteEditor({"AAPL": 200.0, "MSFT": 400.0})
+
+    prices, errors = price_holdings(db_editor, ["SPY", "AAPL", "MSFT", "BAD"])
+
+    assert prices == {"SPY": 500.0, "AAPL": 200.0, "MSFT": 400.0}
+    assert errors == {"BAD": "no market value"}
+    assert db_editor.calls == [["AAPL", "MSFT", "BAD"]]
+    assert len(db_editor.threads) == 1
+    after = quote_cache.stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 3
+
+
+def test_price_holdings_keeps_cached_prices_when_the_pricing_times_out():
+    quote_cache.set("SPY", 500.0)
+    db_editor = QuoteEditor({"AAPL": 200.0}, delay=5)
+    try:
+        prices, errors = price_holdings(
+            db_editor, ["SPY", "AAPL"], ticker_timeout=0.1, deadline=1
+        )
+    finally:
+        db_editor.released.set()
+    assert prices == {"SPY": 500.0}
+    assert errors == {"AAPL": "timed out after 0.1s"}
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from quote_cache import QuoteCache
+
+
+def test_get_or_fetch_many_counts_each_lookup_once():
+    cache = QuoteCache(ttl=60)
+    cache.set("SPY", 1.0)
+    calls = []
+
+    def fetch(keys):
+        calls.append(keys)
+        return {key: 2.0 for key in keys}
+
+    assert cache.get_or_fetch_many(["spy", "aapl", "SPY"], fetch) == {
+        "SPY": 1.0,
+        "AAPL": 2.0,
+    }
+    assert calls == [["AAPL"]]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_get_or_fetch_many_single_flight():
+    cache = QuoteCache(ttl=60)
+    calls = []
+
+    def fetch(keys):
+        calls.append(keys)
+        time.sleep(0.2)
+        return {key: 1.0 for key in keys if key != "BAD"}
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_fetch_many(["A", "BAD"], fetch))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{"A": 1.0, "BAD": None}] * 4
+    # the failure of BAD is cached too, the waiters don't fetch it again
+    assert calls == [["A", "BAD"]]
+    assert cache.stats()["misses"] == 2
+
+
+def test_get_or_fetch_passes_a_failure_to_the_waiters():
+    cache = QuoteCache(ttl=60, negative_ttl=0.2)
+    calls = []
+    started = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        raise ConnectionError("upstream down")
+
+    errors = []
+
+    def leader():
+        try:
+            cache.get_or_fetch("SPY", fetch)
+        except ConnectionError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait()
+    waiters = []
+    threads = [
+        threading.Thread(
+            target=lambda: waiters.append(cache.get_or_fetch("SPY", fetch))
+        )
+        for _ in range(3)
+    ]
+    for t in threads:
+        t.start()
+    for t in [thread] + threads:
+        t.join()
+
+    assert len(errors) == 1
+    assert waiters == [None] * 3
+    assert len(calls) == 1
+    assert cache.get_cached(["SPY"]) == {}
+
+    # the failure expires, the next caller fetches again
+    time.sleep(0.2)
+    assert cache.get_or_fetch("SPY", lambda: 1.0) == 1.0
@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from refresh_scheduler import RefreshScheduler
+
+
+class RefreshEditor:
+    def __init__(self, calls: list, released: threading.Event):
+        self.calls = calls
+        self.released = released
+
+    def update_ticker_data(self, ticker_ids: list, force: bool = False):
+        self.calls.append((ticker_ids, force))
+        self.released.wait(5)
+        return {"refreshed": ticker_ids, "skipped": [], "rows": 1}
+
+    def get_tickers(self):
+        return ["AAA"]
+
+    def disconnect(self):
+        pass
+
+
+@pytest.fixture
+def scheduler():
+    calls = []
+    released = threading.Event()
+    scheduler = RefreshScheduler(lambda: RefreshEditor(calls, released))
+    # the worker pool only, without the scheduler thread
+    scheduler._executor = ThreadPoolExecutor(max_workers=2)
+    scheduler.calls, scheduler.released = calls, released
+    yield scheduler
+    released.set()
+    scheduler._executor.shutdown(wait=True)
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_submit_during_a_refresh_runs_it_again_once_it_finishes(scheduler):
+    assert scheduler.submit("aaa") is not None
+    wait_for(lambda: len(scheduler.calls) == 1)
+
+    # e.g. a trade of the ticker while its refresh is in progress
+    assert scheduler.submit("AAA") is None
+    assert scheduler.submit("AAA") is None
+    scheduler.released.set()
+
+    wait_for(lambda: not scheduler._running)
+    assert scheduler.calls == [(["AAA"], False), (["AAA"], True)]
+    assert [r["outcome"] for r in scheduler.runs()] == [
+        "ok",
+        "ok",
+        "overlap",
+        "overlap",
+    ]
+
+
+def test_scheduled_run_skips_a_ticker_being_refreshed(scheduler):
+    scheduler.submit("AAA")
+    wait_for(lambda: len(scheduler.calls) == 1)
+
+    assert scheduler.run_once() == []
+    scheduler.released.set()
+
+    wait_for(lambda: not scheduler._running)
+    assert scheduler.calls == [(["AAA"], False)]
@@ -0,0 +1,365 @@
+import copy
+import re
+import threading
+from datetime import datetime
+
+import db_api
+import numpy as np
+import pandas as pd
+import pytest
+from db_api import DatabaseEditor, InstrumentedCursor
+from rolling_stats import ROLLING_WINDOW, stats_from_bars
+
+DAYS = pd.bdate_range("2024-01-01", periods=120)
+# the session of the last bar has closed
+NOW = datetime(2024, 7, 1, 12, 0)
+
+
+# in-memory stand-in for the MySQL server: REPEATABLE READ snapshots taken at the first read of
+# a transaction, writes applied at the commit and data_versions rows locked until then
+class FakeServer:
+    def __init__(self):
+        self.state = {
+            "bars": {},  # ticker -> {date: close}
+            "versions": {},
+            "return_stats": {},
+            "pairs": {},
+            "daily_returns": {},  # (ticker, date) -> return
+        }
+        self.locks = {}
+        self.mutex = threading.Lock()
+
+    def row_lock(self, name: str):
+        with self.mutex:
+            return self.locks.setdefault(name, threading.Lock())
+
+
+class FakeCursor:
+    def __init__(self, server: FakeServer):
+        self.server = server
+        self.snapshot = None
+        self.writes = []
+        self.held = []
+        self.log = []
+        self.rows = []
+        self.rowcount = 0
+        self.on_read = None
+
+    # transaction
+
+    def _write(self, op):
+        self.writes.append(op)
+        if self.snapshot is not None:
+            op(self.snapshot)
+
+    def _read(self):
+        if self.snapshot is None:
+            with self.server.mutex:
+                self.snapshot = copy.deepcopy(self.server.state)
+            for op in self.writes:
+                op(self.snapshot)
+        return self.snapshot
+
+    def end(self, commit: bool):
+        if commit:
+            with self.server.mutex:
+                for op in self.writes:
+                    op(self.server.state)
+        for lock in self.held:
+            lock.release()
+        self.snapshot, self.writes, self.held = None, [], []
+
+    # statements
+
+    def execute(self, operation, params=None):
+        q = " ".join(operation.split())
+        self.log.append((q, params))
+        self.rows, self.rowcount = [], 0
+
+        if q.startswith("UPDATE tickers") or q.startswith("SELECT date, num_shares"):
+            return
+        if q.startswith("DELETE FROM daily_returns"):
+            t = params[0]
+
+            def op(s):
+                for key in [k for k in s["daily_returns"] if k[0] == t]:
+                    del s["daily_returns"][key]
+
+            return self._write(op)
+        if q.startswith("DELETE FROM return_pair_stats"):
+            t = params[0]
+
+            def op(s):
+                for key in [k for k in s["pairs"] if t in k]:
+                    del s["pairs"][key]
+
+            return self._write(op)
+
+        s = self._read()
+        if self.on_read is not None:
+            self.on_read(q)
+        if q.startswith("SELECT name, version FROM data_versions"):
+            self.rows = [(n, s["versions"][n]) for n in params if n in s["versions"]]
+        elif q.startswith("SELECT ticker_id, last_date"):
+            wanted = s["return_stats"] if params is None else params
+            self.rows = [s["return_stats"][t] for t in wanted if t in s["return_stats"]]
+        elif q.startswith("SELECT ticker_a, ticker_b, n, mean_a"):
+            self.rows = [
+                (a, b, *v) for (a, b), v in s["pairs"].items() if params[0] in (a, b)
+            ]
+        elif q.startswith("SELECT ticker_a, ticker_b, n, m2_a"):
+            wanted = set(params)
+            self.rows = sorted(
+                (a, b, v[0], v[3], v[4], v[5])
+                for (a, b), v in s["pairs"].items()
+                if a in wanted and b in wanted
+            )
+        elif q.startswith("SELECT date, open"):
+            bars = sorted(s["bars"].get(params[0], {}).items())
+            self.rows = [(d, c, c, c, c, 0, 0, 0) for d, c in bars]
+        elif q.startswith("SELECT date, close FROM ticker_data"):
+            t, end, *after = params
+            self.rows = [
+                (d, c)
+                for d, c in sorted(s["bars"].get(t, {}).items())
+                if d < end and (not after or d > after[0])
+            ]
+        elif q.startswith(
+            "SELECT ticker_id, date, log_return FROM daily_returns WHERE"
+        ):
+            first, last, t = params
+            self.rows = [
+                (other, d, r)
+                for (other, d), r in s["daily_returns"].items()
+                if first <= d <= last and other != t
+            ]
+        elif q.startswith("SELECT ticker_id, date, log_return FROM daily_returns"):
+            self.rows = [(t, d, r) for (t, d), r in sorted(s["daily_returns"].items())]
+        elif q.startswith("SELECT ticker_id FROM tickers"):
+            self.rows = [(t,) for t in s["bars"]]
+        else:
+            raise AssertionError(f"unexpected statement {q}")
+
+    def executemany(self, operation, seq_params):
+        q = " ".join(operation.split())
+        seq = [tuple(p) for p in seq_params]
+        self.log.append((q, seq))
+        self.rowcount = len(seq)
+        table = re.match(r"INSERT INTO (\w+)", q).group(1)
+
+        if table == "data_versions":
+            for (name,) in seq:
+                lock = self.server.row_lock(name)
+                if lock not in self.held:
+                    lock.acquire()
+                    self.held.append(lock)
+
+            def op(s):
+                for (name,) in seq:
+                    s["versions"][name] = s["versions"].get(name, 0) + 1
+
+        elif table == "ticker_data":
+
+            def op(s):
+                for t, _, close, _, _, _, date, _, _ in seq:
+                    s["bars"].setdefault(t, {})[date] = close
+
+        elif table == "return_stats":
+
+            def op(s):
+                for row in seq:
+                    s["return_stats"][row[0]] = row
+
+        elif table == "return_pair_stats":
+
+            def op(s):
+                for a, b, *pair in seq:
+                    s["pairs"][(a, b)] = tuple(pair)
+
+        elif table == "daily_returns":
+
+            def op(s):
+                for t, date, r in seq:
+                    s["daily_returns"][(t, date)] = r
+
+        else:
+            raise AssertionError(f"unexpected statement {q}")
+        self._write(op)
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor: FakeCursor):
+        self.cursor = cursor
+
+    def commit(self):
+        self.cursor.end(commit=True)
+
+    def rollback(self):
+        self.cursor.end(commit=False)
+
+
+def fake_editor(server: FakeServer):
+    db_editor = DatabaseEditor.__new__(DatabaseEditor)
+    db_editor.db_name = "test"
+    db_editor.pool = None
+    db_editor.upstream_calls = 0
+    cursor = FakeCursor(server)
+    db_editor.db = FakeConnection(cursor)
+    db_editor.cursor = InstrumentedCursor(cursor)
+    return db_editor
+
+
+@pytest.fixture(autouse=True)
+def closed_market(monkeypatch):
+    monkeypatch.setattr(db_api, "market_now", lambda: NOW)
+    monkeypatch.setattr(db_api, "OHLCV_STORE_ENABLED", False)
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    prices = {
+        t: np.round(100 * np.exp(np.cumsum(rng.normal(0, scale, len(DAYS)))), 4)
+        for t, scale in (("AAA", 0.01), ("BBB", 0.02), ("CCC", 0.015))
+    }
+    prices["CCC"][rng.choice(len(DAYS), 10, replace=False)] = (
+        np.nan
+    )  # days without a bar
+    return prices
+
+
+def history(prices, ticker, first, last):
+    closes = pd.Series(prices[ticker][first:last], index=DAYS[first:last]).dropna()
+    return pd.DataFrame(
+        {"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 0}
+    )
+
+
+def expected_returns(server):
+    return pd.DataFrame(
+        {
+            t: np.log(pd.Series(bars).sort_index()).diff()
+            for t, bars in server.state["bars"].items()
+        }
+    )
+
+
+def assert_matches_pandas(server):
+    returns = expected_returns(server)
+    report = fake_editor(server).get_return_stats(list(returns.columns))
+    for ticker, stats in report["tickers"].items():
+        r = returns[ticker].dropna()
+        assert stats["returns"] == len(r)
+        assert np.isclose(stats["mean"], r.mean())
+        assert np.isclose(stats["volatility"], r.std() * np.sqrt(252))
+        assert np.isclose(
+            stats["window_volatility"], r.tail(ROLLING_WINDOW).std() * np.sqrt(252)
+        )
+    assert len(report["pairs"]) == 3
+    for pair in report["pairs"]:
+        both = returns[pair["tickers"]].dropna()
+        assert pair["returns"] == len(both)
+        assert np.isclose(pair["correlation"], both.corr().iloc[0, 1])
+        assert np.isclose(pair["covariance"], both.cov().iloc[0, 1] * 252)
+
+
+def test_interleaved_batches_match_pandas_and_a_rebuild(prices):
+    server = FakeServer()
+    db_editor = fake_editor(server)
+    batches = [
+        ("AAA", 0, 40),
+        ("BBB", 0, 90),
+        ("CCC", 0, 30),
+        ("AAA", 39, 100),  # a refetch of the last bar, then new ones
+        ("CCC", 29, 120),
+        ("AAA", 99, 120),
+        ("BBB", 89, 120),
+        ("BBB", 10, 20),  # older bars: rebuilt from the history
+    ]
+    for ticker, first, last in batches:
+        db_editor.ingest_ticker_history(ticker, history(prices, ticker, first, last))
+    assert_matches_pandas(server)
+
+    incremental = copy.deepcopy(server.state)
+    db_editor.rebuild_return_stats()
+    assert incremental["pairs"].keys() == server.state["pairs"].keys()
+    for key, pair in incremental["pairs"].items():
+        np.testing.assert_allclose(pair, server.state["pairs"][key])
+    assert incremental["daily_returns"].keys() == server.state["daily_returns"].keys()
+
+
+def test_daily_ingestion_reads_only_the_ingested_ticker(prices):
+    server = FakeServer()
+    db_editor = fake_editor(server)
+    for ticker in ("AAA", "BBB", "CCC"):
+        db_editor.ingest_ticker_history(ticker, history(prices, ticker, 0, 60))
+
+    log = db_editor.cursor._cursor.log
+    for day in range(60, 120):
+        for ticker in ("CCC", "AAA", "BBB") if day % 2 else ("BBB", "CCC", "AAA"):
+            del log[:]
+            db_editor.ingest_ticker_history(
+                ticker, history(prices, ticker, day - 1, day + 1)
+            )
+            reads = [(q, p) for q, p in log if "FROM return_stats" in q]
+            assert reads == [(reads[0][0], [ticker])]
+            # no history scan nor rebuild
+            assert not any(q.startswith("SELECT date, open") for q, _ in log)
+            assert not any("DELETE" in q for q, _ in log)
+    assert_matches_pandas(server)
+
+
+def test_concurrent_ingestions_of_the_same_date(prices):
+    server = FakeServer()
+    for ticker in ("AAA", "BBB", "CCC"):
+        fake_editor(server).ingest_ticker_history(
+            ticker, history(prices, ticker, 0, 100)
+        )
+
+    # the two updates read the statistics at the same time, unless one waits for the other's commit
+    barrier = threading.Barrier(2, timeout=1)
+
+    def ingest(ticker):
+        db_editor = fake_editor(server)
+        cursor = db_editor.cursor._cursor
+
+        def wait_once(q):
+            if "FROM return_stats" in q:
+                cursor.on_read = None
+                try:
+                    barrier.wait()
+                except threading.BrokenBarrierError:
+                    pass
+
+        cursor.on_read = wait_once
+        db_editor.ingest_ticker_history(ticker, history(prices, ticker, 99, 101))
+
+    threads = [threading.Thread(target=ingest, args=(t,)) for t in ("AAA", "BBB")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db_editor = fake_editor(server)
+    db_editor.ingest_ticker_history("CCC", history(prices, "CCC", 99, 101))
+    pairs = server.state["pairs"]
+    returns = expected_returns(server)
+    assert pairs[("AAA", "BBB")][0] == len(returns[["AAA", "BBB"]].dropna()) == 100
+    assert_matches_pandas(server)
+
+
+def test_stats_from_bars_skips_missing_and_non_positive_prices():
+    dates = np.array(DAYS[:5], dtype="datetime64[s]")
+    stats = stats_from_bars(dates, np.array([1.0, 2.0, 0.0, 4.0, 8.0]), 3)
+    # returns of 2/1 and 8/4, none across the zero price
+    assert stats["n"] == 2
+    assert np.isclose(stats["mean"], np.log(2))
@@ -0,0 +1,28 @@
+import threading
+import time
+
+from view_cache import ViewCache
+
+
+def test_miss_computes_in_the_caller_and_stale_refreshes_in_the_background():
+    cache = ViewCache(stale_ttl=60, workers=1)
+    calls = []
+    refreshed = threading.Event()
+
+    def compute():
+        calls.append(("compute", threading.current_thread().name))
+        return "fresh"
+
+    def refresh():
+        calls.append(("refresh", threading.current_thread().name))
+        refreshed.set()
+        return "refreshed"
+
+    caller = threading.current_thread().name
+    assert cache.get_or_compute("view", compute, 0.01, 1, refresh) == ("fresh", 1)
+    time.sleep(0.02)
+    # expired but within stale_ttl: the old value is served while refresh runs
+    assert cache.get_or_compute("view", compute, 0.01, 1, refresh) == ("fresh", 1)
+    assert refreshed.wait(1)
+    assert calls[0] == ("compute", caller)
+    assert calls[1][0] == "refresh" and calls[1][1] != caller